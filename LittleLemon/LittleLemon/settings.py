@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'LittleLemonAPI.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,14 +79,130 @@ WSGI_APPLICATION = 'LittleLemon.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+#
+# Transactions take SQLite's write lock when they begin, so concurrent
+# writers wait up to `timeout` seconds for each other; deferred ones that
+# read first fail with "database is locked" when both then write. Tests
+# use a database file because the shared-cache in-memory database fails
+# concurrent writers instead of waiting.
+#
+# DATABASE_PROFILE=production (from the environment) tunes SQLite for
+# several threads and workers:
+# - WAL, so catalog and order reads no longer wait for checkouts to
+#   commit. synchronous=NORMAL is still safe in WAL mode, and it only
+#   fsyncs at checkpoints.
+# - mmap and a larger page cache.
+# - Connections kept for CONN_MAX_AGE seconds instead of being reopened
+#   on every request.
+# - A query_only "replica" connection to the same file. It takes the
+#   menu, category and order reads (see LittleLemonAPI/routers.py), so
+#   the default connection only handles writes.
+# The catalog cache stays in each worker's local memory. Catalog pages,
+# ETags, cart prices and the menu snapshot all follow the catalog
+# version, which is read from the database's ChangeStamps (see
+# LittleLemonAPI/catalog_cache.py). Workers therefore agree on it
+# without sharing a cache; CATALOG_VERSION_MAX_AGE bounds how long one
+# can lag another.
+# The journal mode is stored in the database file and the WAL files sit
+# next to it, so the checked-in development database keeps the defaults.
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'development')
+
+SQLITE_DATABASE = BASE_DIR / 'db.sqlite3'
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': SQLITE_DATABASE,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+if DATABASE_PROFILE == 'production':
+    SQLITE_PRAGMAS = (
+        'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; '
+        'PRAGMA mmap_size=268435456; PRAGMA cache_size=-65536; PRAGMA temp_store=MEMORY'
+    )
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    })
+    DATABASES['default']['OPTIONS']['init_command'] = SQLITE_PRAGMAS
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': SQLITE_DATABASE,
+        'OPTIONS': {'timeout': 20, 'init_command': SQLITE_PRAGMAS + '; PRAGMA query_only=ON'},
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['LittleLemonAPI.routers.ReadReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+#
+# The "catalog" cache holds serialized menu responses, keyed by the
+# catalog version. That version comes from the database, so workers with
+# private local-memory caches still agree on it. A shared backend only
+# saves each worker from rendering the same pages again.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'TIMEOUT': 300,
+    },
+}
+
+CATALOG_CACHE_ALIAS = 'catalog'
+
+# Seconds a worker reuses the catalog version it read from the database.
+# A menu write made in another worker can take this long to show up in
+# its cached pages and ETags.
+CATALOG_VERSION_MAX_AGE = 2
+
+# Seconds a worker trusts its cached roles and token logins before
+# checking the group membership, token and user stamps again. A role
+# removed, a token deleted or a user deactivated in another worker stays
+# in effect here for up to this long.
+AUTH_VERSION_MAX_AGE = 2
+
+# Answer ?search= from the SQLite FTS5 index when it is available.
+FULL_TEXT_SEARCH = True
+
+# Render GET list/retrieve of menu items and orders from .values() rows
+# instead of the DRF model serializers; the JSON is identical.
+LEAN_SERIALIZERS = True
+
+# Per-endpoint query counts and timings, exposed to managers at
+# /api/metrics/ in the Prometheus text format. Off by default; the
+# Server-Timing header additionally needs REQUEST_METRICS.
+REQUEST_METRICS = False
+REQUEST_METRICS_SERVER_TIMING = False
+
+# Price cart adds and look up categories at checkout from a per-process
+# snapshot of the menu, reloaded when the catalog version changes.
+PRICE_SNAPSHOT = True
+
+# Seconds a POST response is kept for replay to retries sent with the
+# same Idempotency-Key header.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Background jobs, run by `manage.py run_jobs`: attempts before a job is
+# marked failed, and seconds a worker may hold one before another
+# worker claims it again.
+JOBS_MAX_ATTEMPTS = 5
+JOBS_LEASE = 300
+
+# Queue a dispatch job at checkout, so new orders get a delivery crew
+# member without a manager calling orders/dispatch/.
+AUTO_DISPATCH = False
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -127,12 +245,23 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# FastJSONRenderer/FastJSONParser use orjson when it is installed and are
+# DRF's JSONRenderer/JSONParser otherwise; the output is the same bytes.
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'LittleLemonAPI.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'LittleLemonAPI.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'LittleLemonAPI.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
-    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend', 'rest_framework.filters.OrderingFilter', 'rest_framework.filters.SearchFilter']
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend', 'rest_framework.filters.OrderingFilter', 'LittleLemonAPI.search.FullTextSearchFilter']
 }
 
 DJOSER = {
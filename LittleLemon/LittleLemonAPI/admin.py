@@ -1,8 +1,9 @@
 from django.contrib import admin
-from .models import OrderItem, Order, MenuItem, Category, Cart
+from .models import OrderItem, Order, MenuItem, Category, Cart, Job
 # Register your models here.
 admin.site.register(OrderItem)
 admin.site.register(Order)
 admin.site.register(MenuItem)
 admin.site.register(Category)
 admin.site.register(Cart)
+admin.site.register(Job)
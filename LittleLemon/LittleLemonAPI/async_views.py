@@ -0,0 +1,150 @@
+"""Async (ASGI) versions of the read-heavy endpoints.
+
+Each view mirrors a DRF view from `views.py`: it borrows that view's
+queryset, filters, pagination and serializer, so the JSON is the same,
+but authentication, the role check and every query run on Django's
+async ORM. Filter backends are applied in a worker thread because
+validating `?category=` may touch the database. The catalog cache and
+conditional GET support stay on the sync views.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from .authentication import AsyncTokenAuthentication, aauthenticate
+from .renderers import FastJSONRenderer
+from .roles import MANAGER, aget_roles
+from .views import (
+    CategoriesView,
+    SingleCategoryView,
+    MenuItemsView,
+    SingleMenuItemView,
+    OrderView,
+    SingleOrderView,
+)
+
+PUBLIC = 'public'
+AUTHENTICATED = 'authenticated'
+MANAGER_ONLY = 'manager'
+
+
+class AsyncReadView(View):
+    http_method_names = ['get', 'head', 'options']
+    renderer = FastJSONRenderer()
+    view_class = None
+    access = AUTHENTICATED
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            user = await aauthenticate(request)
+            await self.check_access(user)
+            view = self.get_view(request, user, kwargs)
+            data = await self.get_data(view)
+        except Exception as exc:
+            return self.handle_exception(exc)
+
+        return self.render(data)
+
+    async def check_access(self, user):
+        if self.access == MANAGER_ONLY:
+            if MANAGER not in await aget_roles(user):
+                raise exceptions.PermissionDenied()
+        elif self.access == AUTHENTICATED:
+            if not user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+
+    def get_view(self, request, user, kwargs):
+        """Set up the mirrored DRF view without running its dispatch."""
+        drf_request = Request(request)
+        drf_request.user = user
+
+        view = self.view_class()
+        view.setup(request, **kwargs)
+        view.request = drf_request
+        view.format_kwarg = None
+        return view
+
+    async def get_data(self, view):
+        raise NotImplementedError
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            self.renderer.render(data), status=status, content_type='application/json')
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            exc.auth_header = AsyncTokenAuthentication().authenticate_header(None)
+
+        response = exception_handler(exc, {})
+        if response is None:
+            raise exc
+
+        rendered = self.render(response.data, status=response.status_code)
+        for name, value in response.headers.items():
+            rendered[name] = value
+        return rendered
+
+
+class AsyncListView(AsyncReadView):
+    async def get_data(self, view):
+        queryset = await sync_to_async(
+            lambda: view.filter_queryset(view.get_queryset()))()
+
+        paginator = view.paginator
+        if paginator is None:
+            return view.get_serializer([row async for row in queryset], many=True).data
+
+        page = await paginator.apaginate_queryset(queryset, view.request, view)
+        data = view.get_serializer(page, many=True).data
+        return paginator.get_paginated_response(data).data
+
+
+class AsyncRetrieveView(AsyncReadView):
+    async def get_data(self, view):
+        queryset = await sync_to_async(
+            lambda: view.filter_queryset(view.get_queryset()))()
+
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        try:
+            instance = await queryset.aget(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+        except queryset.model.DoesNotExist:
+            raise Http404(
+                f'No {queryset.model._meta.object_name} matches the given query.')
+
+        return view.get_serializer(instance).data
+
+
+class AsyncCategoriesView(AsyncListView):
+    view_class = CategoriesView
+    access = MANAGER_ONLY
+
+
+class AsyncSingleCategoryView(AsyncRetrieveView):
+    view_class = SingleCategoryView
+    access = MANAGER_ONLY
+
+
+class AsyncMenuItemsView(AsyncListView):
+    view_class = MenuItemsView
+    access = PUBLIC
+
+
+class AsyncSingleMenuItemView(AsyncRetrieveView):
+    view_class = SingleMenuItemView
+    access = PUBLIC
+
+
+class AsyncOrderView(AsyncListView):
+    view_class = OrderView
+
+    async def get_data(self, view):
+        # resolve the roles here so OrderView.get_queryset hits the cache
+        await aget_roles(view.request.user)
+        return await super().get_data(view)
+
+
+class AsyncSingleOrderView(AsyncRetrieveView):
+    view_class = SingleOrderView
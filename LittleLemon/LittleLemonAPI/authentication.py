@@ -0,0 +1,141 @@
+import copy
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+from rest_framework.authtoken.models import Token
+
+from .changes import StampedTTLCache
+from .roles import aget_roles, get_max_age, get_roles
+from .ttlcache import TTLCache
+
+# token key -> Token, and user id -> User. A token only authenticates
+# from the cache while its user is cached too, so dropping a user entry
+# is enough to make every token of that user be checked again. The user
+# cache is emptied when any worker deletes a token or deactivates,
+# renames or deletes a user.
+_token_cache = TTLCache(
+    maxsize=getattr(settings, 'TOKEN_CACHE_MAXSIZE', 4096),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60),
+)
+_user_cache = StampedTTLCache(
+    [Token, User], get_max_age,
+    maxsize=getattr(settings, 'TOKEN_CACHE_MAXSIZE', 4096),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60),
+)
+
+
+def invalidate_token(key):
+    _token_cache.delete(key)
+
+
+def invalidate_user(user_id):
+    _user_cache.delete(user_id)
+
+
+def clear_token_cache():
+    _token_cache.clear()
+    _user_cache.clear()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in `TokenAuthentication` that remembers token -> user lookups.
+
+    Warm requests are authenticated without touching the database; the
+    user's roles are resolved on the cold path so the role checks that
+    follow are cached too. Entries are dropped by the signal receivers
+    in `signals.py` when a token is deleted or a user is saved or
+    deleted. The caches are per process. Other workers notice a logout,
+    deactivation or role change from the `ChangeStamp`s within
+    `AUTH_VERSION_MAX_AGE` seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        generation = _user_cache.validate()
+        cached = self.get_cached(key)
+        if cached is not None:
+            return cached
+
+        user, token = super().authenticate_credentials(key)
+        get_roles(user)
+        self.store(user, token, generation)
+        return user, token
+
+    def get_cached(self, key):
+        token = _token_cache.get(key)
+        if token is None:
+            return None
+        user = _user_cache.get(token.user_id)
+        if user is None:
+            return None
+        # every request gets its own copy to mutate
+        return copy.copy(user), token
+
+    def store(self, user, token, generation):
+        _user_cache.set(user.pk, copy.copy(user), generation)
+        _token_cache.set(token.key, token)
+
+
+class AsyncTokenAuthentication(CachedTokenAuthentication):
+    """`CachedTokenAuthentication` whose cache misses run on the async ORM."""
+
+    async def aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            msg = _('Invalid token header. No credentials provided.')
+            raise exceptions.AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _('Invalid token header. Token string should not contain spaces.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            msg = _('Invalid token header. Token string should not contain invalid characters.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        return await self.aauthenticate_credentials(token)
+
+    async def aauthenticate_credentials(self, key):
+        generation = await _user_cache.avalidate()
+        cached = self.get_cached(key)
+        if cached is not None:
+            return cached
+
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        await aget_roles(token.user)
+        self.store(token.user, token, generation)
+        return (token.user, token)
+
+
+async def aauthenticate(request):
+    """Resolve the user like the default DRF authentication classes do:
+    a token header first, then the session."""
+    user_auth = await AsyncTokenAuthentication().aauthenticate(request)
+    if user_auth is not None:
+        return user_auth[0]
+
+    if hasattr(request, 'auser'):
+        user = await request.auser()
+    else:
+        user = await sync_to_async(lambda: request.user)()
+
+    if not user or not user.is_active:
+        return AnonymousUser()
+    return user
@@ -0,0 +1,159 @@
+"""Cart writes that stay correct when requests for one user overlap.
+
+`add_to_cart` is an upsert: an `INSERT ... ON CONFLICT DO NOTHING`
+makes sure the row exists, and the row is then locked, read and
+updated. Retried or parallel adds of one item therefore neither fail on
+the `(menuitem, user)` unique constraint nor lose an increment.
+
+Every write to a line charges the whole line at today's price, so
+`price` is always `quantity * unit_price`, and the same holds for the
+order items copied from it. A write that would take a line past what
+`Cart.price` can hold is refused with a 400.
+
+`apply_operations` runs a whole list of adds, quantity changes and
+removals with a fixed number of bulk statements in one transaction,
+however many items it touches.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, IntegerField, Value, When
+from rest_framework.exceptions import NotFound, ValidationError
+
+from . import cart_summary, prices
+from .models import Cart
+
+ADD = 'add'
+SET = 'set'
+REMOVE = 'remove'
+ACTIONS = (ADD, SET, REMOVE)
+
+PRICE_FIELD = DecimalField(max_digits=6, decimal_places=2)
+
+
+def max_amount(field):
+    """Return the largest amount a `DecimalField` can hold."""
+    return Decimal(10) ** (field.max_digits - field.decimal_places) - Decimal(10) ** -field.decimal_places
+
+
+MAX_LINE_PRICE = max_amount(Cart._meta.get_field('price'))
+
+
+def add_to_cart(user, menuitem_id, quantity, unit_price):
+    """Add `quantity` of a menu item costing `unit_price` to `user`'s
+    cart and return its row.
+
+    The whole line, including what was already in the cart, is charged
+    at `unit_price`.
+    """
+    with transaction.atomic():
+        Cart.objects.bulk_create([Cart(
+            user=user, menuitem_id=menuitem_id, quantity=0, unit_price=unit_price, price=0,
+        )], ignore_conflicts=True)
+        # overlapping adds of the item wait here until this one commits
+        row = Cart.objects.select_for_update().get(user=user, menuitem_id=menuitem_id)
+        previous = row.price
+        _check_line(menuitem_id, row.quantity + quantity, unit_price)
+        row.quantity += quantity
+        row.unit_price = unit_price
+        row.price = row.quantity * unit_price
+        Cart.objects.filter(id=row.id).update(
+            quantity=row.quantity, unit_price=row.unit_price, price=row.price)
+        # neither write sends post_save
+        cart_summary.increase(user.pk, quantity, row.price - previous)
+    # saves the serializer a query for the username
+    row.user = user
+    return row
+
+
+def apply_operations(user, operations):
+    """Apply a list of `{'action', 'menuitem_id', 'quantity'}` operations
+    to `user`'s cart, in order, and return all of its rows.
+
+    `add` works like `add_to_cart`. `set` replaces the quantity. Both
+    charge the whole line at today's price. `remove` deletes the row,
+    if there is one. Nothing is written if an added or set item does
+    not exist.
+    """
+    changes = _fold(operations)
+    priced = [menuitem_id for menuitem_id, (action, _) in changes.items() if action != REMOVE]
+    found = prices.lookup_many(priced)
+    missing = sorted(set(priced) - found.keys())
+    if missing:
+        raise NotFound(detail=f"Items not exist: {', '.join(map(str, missing))}")
+
+    def lines(action):
+        return {
+            menuitem_id: (quantity, found[menuitem_id].price)
+            for menuitem_id, (kind, quantity) in changes.items() if kind == action
+        }
+
+    removes = [menuitem_id for menuitem_id, (action, _) in changes.items() if action == REMOVE]
+    sets, adds = lines(SET), lines(ADD)
+    for menuitem_id, (quantity, unit_price) in sets.items():
+        _check_line(menuitem_id, quantity, unit_price)
+    with transaction.atomic():
+        if adds:
+            in_cart = dict(Cart.objects.filter(user=user, menuitem_id__in=list(adds)).values_list(
+                'menuitem_id', 'quantity'))
+            for menuitem_id, (quantity, unit_price) in adds.items():
+                _check_line(menuitem_id, in_cart.get(menuitem_id, 0) + quantity, unit_price)
+        if removes:
+            with cart_summary.deferred(user.pk):
+                Cart.objects.filter(user=user, menuitem_id__in=removes).delete()
+        if sets:
+            Cart.objects.bulk_create([
+                Cart(user=user, menuitem_id=menuitem_id, quantity=quantity,
+                     unit_price=unit_price, price=quantity * unit_price)
+                for menuitem_id, (quantity, unit_price) in sets.items()
+            ], update_conflicts=True, unique_fields=['menuitem', 'user'],
+                update_fields=['quantity', 'unit_price', 'price'])
+        if adds:
+            Cart.objects.bulk_create([
+                Cart(user=user, menuitem_id=menuitem_id, quantity=0, unit_price=unit_price, price=0)
+                for menuitem_id, (_, unit_price) in adds.items()
+            ], ignore_conflicts=True)
+            new_quantity = F('quantity') + _per_item(
+                {menuitem_id: quantity for menuitem_id, (quantity, _) in adds.items()}, IntegerField())
+            todays_price = _per_item(
+                {menuitem_id: unit_price for menuitem_id, (_, unit_price) in adds.items()}, PRICE_FIELD)
+            Cart.objects.filter(user=user, menuitem_id__in=list(adds)).update(
+                quantity=new_quantity, unit_price=todays_price,
+                price=ExpressionWrapper(new_quantity * todays_price, output_field=PRICE_FIELD))
+
+        rows = list(Cart.objects.filter(user=user).order_by('id'))
+        # none of the bulk writes above touched the summary
+        cart_summary.store(
+            user.pk, sum(row.quantity for row in rows), sum((row.price for row in rows), Decimal('0.00')))
+    for row in rows:
+        row.user = user
+    return rows
+
+
+def _check_line(menuitem_id, quantity, unit_price):
+    if quantity * unit_price > MAX_LINE_PRICE:
+        raise ValidationError(
+            detail=f'The cart line for item {menuitem_id} would cost more than {MAX_LINE_PRICE}')
+
+
+def _fold(operations):
+    """Reduce `operations` to one `(action, quantity)` per menu item."""
+    changes = {}
+    for operation in operations:
+        menuitem_id, action = operation['menuitem_id'], operation['action']
+        quantity = operation.get('quantity')
+        current, pending = changes.get(menuitem_id, (None, 0))
+        if action == ADD and current == REMOVE:
+            # the row is gone by then, so the add fixes the quantity
+            changes[menuitem_id] = (SET, quantity)
+        elif action == ADD and current is not None:
+            changes[menuitem_id] = (current, pending + quantity)
+        else:
+            changes[menuitem_id] = (action, quantity)
+    return changes
+
+
+def _per_item(values, output_field):
+    return Case(
+        *[When(menuitem_id=menuitem_id, then=Value(value)) for menuitem_id, value in values.items()],
+        default=Value(0), output_field=output_field)
@@ -0,0 +1,134 @@
+"""Per-user cart totals kept up to date as the cart changes.
+
+Adding or removing a single cart row adjusts the user's `CartSummary`
+with one relative UPDATE (see `signals.py`). Emptying a cart goes
+through `clear_cart`, which deletes the rows and zeroes the summary
+without touching it once per row; batch writes do the same with
+`deferred` and `store`. `rebuild` recomputes every summary from the
+cart table and reports the ones that had drifted.
+"""
+import contextlib
+import contextvars
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import Cart, CartSummary
+
+# user id whose summary the caller sets itself after a bulk write; its
+# row deletes are not applied one by one
+_deferred = contextvars.ContextVar('cart_summary_deferred', default=None)
+
+CENT = Decimal('0.01')
+EMPTY = (0, Decimal('0.00'))
+
+
+def get_summary(user):
+    """Return `(items, total)` for `user`'s cart."""
+    row = CartSummary.objects.filter(user=user).values_list('items', 'total').first()
+    return row or EMPTY
+
+
+def add(item):
+    """Account for a new cart row."""
+    increase(item.user_id, item.quantity, item.price)
+
+
+def increase(user_id, items, total):
+    """Account for `items` more items costing `total` in `user_id`'s cart."""
+    updated = _adjust(user_id, items, total)
+    if not updated:
+        _, created = CartSummary.objects.get_or_create(
+            user_id=user_id, defaults={'items': items, 'total': total})
+        if not created:
+            # another request created the summary first
+            _adjust(user_id, items, total)
+
+
+def remove(item):
+    """Account for a deleted cart row."""
+    if _deferred.get() == item.user_id:
+        return
+    # No summary means the user is being deleted or was never counted;
+    # either way there is nothing to subtract from.
+    _adjust(item.user_id, -item.quantity, -item.price)
+
+
+def refresh(user_id):
+    """Recompute one user's summary from their cart rows."""
+    items, total = _totals(Cart.objects.filter(user_id=user_id)).get(user_id, EMPTY)
+    store(user_id, items, total)
+
+
+def store(user_id, items, total):
+    """Set one user's summary to `items` and `total`."""
+    updated = CartSummary.objects.filter(user_id=user_id).update(items=items, total=total)
+    if not updated:
+        CartSummary.objects.update_or_create(
+            user_id=user_id, defaults={'items': items, 'total': total})
+
+
+@contextlib.contextmanager
+def deferred(user_id):
+    """Leave `user_id`'s summary alone while their cart rows are deleted
+    in the block. The caller must `store` or zero it afterwards.
+    """
+    token = _deferred.set(user_id)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+
+def clear_cart(user):
+    """Delete `user`'s cart rows and zero their summary."""
+    with transaction.atomic():
+        with deferred(user.pk):
+            Cart.objects.filter(user=user).delete()
+        CartSummary.objects.filter(user=user).update(items=0, total=0)
+
+
+def rebuild(fix=True):
+    """Compare every summary with the cart table, optionally fixing drift.
+
+    Returns a list of `(user_id, stored, actual)` for each summary that
+    did not match, where `stored` and `actual` are `(items, total)`.
+    """
+    with transaction.atomic():
+        actual = _totals(Cart.objects.all())
+        stored = {
+            user_id: (items, total)
+            for user_id, items, total in CartSummary.objects.select_for_update()
+            .values_list('user_id', 'items', 'total')
+        }
+
+        drift = []
+        for user_id in sorted(actual.keys() | stored.keys()):
+            expected = actual.get(user_id, EMPTY)
+            current = stored.get(user_id)
+            if current is None and not expected[0]:
+                continue
+            if current is None or current[0] != expected[0] or current[1] != expected[1]:
+                drift.append((user_id, current or EMPTY, expected))
+
+        if fix:
+            for user_id, _, (items, total) in drift:
+                store(user_id, items, total)
+
+    return drift
+
+
+def _adjust(user_id, items, total):
+    return CartSummary.objects.filter(user_id=user_id).update(
+        items=F('items') + items, total=F('total') + total)
+
+
+def _totals(queryset):
+    # SQLite's SUM drops trailing zeros; keep two places like the column
+    return {
+        user_id: (items, total.quantize(CENT))
+        for user_id, items, total in queryset.order_by().values('user_id')
+        .annotate(items=Sum('quantity'), total=Sum('price'))
+        .values_list('user_id', 'items', 'total')
+    }
@@ -0,0 +1,100 @@
+"""Versioned cache of serialized menu responses.
+
+Entries live in the Django cache named by ``CATALOG_CACHE_ALIAS``; pick
+its backend in ``settings.CACHES`` (local memory by default). Every key
+includes the catalog version, so stale entries are never read again and
+simply age out.
+
+The version is built from the ``ChangeStamp`` rows of menu items and
+categories (see ``changes.py``), so all workers agree on it whatever
+the cache backend. The cache keeps the version it read for
+``CATALOG_VERSION_MAX_AGE`` seconds, so a write made elsewhere shows up
+within that time. ``bump_version`` is called once this process's own
+writes commit. It drops the cached version, so the next read goes to
+the database.
+"""
+import hashlib
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import changes
+from .models import Category, MenuItem
+
+VERSION_KEY = 'catalog:version'
+
+
+class Version(namedtuple('Version', 'menuitems categories modified')):
+    """The menu item and category stamp versions, and the later of their
+    modification times."""
+
+    def __str__(self):
+        # the time tells apart equal counters of a restored database
+        modified = int(self.modified.timestamp() * 1_000_000) if self.modified else 0
+        return f'{self.menuitems}.{self.categories}.{modified}'
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'catalog')]
+
+
+def get_max_age():
+    return getattr(settings, 'CATALOG_VERSION_MAX_AGE', 2)
+
+
+def current_version(fresh=False):
+    """Return the catalog `Version`.
+
+    The version is re-read from the database when the cached copy has
+    expired or when `fresh` is set.
+    """
+    cache = get_cache()
+    version = None if fresh else cache.get(VERSION_KEY)
+    if version is None:
+        (menuitems, menuitems_modified), (categories, categories_modified) = changes.stamps(
+            [MenuItem, Category])
+        modified = max(filter(None, (menuitems_modified, categories_modified)), default=None)
+        version = Version(menuitems, categories, modified)
+        cache.set(VERSION_KEY, version, get_max_age())
+    return version
+
+
+def bump_version():
+    get_cache().delete(VERSION_KEY)
+
+
+def make_key(request, scope):
+    """Build a key from the version, the view and every query parameter."""
+    params = '&'.join(
+        f'{name}={value}'
+        for name in sorted(request.query_params)
+        for value in request.query_params.getlist(name))
+    raw = f'{request.get_host()}{request.path}?{params}'
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'catalog:{current_version()}:{scope}:{digest}'
+
+
+def lookup(key):
+    data = get_cache().get(key)
+    with _stats_lock:
+        _stats['hits' if data is not None else 'misses'] += 1
+    return data
+
+
+def store(key, data):
+    get_cache().set(key, data)
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
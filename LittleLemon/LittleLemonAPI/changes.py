@@ -0,0 +1,109 @@
+"""Cheap per-table change tracking used to build HTTP validators.
+
+Every save or delete of a tracked model bumps that table's
+`ChangeStamp`, so a view can tell whether its output may have changed
+with one small query instead of rendering the payload.
+
+On SQLite, menu items and categories are stamped by triggers (migration
+0011) rather than here. The triggers also see writes that send no
+signal, such as `QuerySet.update`, bulk imports, the admin's bulk
+actions and data migrations.
+
+`StampedTTLCache` keeps per-process data, such as roles, in step with
+stamps written by every worker.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ChangeStamp
+from .ttlcache import TTLCache
+
+
+def table_for(model):
+    return model._meta.label_lower
+
+
+# kept current by database triggers on SQLite; touching them as well
+# would count every write twice
+TRIGGER_STAMPED = {'LittleLemonAPI.menuitem', 'LittleLemonAPI.category'}
+
+
+def touch(model):
+    table = table_for(model)
+    if table in TRIGGER_STAMPED and connection.vendor == 'sqlite':
+        return
+    now = timezone.now()
+    updated = ChangeStamp.objects.filter(table=table).update(
+        version=F('version') + 1, modified=now)
+    if not updated:
+        ChangeStamp.objects.get_or_create(
+            table=table, defaults={'version': 1, 'modified': now})
+
+
+def stamps(models):
+    """Return `(version, modified)` for each model, in the order given."""
+    tables = [table_for(model) for model in models]
+    rows = {
+        table: (version, modified)
+        for table, version, modified in ChangeStamp.objects.filter(
+            table__in=tables).values_list('table', 'version', 'modified')
+    }
+    return [rows.get(table, (0, None)) for table in tables]
+
+
+class StampedTTLCache(TTLCache):
+    """A `TTLCache` that is emptied whenever the stamp of one of `models`
+    moves, whichever process made the write.
+
+    Call `validate` (`avalidate` in async code) before reading. It
+    re-reads the stamps at most every `get_max_age()` seconds, which
+    bounds how long another worker's write can go unnoticed. It returns
+    a generation to pass to `set`, so a value read from the database
+    before the cache was emptied is not stored afterwards.
+    """
+
+    def __init__(self, models, get_max_age, **kwargs):
+        super().__init__(**kwargs)
+        self.models = models
+        self.get_max_age = get_max_age
+        self._stamps = None
+        self._checked = None
+        self._generation = 0
+
+    def validate(self):
+        if self._is_due():
+            self._check(stamps(self.models))
+        return self._generation
+
+    async def avalidate(self):
+        if self._is_due():
+            self._check(await sync_to_async(stamps)(self.models))
+        return self._generation
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+        super().set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._checked = None
+            self._generation += 1
+
+    def _is_due(self):
+        checked = self._checked
+        return checked is None or time.monotonic() - checked >= self.get_max_age()
+
+    def _check(self, current):
+        with self._lock:
+            if current != self._stamps:
+                self._data.clear()
+                self._stamps = current
+                self._generation += 1
+            self._checked = time.monotonic()
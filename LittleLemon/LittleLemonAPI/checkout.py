@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import jobs, rollups
+from .cart import max_amount
+from .cart_summary import clear_cart
+from .models import Cart, Order, OrderItem
+
+MAX_ORDER_TOTAL = max_amount(Order._meta.get_field('total'))
+
+
+def checkout(user, save_order):
+    """Turn `user`'s cart into an order in a single transaction.
+
+    `save_order(total)` is called with the cart total and must return the
+    saved `Order`. The cart is read with one locking query, the order
+    items are written with one bulk insert, the sales rollups are updated
+    with a fixed number of queries and the cart and its summary are
+    emptied with `clear_cart`, so the number of round trips does not
+    grow with the cart. With `settings.AUTO_DISPATCH` a dispatch job is
+    queued rather than assigning the order inline.
+    """
+    with transaction.atomic():
+        cart_items = list(
+            Cart.objects.select_for_update()
+            .filter(user=user)
+            .order_by('id')
+            .values_list('menuitem_id', 'quantity', 'unit_price', 'price'))
+
+        if not cart_items:
+            raise ValidationError(detail='Cart is empty')
+
+        total = sum(price for *_, price in cart_items)
+        if total > MAX_ORDER_TOTAL:
+            raise ValidationError(detail=f'Order total cannot exceed {MAX_ORDER_TOTAL}')
+
+        order = save_order(total)
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem_id=menuitem_id, quantity=quantity,
+                      unit_price=unit_price, price=price)
+            for menuitem_id, quantity, unit_price, price in cart_items
+        ])
+        rollups.add_order(order, [
+            (menuitem_id, quantity, price) for menuitem_id, quantity, _, price in cart_items])
+
+        clear_cart(user)
+
+        if getattr(settings, 'AUTO_DISPATCH', False):
+            # committed with the order; a run_jobs worker assigns it
+            jobs.enqueue('dispatch_orders', unique=True)
+
+    return order
@@ -0,0 +1,78 @@
+"""Automatic assignment of pending orders to the delivery crew.
+
+A dispatch run locks the unassigned, undelivered orders, builds a
+`LoadIndex` of every crew member's open orders with one grouped query,
+and hands each order (oldest first) to the least-loaded member. Writes
+are one UPDATE per crew member that received orders, all in a single
+transaction, so the cost grows with the crew size rather than with the
+number of orders.
+"""
+import heapq
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+
+from . import changes
+from .models import Order
+from .roles import DELIVERY_CREW
+
+UPDATE_CHUNK_SIZE = 500
+
+
+class LoadIndex:
+    """Min-heap of `(open orders, crew id)`; ties go to the lowest id."""
+
+    def __init__(self, loads):
+        self.loads = dict(loads)
+        self._heap = [(load, crew_id) for crew_id, load in self.loads.items()]
+        heapq.heapify(self._heap)
+
+    @classmethod
+    def build(cls, crew_ids):
+        open_orders = dict(
+            Order.objects.filter(status=False, delivery_crew_id__in=crew_ids)
+            .order_by().values('delivery_crew_id').annotate(open=Count('id'))
+            .values_list('delivery_crew_id', 'open'))
+        return cls({crew_id: open_orders.get(crew_id, 0) for crew_id in crew_ids})
+
+    def assign(self):
+        """Return the least-loaded crew member and count one more order for them."""
+        load, crew_id = heapq.heappop(self._heap)
+        heapq.heappush(self._heap, (load + 1, crew_id))
+        self.loads[crew_id] = load + 1
+        return crew_id
+
+    def __bool__(self):
+        return bool(self._heap)
+
+
+def dispatch(limit=None):
+    """Assign up to `limit` pending orders and return `{crew id: [order ids]}`."""
+    with transaction.atomic():
+        crew_ids = list(
+            User.objects.filter(groups__name=DELIVERY_CREW, is_active=True)
+            .order_by('id').values_list('id', flat=True))
+        if not crew_ids:
+            return {}
+
+        pending = Order.objects.select_for_update().filter(
+            delivery_crew__isnull=True, status=False).order_by('date', 'id')
+        pending = list(pending.values_list('id', flat=True)[:limit])
+        if not pending:
+            return {}
+
+        index = LoadIndex.build(crew_ids)
+        assignments = defaultdict(list)
+        for order_id in pending:
+            assignments[index.assign()].append(order_id)
+
+        for crew_id, order_ids in assignments.items():
+            for start in range(0, len(order_ids), UPDATE_CHUNK_SIZE):
+                Order.objects.filter(id__in=order_ids[start:start + UPDATE_CHUNK_SIZE]).update(
+                    delivery_crew_id=crew_id)
+        # update() sends no post_save
+        changes.touch(Order)
+
+    return dict(assignments)
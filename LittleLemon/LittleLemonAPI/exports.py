@@ -0,0 +1,54 @@
+"""Order export for reporting.
+
+Orders are read with `.iterator(chunk_size=...)`, which prefetches the
+items of one chunk at a time, and turned into plain dicts as they are
+streamed, so memory use does not depend on how many orders match.
+"""
+from django.db.models import Prefetch
+
+from .models import OrderItem
+
+CHUNK_SIZE = 500
+
+
+def export_orders(queryset, chunk_size=None):
+    """Yield one dict per order in `queryset`, with its items nested."""
+    orders = queryset.select_related('user', 'delivery_crew').prefetch_related(
+        Prefetch('orders', queryset=OrderItem.objects.select_related('menuitem'),
+                 to_attr='export_items')
+    ).order_by('id').iterator(chunk_size=chunk_size or CHUNK_SIZE)
+
+    for order in orders:
+        yield {
+            'id': order.id,
+            'user': str(order.user),
+            'delivery_crew': str(order.delivery_crew) if order.delivery_crew else None,
+            'status': order.status,
+            'total': str(order.total),
+            'date': order.date.isoformat(),
+            'items': [
+                {
+                    'menuitem': str(item.menuitem),
+                    'quantity': item.quantity,
+                    'unit_price': str(item.unit_price),
+                    'price': str(item.price),
+                }
+                for item in order.export_items
+            ],
+        }
+        # Each item caches its order, so the two form a reference cycle
+        # that would keep whole chunks alive until the next GC pass.
+        del order.export_items
+
+
+def flatten_items(orders):
+    """Turn nested orders into one row per order item, for CSV.
+
+    An order without items still gets a row, with empty item columns.
+    """
+    empty = {'menuitem': None, 'quantity': None, 'unit_price': None, 'price': None}
+    for order in orders:
+        items = order.pop('items')
+        order = {('order_id' if key == 'id' else key): value for key, value in order.items()}
+        for item in items or [empty]:
+            yield {**order, **item}
@@ -0,0 +1,108 @@
+"""Idempotency keys for POST requests.
+
+A client that may retry a POST sends the same `Idempotency-Key` header
+with every attempt. The first attempt runs the view. Its 2xx response
+is stored in `IdempotencyKey` in the same transaction as the view's
+writes, so it only exists if they committed. Later attempts get that
+response back with an `Idempotent-Replayed: true` header instead of
+running the view again. A key is scoped to the user, method and path,
+and reusing it with different data is refused with 422. Other
+responses are not stored, so a failed request can be fixed and retried
+with the same key.
+
+If two attempts race, the loser's insert of the key fails on its unique
+digest. That rolls back the loser's writes, and it replays the winner's
+response. Keys live for `settings.IDEMPOTENCY_KEY_TTL` seconds. Expired
+ones are deleted whenever a new key is stored.
+"""
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .renderers import FastJSONRenderer
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class KeyReused(APIException):
+    status_code = 422
+    default_detail = f'This {HEADER} was already used with different data.'
+    default_code = 'idempotency_key_reused'
+
+
+class IdempotentCreateMixin:
+    """Replay the response of a `create` retried with the same `Idempotency-Key`."""
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        create = super().create
+        if key is None:
+            return create(request, *args, **kwargs)
+        return run(request, key, lambda: create(request, *args, **kwargs))
+
+
+def get_ttl():
+    return datetime.timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def run(request, key, handler):
+    """Return `handler()`'s response, or the one stored for `key`."""
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValidationError(detail=f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters long')
+
+    digest = _hash(json.dumps([request.user.pk, request.method, request.path, key]))
+    fingerprint = _hash(_canonical(request.data))
+    try:
+        with transaction.atomic():
+            response = _replay(digest, fingerprint)
+            if response is None:
+                response = handler()
+                if 200 <= response.status_code < 300:
+                    _store(digest, fingerprint, response)
+            return response
+    except IntegrityError:
+        # a concurrent attempt with the same key committed first
+        response = _replay(digest, fingerprint)
+        if response is None:
+            raise
+        return response
+
+
+def _replay(digest, fingerprint):
+    stored = IdempotencyKey.objects.filter(digest=digest, expires__gt=timezone.now()).first()
+    if stored is None:
+        return None
+    if bytes(stored.fingerprint) != fingerprint:
+        raise KeyReused()
+
+    response = Response(json.loads(bytes(stored.response)), status=stored.status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _store(digest, fingerprint, response):
+    now = timezone.now()
+    # also clears an expired row for this digest out of the unique index
+    IdempotencyKey.objects.filter(expires__lte=now).delete()
+    IdempotencyKey.objects.create(
+        digest=digest, fingerprint=fingerprint, status=response.status_code,
+        response=FastJSONRenderer().render(response.data), expires=now + get_ttl())
+
+
+def _canonical(data):
+    if hasattr(data, 'lists'):
+        # form data; keep every value of repeated fields
+        data = dict(data.lists())
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def _hash(value):
+    return hashlib.sha256(value.encode()).digest()
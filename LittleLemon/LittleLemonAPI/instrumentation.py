@@ -0,0 +1,257 @@
+"""Per-endpoint request metrics.
+
+`RequestMetricsMiddleware` times every request routed to a
+`LittleLemonAPI` view and counts the queries it runs.
+`InstrumentedViewMixin` splits the DRF part of the request into
+authentication/permission checks and serialization. Serialization is
+the handler's time outside the database plus rendering. The numbers go
+into in-process histograms, keyed by URL route and method, which
+`render_prometheus` formats for the metrics endpoint. `render_counter`
+formats other per-process counters, such as the catalog cache's hits
+and misses, for the same endpoint.
+
+Everything is off unless `settings.REQUEST_METRICS` is true; disabled,
+the middleware costs one settings lookup per request. With
+`REQUEST_METRICS_SERVER_TIMING` the same numbers are also sent in a
+`Server-Timing` header. Streaming responses are timed until their
+headers are ready, and async views only get the total time because
+their queries run in other threads.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+METRICS = (
+    ('littlelemon_request_duration_seconds', 'Total time spent handling the request.',
+     'total', SECONDS_BUCKETS),
+    ('littlelemon_request_db_seconds', 'Time spent executing SQL queries.',
+     'db', SECONDS_BUCKETS),
+    ('littlelemon_request_auth_seconds', 'Time spent on authentication and permission checks.',
+     'auth', SECONDS_BUCKETS),
+    ('littlelemon_request_serialization_seconds',
+     'Time spent serializing and rendering, excluding SQL.', 'serialization', SECONDS_BUCKETS),
+    ('littlelemon_request_queries', 'Number of SQL queries executed.',
+     'queries', QUERY_BUCKETS),
+)
+
+
+def is_enabled():
+    return getattr(settings, 'REQUEST_METRICS', False)
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram; callers hold the registry lock."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, method, values):
+        with self._lock:
+            for name, _, field, buckets in METRICS:
+                value = values.get(field)
+                if value is None:
+                    continue
+                key = (name, endpoint, method)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(buckets)
+                histogram.observe(value)
+
+    def snapshot(self):
+        """Return `{name: [(endpoint, method, buckets, sum, count)]}`."""
+        with self._lock:
+            rows = {}
+            for (name, endpoint, method), histogram in sorted(self._histograms.items()):
+                rows.setdefault(name, []).append(
+                    (endpoint, method, list(histogram.cumulative()), histogram.sum, histogram.count))
+            return rows
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Timings for the request being handled; doubles as the query wrapper."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.auth = None
+        self.serialization = None
+        self.handler_started = None
+        self.handler_db = 0.0
+        self.handler_finished = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def values(self, total, with_queries=True):
+        values = {'total': total, 'auth': self.auth, 'serialization': self.serialization}
+        if with_queries:
+            values['db'] = self.db
+            values['queries'] = self.queries
+        return values
+
+
+class InstrumentedViewMixin:
+    """Time a DRF view's permission checks, handler and rendering."""
+
+    def initial(self, request, *args, **kwargs):
+        metrics = _current.get()
+        if metrics is None:
+            return super().initial(request, *args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            super().initial(request, *args, **kwargs)
+        finally:
+            metrics.auth = time.perf_counter() - started
+        metrics.handler_started = time.perf_counter()
+        metrics.handler_db = metrics.db
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        metrics = _current.get()
+        if metrics is None or metrics.handler_started is None:
+            return response
+
+        metrics.handler_finished = time.perf_counter()
+        metrics.serialization = (
+            metrics.handler_finished - metrics.handler_started) - (metrics.db - metrics.handler_db)
+        if hasattr(response, 'add_post_render_callback') and not response.is_rendered:
+            response.add_post_render_callback(lambda rendered: _add_render_time(metrics))
+        return response
+
+
+def _add_render_time(metrics):
+    metrics.serialization += time.perf_counter() - metrics.handler_finished
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not is_enabled():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self.record(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        if not is_enabled():
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        response = await self.get_response(request)
+        self.record(request, response, metrics, with_queries=False)
+        return response
+
+    def record(self, request, response, metrics, with_queries=True):
+        match = request.resolver_match
+        if match is None or not match.func.__module__.startswith('LittleLemonAPI.'):
+            return
+
+        values = metrics.values(time.perf_counter() - metrics.started, with_queries)
+        registry.observe(match.route, request.method, values)
+        if getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', False):
+            response['Server-Timing'] = server_timing(values)
+
+
+def server_timing(values):
+    entries = []
+    for name in ('db', 'auth', 'serialization', 'total'):
+        if values.get(name) is None:
+            continue
+        entry = f'{name};dur={values[name] * 1000:.2f}'
+        if name == 'db':
+            entry += f';desc="{values["queries"]} queries"'
+        entries.append(entry)
+    return ', '.join(entries)
+
+
+def render_prometheus():
+    """All histograms in the Prometheus text exposition format (0.0.4)."""
+    snapshot = registry.snapshot()
+    lines = []
+    for name, description, _, _ in METRICS:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for endpoint, method, buckets, total, count in snapshot.get(name, ()):
+            labels = f'endpoint="{_escape(endpoint)}",method="{method}"'
+            for bound, cumulative in buckets:
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {total}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_counter(name, description, label, values):
+    """A counter with one sample per `{label_value: count}` in `values`."""
+    lines = [f'# HELP {name} {description}', f'# TYPE {name} counter']
+    for value, count in sorted(values.items()):
+        lines.append(f'{name}{{{label}="{_escape(value)}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,101 @@
+"""A job queue kept in the database, run by `manage.py run_jobs`.
+
+Tasks are plain functions registered under a name with `@task`.
+`enqueue` inserts a `Job` row in the caller's transaction. The job
+therefore exists only if the request's writes commit, and a worker can
+only claim it after that commit. The request does not wait for the work.
+
+Workers claim due jobs with one UPDATE that leases them for
+`JOBS_LEASE` seconds. A job whose worker died is claimed again once its
+lease runs out. A job that raises is retried with exponential backoff
+until it has run `max_attempts` times, and is then kept as failed,
+with its traceback, for the admin. Finished jobs are deleted. Delivery
+is at least once, so tasks must be safe to run twice. Claiming works on
+SQLite, where the IMMEDIATE transaction serializes workers, and on
+databases with `SELECT ... FOR UPDATE SKIP LOCKED`.
+"""
+import datetime
+import logging
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+def task(name):
+    """Register the decorated function as the task `name`."""
+    def register(func):
+        _tasks[name] = func
+        return func
+    return register
+
+
+def get_max_attempts():
+    return getattr(settings, 'JOBS_MAX_ATTEMPTS', 5)
+
+
+def get_lease():
+    return datetime.timedelta(seconds=getattr(settings, 'JOBS_LEASE', 300))
+
+
+def enqueue(name, payload=None, delay=0, unique=False):
+    """Queue `name(**payload)` to run once the current transaction commits.
+
+    With `unique`, nothing is queued if a job of that name is already
+    waiting. Returns the job, or None if `unique` skipped it.
+    """
+    if name not in _tasks:
+        raise LookupError(f'Unknown task {name!r}')
+    if unique and Job.objects.filter(name=name, status=Job.QUEUED).exists():
+        return None
+    return Job.objects.create(
+        name=name, payload=payload or {}, max_attempts=get_max_attempts(),
+        run_after=timezone.now() + datetime.timedelta(seconds=delay))
+
+
+def claim(limit):
+    """Lease up to `limit` due jobs, oldest first, and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=Job.QUEUED, run_after__lte=now)
+                    | Q(status=Job.RUNNING, locked_until__lt=now))
+            .order_by('run_after', 'id')
+            .values_list('id', flat=True)[:limit])
+        Job.objects.filter(id__in=ids).update(
+            status=Job.RUNNING, locked_until=now + get_lease(), attempts=F('attempts') + 1)
+        return list(Job.objects.filter(id__in=ids).order_by('run_after', 'id'))
+
+
+def execute(job):
+    """Run a claimed job; return True if it succeeded."""
+    try:
+        func = _tasks.get(job.name)
+        if func is None:
+            raise LookupError(f'Unknown task {job.name!r}')
+        func(**job.payload)
+    except Exception:
+        logger.exception('Job %s failed (attempt %s of %s)', job, job.attempts, job.max_attempts)
+        failed = job.attempts >= job.max_attempts
+        Job.objects.filter(id=job.id).update(
+            status=Job.FAILED if failed else Job.QUEUED,
+            run_after=timezone.now() + backoff(job.attempts),
+            locked_until=None,
+            last_error=traceback.format_exc())
+        return False
+
+    Job.objects.filter(id=job.id).delete()
+    return True
+
+
+def backoff(attempts):
+    return datetime.timedelta(seconds=min(2 ** attempts, 300))
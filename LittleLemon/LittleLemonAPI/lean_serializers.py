@@ -0,0 +1,91 @@
+"""Read-only serializers that build output straight from `.values()` rows.
+
+Each one mirrors a DRF serializer from `serializers.py` field for field
+(same keys, same order, decimals as fixed-point strings, dates in ISO
+format, related objects as their `__str__`), so the rendered JSON is
+byte-identical. `ModelSerializer` builds field instances and calls
+`to_representation` on each of them for every row; these build plain
+dicts from the columns they select. `LeanReadMixin` in `views.py` uses
+them for GET list and retrieve requests when `settings.LEAN_SERIALIZERS`
+is on; `LeanSerializerContractTests` check the equivalence.
+"""
+from collections import defaultdict
+
+from .models import OrderItem
+
+
+def decimal(value):
+    # DecimalField.to_representation with COERCE_DECIMAL_TO_STRING; the
+    # database already returns values quantized to the field's places
+    return None if value is None else f'{value:f}'
+
+
+def date(value):
+    return None if value is None else value.isoformat()
+
+
+class LeanSerializer:
+    """`columns` are passed to `.values()`; `serialize` turns the rows into data."""
+    columns = ()
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+    def to_representation(self, row):
+        raise NotImplementedError
+
+
+class LeanMenuItemSerializer(LeanSerializer):
+    """`MenuItemSerializer`."""
+    columns = ('id', 'title', 'price', 'featured', 'category__title')
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'price': decimal(row['price']),
+            'featured': row['featured'],
+            'category': row['category__title'],
+        }
+
+
+class LeanOrderSerializer(LeanSerializer):
+    """`OrderSerializer`, with `OrderItemSerializer` for the nested items."""
+    columns = ('id', 'user__username', 'delivery_crew_id', 'status', 'total', 'date')
+
+    def serialize(self, rows):
+        rows = list(rows)
+        items = defaultdict(list)
+        # one query for every order on the page, like the prefetch it replaces
+        for order_id, *item in OrderItem.objects.filter(
+                order_id__in=[row['id'] for row in rows]).values_list(
+                'order_id', 'menuitem__title', 'quantity', 'unit_price', 'price'):
+            items[order_id].append(item)
+
+        return [self.to_representation(row, items[row['id']]) for row in rows]
+
+    def to_representation(self, row, items=()):
+        return {
+            'id': row['id'],
+            'user': row['user__username'],
+            'delivery_crew': self.delivery_crew(row),
+            'status': row['status'],
+            'total': decimal(row['total']),
+            'date': date(row['date']),
+            'orders': [
+                {'order': row['id'], 'menuitem': menuitem, 'quantity': quantity,
+                 'unit_price': decimal(unit_price), 'price': decimal(price)}
+                for menuitem, quantity, unit_price, price in items
+            ],
+        }
+
+    def delivery_crew(self, row):
+        return row['delivery_crew_id']
+
+
+class LeanSimpleOrderSerializer(LeanOrderSerializer):
+    """`SimpleOrderSerializer`: the crew member by username rather than id."""
+    columns = ('id', 'user__username', 'delivery_crew__username', 'status', 'total', 'date')
+
+    def delivery_crew(self, row):
+        return row['delivery_crew__username']
@@ -0,0 +1,138 @@
+import datetime
+import re
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.models import Category, MenuItem, Cart, Order, OrderItem
+from LittleLemonAPI.roles import MANAGER, DELIVERY_CREW
+
+# (role, path, tables the endpoint is expected to scan in full)
+ENDPOINTS = [
+    ('manager', '/api/category/', {'LittleLemonAPI_category'}),
+    ('manager', '/api/category/{category}/', set()),
+    ('anonymous', '/api/menu-items/', {'LittleLemonAPI_menuitem'}),
+    ('anonymous', '/api/menu-items/?ordering=price', set()),
+    ('anonymous', '/api/menu-items/?category={category}', set()),
+    ('anonymous', '/api/menu-items/?pagination=cursor&ordering=-price', set()),
+    ('anonymous', '/api/menu-items/?search=audit', set()),
+    ('anonymous', '/api/menu-items/{menuitem}/', set()),
+    ('customer', '/api/cart/', set()),
+    ('customer', '/api/cart/summary/', set()),
+    ('customer', '/api/orders/', set()),
+    ('customer', '/api/orders/?ordering=-date', set()),
+    ('customer', '/api/orders/?ordering=total', set()),
+    ('customer', '/api/orders/?pagination=cursor&ordering=-date', set()),
+    ('customer', '/api/orders/?pagination=cursor&ordering=total', set()),
+    ('delivery', '/api/orders/?ordering=-date', set()),
+    ('delivery', '/api/orders/?ordering=total', set()),
+    ('delivery', '/api/orders/?pagination=cursor&ordering=-date', set()),
+    ('manager', '/api/orders/?pagination=cursor&ordering=-date', set()),
+    ('manager', '/api/orders/?pagination=cursor&ordering=total', set()),
+    ('manager', '/api/orders/?search=audit', set()),
+    ('customer', '/api/orders/?search=audit', set()),
+    ('manager', '/api/orders/{order}/', set()),
+    ('manager', '/api/analytics/sales/', {'LittleLemonAPI_dailysales',
+                                          'LittleLemonAPI_monthlymenuitemsales',
+                                          'LittleLemonAPI_dailycategorysales'}),
+    ('manager', '/api/analytics/sales/?date__gte=2023-01-02&date__lte=2023-12-30', set()),
+]
+
+FULL_SCAN = re.compile(r'^SCAN (?P<table>\w+)(?: AS \w+)?$')
+
+
+class Command(BaseCommand):
+    help = ("Run every endpoint's queries through EXPLAIN QUERY PLAN and report "
+            "full table scans that are not expected.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN is only supported on SQLite')
+
+        with override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                CACHES={
+                    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                    'catalog': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+                }):
+            with transaction.atomic():
+                problems = self.audit(options['verbosity'])
+                # everything created for the audit is thrown away
+                transaction.set_rollback(True)
+
+        if problems:
+            raise CommandError(
+                'Unexpected full table scans:\n' + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('No unexpected full table scans'))
+
+    def audit(self, verbosity):
+        users, ids = self.seed()
+        client = APIClient()
+        problems = []
+
+        for role, path, allowed in ENDPOINTS:
+            path = path.format(**ids)
+            client.force_authenticate(users.get(role))
+
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(path)
+            if response.status_code >= 400:
+                raise CommandError(f'GET {path} as {role} returned {response.status_code}')
+
+            scans = set()
+            if verbosity >= 2:
+                self.stdout.write(f'GET {path} ({role})')
+            for query in ctx.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                plan = self.explain(query['sql'])
+                if verbosity >= 2:
+                    self.stdout.write(f"  {query['sql'][:100]}")
+                    for line in plan:
+                        self.stdout.write(f'    {line}')
+                for line in plan:
+                    match = FULL_SCAN.match(line)
+                    if match:
+                        scans.add(match['table'])
+
+            unexpected = scans - allowed
+            if unexpected:
+                problems.append(f"GET {path} ({role}): {', '.join(sorted(unexpected))}")
+            if verbosity >= 1:
+                status = 'FULL SCAN ' + ', '.join(sorted(unexpected)) if unexpected else 'ok'
+                self.stdout.write(f'{path:<55} {role:<10} {status}')
+
+        return problems
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def seed(self):
+        manager = User.objects.create_user('audit-manager')
+        manager.groups.add(Group.objects.get_or_create(name=MANAGER)[0])
+        delivery = User.objects.create_user('audit-delivery')
+        delivery.groups.add(Group.objects.get_or_create(name=DELIVERY_CREW)[0])
+        customer = User.objects.create_user('audit-customer')
+
+        category = Category.objects.create(slug='audit', title='Audit')
+        menuitem = MenuItem.objects.create(
+            title='Audit item', price=Decimal('1.00'), featured=False, category=category)
+        Cart.objects.create(
+            user=customer, menuitem=menuitem, quantity=1,
+            unit_price=menuitem.price, price=menuitem.price)
+        order = Order.objects.create(
+            user=customer, delivery_crew=delivery, total=menuitem.price,
+            date=datetime.date.today())
+        OrderItem.objects.create(
+            order=order, menuitem=menuitem, quantity=1,
+            unit_price=menuitem.price, price=menuitem.price)
+
+        users = {'manager': manager, 'delivery': delivery, 'customer': customer}
+        ids = {'category': category.id, 'menuitem': menuitem.id, 'order': order.id}
+        return users, ids
@@ -0,0 +1,25 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups from the orders table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', metavar='YYYY-MM-DD',
+            help='Only rebuild days on or after this date.')
+
+    def handle(self, *args, **options):
+        since = options['since']
+        if since is not None:
+            try:
+                since = datetime.date.fromisoformat(since)
+            except ValueError:
+                raise CommandError(f'Invalid date: {since}')
+
+        days = rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollups for {days} days'))
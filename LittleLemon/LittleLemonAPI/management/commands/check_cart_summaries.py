@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.cart_summary import rebuild
+
+
+class Command(BaseCommand):
+    help = ("Recompute every user's cart summary from the cart table, report "
+            "the ones that had drifted and fix them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report drift and exit with an error if there is any.')
+
+    def handle(self, *args, **options):
+        drift = rebuild(fix=not options['check'])
+
+        for user_id, (items, total), (actual_items, actual_total) in drift:
+            self.stdout.write(
+                f'user {user_id}: stored {items} items / {total}, '
+                f'actual {actual_items} items / {actual_total}')
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All cart summaries are consistent'))
+        elif options['check']:
+            raise CommandError(f'{len(drift)} cart summaries have drifted')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(drift)} cart summaries'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.dispatch import dispatch
+
+
+class Command(BaseCommand):
+    help = "Assign pending orders to the least-loaded delivery crew members."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, metavar='N',
+            help='Assign at most N orders, oldest first.')
+
+    def handle(self, *args, **options):
+        assignments = dispatch(options['limit'])
+        assigned = sum(len(order_ids) for order_ids in assignments.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Assigned {assigned} orders to {len(assignments)} delivery crew members'))
@@ -0,0 +1,59 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from LittleLemonAPI import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=4, metavar='N',
+            help='Run up to N jobs at a time; 1 runs them in this thread.')
+        parser.add_argument(
+            '--poll', type=float, default=1.0, metavar='SECONDS',
+            help='How long to wait before looking again when no job is due.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once no job is due instead of waiting for more.')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        if threads < 1:
+            raise CommandError('--threads must be at least 1')
+
+        succeeded = failed = 0
+        with ExitStack() as stack:
+            if threads > 1:
+                pool = stack.enter_context(ThreadPoolExecutor(threads))
+                run = lambda claimed: pool.map(self.execute_in_pool, claimed)  # noqa: E731
+            else:
+                run = lambda claimed: map(jobs.execute, claimed)  # noqa: E731
+
+            while True:
+                claimed = jobs.claim(threads)
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                for ok in run(claimed):
+                    if ok:
+                        succeeded += 1
+                    else:
+                        failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Ran {succeeded} jobs, {failed} failed'))
+
+    def execute_in_pool(self, job):
+        try:
+            return jobs.execute(job)
+        finally:
+            # pool threads outlive the job; do not leave connections open
+            connections.close_all()
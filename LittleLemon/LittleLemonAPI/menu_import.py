@@ -0,0 +1,122 @@
+"""Bulk create/update of menu items.
+
+Rows are validated and written in chunks: each chunk checks its
+category ids with one `IN` query, looks up the items it updates with
+another, then writes with one `bulk_create` and a `bulk_update` per set
+of changed fields; rows that change nothing are not written at all. A
+row is matched to an existing item by `id` when it has one and by
+exact `title` otherwise. Invalid rows are skipped and reported; the
+rest of the import is written in a single transaction.
+"""
+from itertools import islice
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import catalog_cache, changes
+from .models import Category, MenuItem
+from .serializers import MenuItemImportSerializer
+
+CHUNK_SIZE = 500
+UPDATE_FIELDS = ['title', 'price', 'featured', 'category_id']
+
+
+def import_menu_items(rows, chunk_size=CHUNK_SIZE):
+    """Upsert `rows` (an iterable of dicts) and return a summary.
+
+    The summary is `{'created': n, 'updated': n, 'unchanged': n,
+    'errors': [...]}`, each error being `{'row': <1-based row number>,
+    'errors': {...}}`.
+    """
+    result = {'created': 0, 'updated': 0, 'unchanged': 0, 'errors': []}
+    seen = set()
+    rows = enumerate(rows, 1)
+
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            _import_chunk(chunk, seen, result)
+
+        result['errors'].sort(key=lambda error: error['row'])
+
+        if result['created'] or result['updated']:
+            # bulk writes send no post_save, so invalidate by hand
+            changes.touch(MenuItem)
+            transaction.on_commit(catalog_cache.bump_version)
+
+    return result
+
+
+def _import_chunk(chunk, seen, result):
+    # one serializer validates every row; building a new one per row
+    # (deep-copying its fields) costs several times the validation itself
+    serializer = MenuItemImportSerializer()
+    valid = []
+    for number, row in chunk:
+        if not isinstance(row, dict):
+            result['errors'].append({'row': number, 'errors': {'non_field_errors': ['Expected an object.']}})
+            continue
+        try:
+            valid.append((number, serializer.run_validation(row)))
+        except ValidationError as exc:
+            result['errors'].append({'row': number, 'errors': exc.detail})
+
+    category_ids = {data['category_id'] for _, data in valid}
+    known_categories = set(
+        Category.objects.filter(id__in=category_ids).values_list('id', flat=True))
+
+    ids = {data['id'] for _, data in valid if 'id' in data}
+    titles = {data['title'] for _, data in valid if 'id' not in data}
+    existing_by_id = MenuItem.objects.in_bulk(ids)
+    existing_by_title = {}
+    for item in MenuItem.objects.filter(title__in=titles).order_by('id'):
+        existing_by_title.setdefault(item.title, []).append(item)
+
+    to_create, to_update = [], {}
+    for number, data in valid:
+        errors = {}
+        if data['category_id'] not in known_categories:
+            errors['category_id'] = ['Category not exists']
+        if ('title', data['title']) in seen:
+            errors['title'] = ['Duplicate title in this import']
+        if ('id', data.get('id')) in seen:
+            errors['id'] = ['Duplicate id in this import']
+
+        if 'id' in data:
+            item = existing_by_id.get(data['id'])
+            if item is None:
+                errors['id'] = ['Item not exists']
+        else:
+            matches = existing_by_title.get(data['title'], [])
+            if len(matches) > 1:
+                errors['title'] = ['Several menu items have this title; pass an id']
+            item = matches[0] if matches else None
+
+        if errors:
+            result['errors'].append({'row': number, 'errors': errors})
+            continue
+
+        seen.add(('title', data['title']))
+        if 'id' in data:
+            seen.add(('id', data['id']))
+        if item is None:
+            to_create.append(MenuItem(
+                title=data['title'], price=data['price'],
+                featured=data['featured'], category_id=data['category_id']))
+        else:
+            # bulk_update builds a CASE per row and field, so send only what changed
+            changed = tuple(field for field in UPDATE_FIELDS if getattr(item, field) != data[field])
+            if not changed:
+                result['unchanged'] += 1
+                continue
+            for field in changed:
+                setattr(item, field, data[field])
+            to_update.setdefault(changed, []).append(item)
+
+    MenuItem.objects.bulk_create(to_create)
+    result['created'] += len(to_create)
+    for fields, items in to_update.items():
+        MenuItem.objects.bulk_update(items, fields)
+        result['updated'] += len(items)
@@ -0,0 +1,147 @@
+"""Per-process snapshot of the whole menu for the app's home screen.
+
+`get` returns the featured items and every category with its items,
+already rendered as JSON and as gzipped JSON. The snapshot is tagged
+with the catalog version, which comes from the database's menu item
+and category `ChangeStamp`s (see `catalog_cache`). A worker re-reads
+that version at most every `CATALOG_VERSION_MAX_AGE` seconds. Any
+write, from any worker or from outside Django, therefore reaches every
+worker's snapshot within that time. A warm read in between costs no
+query.
+
+Each menu item is kept as its `LeanMenuItemSerializer` dict. When this
+process saves or deletes a menu item or category, `signals.py` reports
+the row once the write commits (`changed`). Each such write bumps its
+table's stamp by one. If the stamps have grown by exactly the number of
+reported writes, the next `get` re-reads only the reported rows, plus
+the items of a changed category, and re-encodes. Any other difference
+means someone else wrote too, for example another worker, a menu import
+or a `QuerySet.update`. The snapshot is then reloaded with one query
+per table.
+"""
+import gzip
+import threading
+from collections import Counter, namedtuple
+
+from . import catalog_cache
+from .lean_serializers import LeanMenuItemSerializer
+from .models import Category, MenuItem
+from .renderers import FastJSONRenderer
+
+Menu = namedtuple('Menu', 'version body gzipped')
+
+GZIP_LEVEL = 6
+
+
+class MenuSnapshot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._menu = None
+        # rows written by this process since `_menu` was built, and how
+        # many writes to each table that was
+        self._pending = set()
+        self._reported = Counter()
+        self._categories = {}
+        self._items = {}
+
+    def get(self):
+        """Return the `Menu` for the current catalog version."""
+        # after writes here, only a fresh read is sure to include them
+        fresh = bool(self._pending)
+        version = catalog_cache.current_version(fresh=fresh)
+        menu = self._menu
+        if menu is not None and menu.version == version:
+            return menu
+        with self._lock:
+            if self._menu is None or self._menu.version != version:
+                if self._pending and not fresh:
+                    version = catalog_cache.current_version(fresh=True)
+                if self._only_reported_writes_since(version):
+                    self._apply()
+                else:
+                    # rows read after the version was: never older than it
+                    self._reload()
+                self._pending = set()
+                self._reported = Counter()
+                self._menu = self._encode(version)
+        return self._menu
+
+    def changed(self, model, pk):
+        """Note that this process saved or deleted `model` row `pk`."""
+        with self._lock:
+            if self._menu is None:
+                return
+            self._pending.add((model, pk))
+            self._reported[model] += 1
+
+    def _only_reported_writes_since(self, version):
+        if self._menu is None or not self._pending:
+            return False
+        built = self._menu.version
+        return (version.menuitems == built.menuitems + self._reported[MenuItem]
+                and version.categories == built.categories + self._reported[Category])
+
+    def clear(self):
+        with self._lock:
+            self._menu = None
+            self._pending = set()
+            self._reported = Counter()
+            self._categories = {}
+            self._items = {}
+
+    def _reload(self):
+        # items first: a category committed before its items is never missed
+        self._items = _fetch_items(MenuItem.objects.all())
+        self._categories = _fetch_categories(Category.objects.all())
+
+    def _apply(self):
+        categories = {pk for model, pk in self._pending if model is Category}
+        items = {pk for model, pk in self._pending if model is MenuItem}
+        if categories:
+            for pk in categories:
+                self._categories.pop(pk, None)
+            self._categories.update(_fetch_categories(Category.objects.filter(id__in=categories)))
+            # the category title is part of every one of its items
+            items |= {pk for pk, (category_id, _) in self._items.items() if category_id in categories}
+        if items:
+            for pk in items:
+                self._items.pop(pk, None)
+            fetched = _fetch_items(MenuItem.objects.filter(id__in=items))
+            self._items.update(fetched)
+            unknown = {category_id for category_id, _ in fetched.values()} - self._categories.keys()
+            if unknown:
+                self._categories.update(_fetch_categories(Category.objects.filter(id__in=unknown)))
+
+    def _encode(self, version):
+        groups = {
+            pk: {**category, 'items': []} for pk, category in sorted(self._categories.items())}
+        featured = []
+        for pk in sorted(self._items):
+            category_id, item = self._items[pk]
+            if category_id not in groups:
+                # deleted with its last item after the items were read
+                continue
+            groups[category_id]['items'].append(item)
+            if item['featured']:
+                featured.append(item)
+        body = FastJSONRenderer().render({'featured': featured, 'categories': list(groups.values())})
+        return Menu(version, body, gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0))
+
+
+snapshot = MenuSnapshot()
+
+
+def get():
+    return snapshot.get()
+
+
+def _fetch_categories(queryset):
+    return {row['id']: row for row in queryset.values('id', 'slug', 'title')}
+
+
+def _fetch_items(queryset):
+    serializer = LeanMenuItemSerializer()
+    return {
+        row['id']: (row['category_id'], serializer.to_representation(row))
+        for row in queryset.values(*serializer.columns, 'category_id')
+    }
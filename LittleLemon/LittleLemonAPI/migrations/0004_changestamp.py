@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:07
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+TRACKED_TABLES = ['LittleLemonAPI.order', 'LittleLemonAPI.orderitem',
+                  'LittleLemonAPI.menuitem', 'auth.user']
+
+
+def seed_stamps(apps, schema_editor):
+    ChangeStamp = apps.get_model('LittleLemonAPI', 'ChangeStamp')
+    now = timezone.now()
+    ChangeStamp.objects.bulk_create(
+        [ChangeStamp(table=table, version=0, modified=now) for table in TRACKED_TABLES])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0003_alter_orderitem_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeStamp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('modified', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(seed_stamps, migrations.RunPython.noop),
+    ]
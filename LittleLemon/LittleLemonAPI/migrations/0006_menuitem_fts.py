@@ -0,0 +1,68 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+FTS_TABLE = 'LittleLemonAPI_menuitem_fts'
+
+CREATE_INDEX = [
+    f"""CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5(title, category, tokenize='trigram')""",
+    f"""INSERT INTO "{FTS_TABLE}" (rowid, title, category)
+        SELECT m.id, m.title, c.title
+        FROM "LittleLemonAPI_menuitem" m JOIN "LittleLemonAPI_category" c ON c.id = m.category_id""",
+    f"""CREATE TRIGGER "{FTS_TABLE}_insert" AFTER INSERT ON "LittleLemonAPI_menuitem" BEGIN
+        INSERT INTO "{FTS_TABLE}" (rowid, title, category)
+        SELECT new.id, new.title, c.title FROM "LittleLemonAPI_category" c WHERE c.id = new.category_id;
+    END""",
+    f"""CREATE TRIGGER "{FTS_TABLE}_update" AFTER UPDATE OF title, category_id ON "LittleLemonAPI_menuitem" BEGIN
+        DELETE FROM "{FTS_TABLE}" WHERE rowid = old.id;
+        INSERT INTO "{FTS_TABLE}" (rowid, title, category)
+        SELECT new.id, new.title, c.title FROM "LittleLemonAPI_category" c WHERE c.id = new.category_id;
+    END""",
+    f"""CREATE TRIGGER "{FTS_TABLE}_delete" AFTER DELETE ON "LittleLemonAPI_menuitem" BEGIN
+        DELETE FROM "{FTS_TABLE}" WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER "{FTS_TABLE}_category" AFTER UPDATE OF title ON "LittleLemonAPI_category" BEGIN
+        UPDATE "{FTS_TABLE}" SET category = new.title
+        WHERE rowid IN (SELECT id FROM "LittleLemonAPI_menuitem" WHERE category_id = new.id);
+    END""",
+]
+
+DROP_INDEX = [
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_category"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_delete"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_update"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_insert"',
+    f'DROP TABLE IF EXISTS "{FTS_TABLE}"',
+]
+
+
+def create_index(apps, schema_editor):
+    # Search falls back to LIKE scans when the database has no FTS5
+    # trigram support, so a missing index is not an error.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(CREATE_INDEX[0])
+    except OperationalError:
+        return
+    for statement in CREATE_INDEX[1:]:
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_INDEX:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0005_order_cart_access_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def summarize_carts(apps, schema_editor):
+    Cart = apps.get_model('LittleLemonAPI', 'Cart')
+    CartSummary = apps.get_model('LittleLemonAPI', 'CartSummary')
+    CartSummary.objects.bulk_create([
+        CartSummary(user_id=row['user_id'], items=row['items'], total=row['total'])
+        for row in Cart.objects.order_by().values('user_id').annotate(
+            items=Sum('quantity'), total=Sum('price'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0006_menuitem_fts'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cart_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('items', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+            ],
+        ),
+        migrations.RunPython(summarize_carts, migrations.RunPython.noop),
+    ]
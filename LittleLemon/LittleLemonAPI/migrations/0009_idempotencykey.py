@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0008_daily_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.BinaryField(max_length=32, unique=True)),
+                ('fingerprint', models.BinaryField(max_length=32)),
+                ('status', models.PositiveSmallIntegerField()),
+                ('response', models.BinaryField()),
+                ('expires', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+STAMPED_TABLES = {
+    'LittleLemonAPI.menuitem': 'LittleLemonAPI_menuitem',
+    'LittleLemonAPI.category': 'LittleLemonAPI_category',
+}
+EVENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+# one bump per row written, whatever wrote it: QuerySet.update, bulk
+# inserts, the admin, data migrations and raw SQL included
+CREATE_TRIGGER = """CREATE TRIGGER "{db_table}_stamp_{event}" AFTER {event} ON "{db_table}" BEGIN
+    INSERT INTO "LittleLemonAPI_changestamp" ("table", "version", "modified")
+    VALUES ('{table}', 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    ON CONFLICT ("table") DO UPDATE SET "version" = "version" + 1, "modified" = excluded."modified";
+END"""
+
+DROP_TRIGGER = 'DROP TRIGGER IF EXISTS "{db_table}_stamp_{event}"'
+
+
+def create_triggers(apps, schema_editor):
+    # changes.touch stamps these tables itself on other databases
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, db_table in STAMPED_TABLES.items():
+        for event in EVENTS:
+            schema_editor.execute(CREATE_TRIGGER.format(table=table, db_table=db_table, event=event))
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for db_table in STAMPED_TABLES.values():
+        for event in EVENTS:
+            schema_editor.execute(DROP_TRIGGER.format(db_table=db_table, event=event))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0010_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
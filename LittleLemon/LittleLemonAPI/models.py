@@ -32,6 +32,17 @@ class Cart(models.Model):
 
     class Meta:
         unique_together = ('menuitem', 'user')
+        indexes = [
+            models.Index(fields=['user', 'menuitem'], name='cart_user_menuitem_idx'),
+        ]
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Fetch everything the order serializers render in a fixed number of queries."""
+        return self.select_related('user', 'delivery_crew').prefetch_related(
+            models.Prefetch(
+                'orders', queryset=OrderItem.objects.select_related('menuitem')))
 
 
 class Order(models.Model):
@@ -42,6 +53,17 @@ class Order(models.Model):
     total = models.DecimalField(max_digits=6, decimal_places=2)
     date = models.DateField(db_index=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['total', 'id'], name='order_total_idx'),
+            models.Index(fields=['user', 'date', 'id'], name='order_user_date_idx'),
+            models.Index(fields=['user', 'total', 'id'], name='order_user_total_idx'),
+            models.Index(fields=['delivery_crew', 'date', 'id'], name='order_crew_date_idx'),
+            models.Index(fields=['delivery_crew', 'total', 'id'], name='order_crew_total_idx'),
+        ]
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(
@@ -53,3 +75,115 @@ class OrderItem(models.Model):
 
     class Meta:
         unique_together = ('order', 'menuitem')
+
+
+class ChangeStamp(models.Model):
+    """Per-table modification version, bumped whenever a tracked table changes."""
+    table = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    modified = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f'{self.table}@{self.version}'
+
+
+class CartSummary(models.Model):
+    """Denormalized item count and total of a user's cart."""
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='cart_summary')
+    items = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    def __str__(self) -> str:
+        return f'{self.user_id}: {self.items} items, {self.total}'
+
+
+class IdempotencyKey(models.Model):
+    """The stored response to a POST sent with an `Idempotency-Key` header."""
+    # sha256 of the user, method, path and key
+    digest = models.BinaryField(max_length=32, unique=True)
+    # sha256 of the request data, to refuse a key reused for another request
+    fingerprint = models.BinaryField(max_length=32)
+    status = models.PositiveSmallIntegerField()
+    response = models.BinaryField()
+    expires = models.DateTimeField(db_index=True)
+
+
+class Job(models.Model):
+    """Background work for the `run_jobs` command; see `jobs.py`."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    run_after = models.DateTimeField()
+    # a running job whose lease has expired is claimed again
+    locked_until = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} #{self.id} ({self.status})'
+
+
+class DailySales(models.Model):
+    """Orders placed on a day and their combined total.
+
+    The rollup columns are signed: deleting an order the rollups never
+    counted leaves a negative value until `backfill_sales_rollups` runs,
+    rather than failing the delete.
+    """
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+
+class DailyMenuItemSales(models.Model):
+    """Per-day sales of one menu item; `orders` counts orders containing it."""
+    date = models.DateField()
+    # No index of its own: given one, SQLite groups by it and scans the
+    # table instead of range-seeking the (date, menuitem) unique index.
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE, db_index=False)
+    orders = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'menuitem')
+
+
+class MonthlyMenuItemSales(models.Model):
+    """`DailyMenuItemSales` summed per calendar month (`month` is its first day),
+    so ranges spanning whole months read a twelfth of a year's rows."""
+    month = models.DateField()
+    # see DailyMenuItemSales.menuitem
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE, db_index=False)
+    orders = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('month', 'menuitem')
+
+
+class DailyCategorySales(models.Model):
+    """Per-day sales of one category, by the item's category at checkout."""
+    date = models.DateField()
+    # see DailyMenuItemSales.menuitem
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, db_index=False)
+    orders = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'category')
@@ -0,0 +1,198 @@
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PaginationClass(PageNumberPagination):
+    page_size = 3
+    page_size_query_param = 'page_size'
+    max_page_size = 6
+
+
+class CursorPaginationClass(PaginationClass):
+    """Page-number pagination, or keyset pagination with `?pagination=cursor`.
+
+    In cursor mode pages are located by the values of the current ordering
+    (plus `id` as a tie-breaker) instead of `COUNT(*)` and `OFFSET`, so a
+    deep page costs the same as the first one when the ordering is indexed.
+    """
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = request.query_params.get(self.mode_query_param) == 'cursor'
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        queryset = self.get_cursor_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_cursor_results(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async counterpart of `paginate_queryset` for the ASGI read views."""
+        self.cursor_mode = request.query_params.get(self.mode_query_param) == 'cursor'
+        if self.cursor_mode:
+            queryset = self.get_cursor_queryset(queryset, request)
+            if queryset is None:
+                return None
+            return self.set_cursor_results([row async for row in queryset])
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class([], page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+
+        bottom = (number - 1) * page_size
+        results = [row async for row in queryset[bottom:bottom + page_size]]
+        self.page = Page(results, number, paginator)
+        return results
+
+    def get_cursor_queryset(self, queryset, request):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.request = request
+        self.cursor_page_size = page_size
+        self.ordering = self.get_ordering(queryset)
+        self.position, self.reverse = self.decode_cursor(request)
+
+        if self.position is None:
+            queryset = queryset.order_by(*self.ordering)
+        elif self.reverse:
+            queryset = self.filter_beyond(queryset, self.position, reverse=True).order_by(
+                *[self.flip(field) for field in self.ordering])
+        else:
+            queryset = self.filter_beyond(queryset, self.position).order_by(*self.ordering)
+
+        return queryset[:page_size + 1]
+
+    def set_cursor_results(self, results):
+        has_more = len(results) > self.cursor_page_size
+        results = results[:self.cursor_page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = self.position is not None, has_more
+
+        self.results = results
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or not self.results:
+            return None
+        return self.encode_cursor(self.results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        if not self.results:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.results[0], reverse=True)
+
+    def get_ordering(self, queryset):
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str)]
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            # Break ties in the direction of the last field so an index on
+            # that field (which ends with the row id) covers the ordering.
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append('-id' if descending else 'id')
+        return ordering
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def lookup(field, descending_op, ascending_op, reverse):
+        descending = field.startswith('-') != reverse
+        return f"{field.lstrip('-')}__{descending_op if descending else ascending_op}"
+
+    def filter_beyond(self, queryset, position, reverse=False):
+        """Keep the rows strictly after `position` in the current ordering."""
+        conditions = []
+        for index, field in enumerate(self.ordering):
+            lookup = self.lookup(field, 'lt', 'gt', reverse)
+            equal = {
+                self.ordering[i].lstrip('-'): position[i] for i in range(index)}
+            conditions.append(Q(**equal, **{lookup: position[index]}))
+
+        # The redundant range on the leading field lets the database seek
+        # into its index instead of evaluating the OR over every row.
+        leading = Q(**{self.lookup(self.ordering[0], 'lte', 'gte', reverse): position[0]})
+
+        try:
+            return queryset.filter(leading, reduce(or_, conditions))
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, instance, reverse):
+        position = []
+        for field in self.ordering:
+            if isinstance(instance, dict):
+                # a `.values()` row from the lean serializers
+                value = instance[field.lstrip('-')]
+            else:
+                value = instance
+                for attr in field.lstrip('-').split('__'):
+                    value = getattr(value, attr)
+            position.append(str(value))
+
+        encoded = base64.urlsafe_b64encode(
+            json.dumps({'p': position, 'r': int(reverse)}).encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, encoded)
@@ -0,0 +1,78 @@
+"""Line-oriented parsers for bulk uploads, and a faster JSON parser.
+
+The line-oriented parsers return a lazy iterator of row dicts, so the
+request body is read as the rows are consumed instead of being loaded in
+one piece. `FastJSONParser` is DRF's `JSONParser` decoding with orjson
+when it is installed.
+"""
+import codecs
+import csv
+import io
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _lines(stream, parser_context):
+    encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for line in stream:
+        yield decoder.decode(line)
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read()
+        try:
+            return orjson.loads(body if encoding.lower() in ('utf-8', 'utf8') else body.decode(encoding))
+        except (orjson.JSONDecodeError, UnicodeDecodeError):
+            # JSONParser words the error, or accepts what orjson can't
+            # represent, such as integers wider than 64 bits
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+class NDJSONParser(BaseParser):
+    """One JSON object per line; blank lines are ignored."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return iter(())
+        return self.rows(stream, parser_context)
+
+    def rows(self, stream, parser_context):
+        for number, line in enumerate(_lines(stream, parser_context), 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                raise ParseError(f'Line {number}: NDJSON parse error - {exc}')
+
+
+class CSVParser(BaseParser):
+    """CSV with a header row; empty cells are treated as missing."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return iter(())
+        return self.rows(stream, parser_context)
+
+    def rows(self, stream, parser_context):
+        try:
+            for row in csv.DictReader(_lines(stream, parser_context)):
+                yield {key: value for key, value in row.items() if key and value not in ('', None)}
+        except csv.Error as exc:
+            raise ParseError(f'CSV parse error - {exc}')
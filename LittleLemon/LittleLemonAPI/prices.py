@@ -0,0 +1,92 @@
+"""Per-process snapshot of menu item prices for cart pricing and checkout.
+
+`lookup` and `lookup_many` answer from a dict of every menu item's
+`(price, category_id)`. The dict is loaded with one query. It is tagged
+with the catalog version (`catalog_cache.current_version()`), which is
+built from the database's menu item and category `ChangeStamp`s. On
+SQLite, triggers bump those on every write, including `QuerySet.update`,
+bulk imports, the admin and data migrations. Saves and deletes made in
+this process are seen as soon as they commit. Any other write is seen
+once the cached version expires, after at most
+`CATALOG_VERSION_MAX_AGE` seconds. The dict is then reloaded on the
+next lookup.
+
+Ids missing from the snapshot, such as items created elsewhere within
+that window, are looked up in the database. `lookup_many(...,
+reload=False)` never loads the whole menu. When the snapshot is out of
+date, it reads just the ids asked for. Checkout uses it so the reload
+does not hold the SQLite write lock.
+
+`settings.PRICE_SNAPSHOT = False` sends every lookup to the database.
+"""
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+
+from . import catalog_cache
+from .models import MenuItem
+
+Price = namedtuple('Price', 'price category_id')
+
+
+class PriceSnapshot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._prices = {}
+
+    def get(self, reload=True):
+        """Return the `{menuitem_id: Price}` dict for the current catalog
+        version, or None if it is out of date and `reload` is not set."""
+        version = catalog_cache.current_version()
+        if self._version != version:
+            if not reload:
+                return None
+            with self._lock:
+                if self._version != version:
+                    # rows read after the version was: never older than it
+                    self._prices = _fetch(MenuItem.objects.all())
+                    self._version = version
+        return self._prices
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._prices = {}
+
+
+snapshot = PriceSnapshot()
+
+
+def is_enabled():
+    return getattr(settings, 'PRICE_SNAPSHOT', True)
+
+
+def lookup(menuitem_id):
+    """Return the `Price` of a menu item, or None if it does not exist."""
+    return lookup_many([menuitem_id]).get(menuitem_id)
+
+
+def lookup_many(menuitem_ids, reload=True):
+    """Return `{menuitem_id: Price}` for those of `menuitem_ids` that exist.
+
+    Without `reload`, an out-of-date snapshot is not reloaded and every id
+    is read from the database instead.
+    """
+    menuitem_ids = set(menuitem_ids)
+    found = {}
+    prices = snapshot.get(reload) if is_enabled() else None
+    if prices is not None:
+        found = {menuitem_id: prices[menuitem_id] for menuitem_id in menuitem_ids if menuitem_id in prices}
+    missing = menuitem_ids - found.keys()
+    if missing:
+        found.update(_fetch(MenuItem.objects.filter(id__in=missing)))
+    return found
+
+
+def _fetch(queryset):
+    return {
+        menuitem_id: Price(price, category_id)
+        for menuitem_id, price, category_id in queryset.values_list('id', 'price', 'category_id')
+    }
@@ -0,0 +1,90 @@
+"""Renderers for line-oriented downloads, and a faster JSON renderer.
+
+Besides the usual `render`, the line-oriented renderers have a
+`stream(rows)` generator that encodes an iterable of flat dicts one line
+at a time, for use with `StreamingHttpResponse`.
+
+`FastJSONRenderer` produces the same bytes as DRF's `JSONRenderer` but
+encodes with orjson when it is installed. Dates and datetimes still go
+through DRF's `JSONEncoder`; serializers already turn decimals into
+strings, and a raw `Decimal` sends the whole response to DRF's renderer,
+as do indented or ASCII-only output and a missing orjson. Plain floats
+are orjson's: the same digits, but exponents are spelled `1e-7`, not
+`1e-07`.
+"""
+import csv
+import decimal
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = 0 if orjson is None else (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or not self.compact or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        encode = self.encoder_class().default
+
+        def default(obj):
+            if isinstance(obj, decimal.Decimal):
+                # JSONEncoder writes these as floats with repr(); orjson
+                # spells exponents differently (1e-6, not 1e-06)
+                raise TypeError
+            return encode(obj)
+
+        try:
+            ret = orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # raw Decimals, integers wider than 64 bits, unknown types
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # JSONRenderer escapes these so the output is valid JavaScript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = [data] if isinstance(data, dict) else data
+        return b''.join(self.stream(rows))
+
+    def stream(self, rows):
+        for row in rows:
+            yield (json.dumps(row) + '\n').encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """CSV with a header row taken from the keys of the first row."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = [data] if isinstance(data, dict) else data
+        return b''.join(self.stream(rows))
+
+    def stream(self, rows):
+        buffer = io.StringIO()
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+
+from .changes import StampedTTLCache
+
+MANAGER = "Manager"
+DELIVERY_CREW = "delivery crew"
+
+
+def get_max_age():
+    return getattr(settings, 'AUTH_VERSION_MAX_AGE', 2)
+
+
+# emptied when group membership or a group changes in any worker
+_role_cache = StampedTTLCache(
+    [User.groups.through, Group], get_max_age,
+    maxsize=getattr(settings, 'ROLE_CACHE_MAXSIZE', 1024),
+    ttl=getattr(settings, 'ROLE_CACHE_TTL', 300),
+)
+
+
+def get_roles(user) -> frozenset:
+    """Return the names of the groups `user` belongs to.
+
+    The first call for a user runs a single query; later calls are served
+    from a process-wide LRU/TTL cache. A change to group membership made
+    in this process drops the user's entry at once. One made in another
+    worker empties the cache within `AUTH_VERSION_MAX_AGE` seconds, when
+    the membership stamps are next read.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    generation = _role_cache.validate()
+    roles = _role_cache.get(user.pk)
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        _role_cache.set(user.pk, roles, generation)
+
+    return roles
+
+
+async def aget_roles(user) -> frozenset:
+    """Async counterpart of `get_roles`, sharing the same cache."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    generation = await _role_cache.avalidate()
+    roles = _role_cache.get(user.pk)
+    if roles is None:
+        roles = frozenset(
+            [name async for name in user.groups.values_list('name', flat=True)])
+        _role_cache.set(user.pk, roles, generation)
+
+    return roles
+
+
+def is_manager(user) -> bool:
+    return MANAGER in get_roles(user)
+
+
+def is_delivery_crew(user) -> bool:
+    return DELIVERY_CREW in get_roles(user)
+
+
+def invalidate_roles(user_id):
+    _role_cache.delete(user_id)
+
+
+def clear_role_cache():
+    _role_cache.clear()
+
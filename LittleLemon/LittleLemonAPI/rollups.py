@@ -0,0 +1,221 @@
+"""Daily sales rollups.
+
+`DailySales`, `DailyMenuItemSales`, `MonthlyMenuItemSales` and
+`DailyCategorySales` hold order counts, quantities and revenue so the
+analytics endpoint never reads `Order`/`OrderItem`. Checkout calls
+`add_order` and deleting an order calls `remove_order`, each in the same
+transaction as the write and with a fixed number of queries: every table
+gets one `INSERT ... ON CONFLICT DO NOTHING` to make sure its rows exist
+and one relative `UPDATE` for all of them. Writes that bypass these
+paths (the admin, cascades) are repaired by `rebuild`, which the
+`backfill_sales_rollups` command runs.
+"""
+import datetime
+import operator
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import TruncMonth
+
+from . import prices
+from .models import (
+    Category,
+    DailyCategorySales,
+    DailyMenuItemSales,
+    DailySales,
+    MenuItem,
+    MonthlyMenuItemSales,
+    Order,
+    OrderItem,
+)
+
+
+def add_order(order, lines):
+    """Count a new order; `lines` are `(menuitem_id, quantity, price)`."""
+    lines = list(lines)
+    # categories come from the price snapshot rather than another query;
+    # checkout holds the write lock, so never reload the whole menu here
+    items = prices.lookup_many((menuitem_id for menuitem_id, *_ in lines), reload=False)
+    _apply(order.date, order.total, [
+        (menuitem_id, items[menuitem_id].category_id, quantity, price)
+        for menuitem_id, quantity, price in lines
+    ], sign=1)
+
+
+def remove_order(order):
+    """Take a to-be-deleted order back out of the rollups."""
+    lines = OrderItem.objects.filter(order=order).values_list(
+        'menuitem_id', 'menuitem__category_id', 'quantity', 'price')
+    _apply(order.date, order.total, list(lines), sign=-1)
+
+
+def _apply(date, total, lines, sign):
+    menuitems = defaultdict(lambda: [0, 0, Decimal(0)])
+    categories = defaultdict(lambda: [0, 0, Decimal(0)])
+    for menuitem_id, category_id, quantity, price in lines:
+        for totals, key in ((menuitems, menuitem_id), (categories, category_id)):
+            totals[key][1] += quantity
+            totals[key][2] += price
+    # an order counts once per menu item and once per category it contains
+    for totals in (menuitems, categories):
+        for values in totals.values():
+            values[0] = 1
+
+    DailySales.objects.bulk_create([DailySales(date=date)], ignore_conflicts=True)
+    DailySales.objects.filter(date=date).update(
+        orders=F('orders') + sign, revenue=F('revenue') + sign * total)
+    _add(DailyMenuItemSales, {'date': date}, 'menuitem_id', menuitems, sign)
+    _add(MonthlyMenuItemSales, {'month': date.replace(day=1)}, 'menuitem_id', menuitems, sign)
+    _add(DailyCategorySales, {'date': date}, 'category_id', categories, sign)
+
+
+def _add(model, period, key_field, deltas, sign):
+    """Add `sign * (orders, quantity, revenue)` to the `deltas[key]` row of `model`."""
+    if not deltas:
+        return
+
+    model.objects.bulk_create(
+        [model(**period, **{key_field: key}) for key in deltas], ignore_conflicts=True)
+
+    def delta(index, output_field):
+        return Case(
+            *[When(**{key_field: key}, then=Value(sign * values[index]))
+              for key, values in deltas.items()],
+            default=Value(0), output_field=output_field)
+
+    model.objects.filter(**period, **{f'{key_field}__in': list(deltas)}).update(
+        orders=F('orders') + delta(0, IntegerField()),
+        quantity=F('quantity') + delta(1, IntegerField()),
+        revenue=F('revenue') + delta(2, DecimalField(max_digits=12, decimal_places=2)))
+
+
+def rebuild(since=None):
+    """Recompute the rollups from the orders, for every day from `since` on.
+
+    Monthly rows are rebuilt from the start of `since`'s month. Returns
+    the number of days rebuilt.
+    """
+    orders = Order.objects.order_by()
+    items = OrderItem.objects.order_by()
+    monthly_items = items
+    daily = [DailySales.objects.all(), DailyMenuItemSales.objects.all(),
+             DailyCategorySales.objects.all()]
+    monthly = MonthlyMenuItemSales.objects.all()
+    if since is not None:
+        orders = orders.filter(date__gte=since)
+        items = items.filter(order__date__gte=since)
+        monthly_items = monthly_items.filter(order__date__gte=since.replace(day=1))
+        daily = [rows.filter(date__gte=since) for rows in daily]
+        monthly = monthly.filter(month__gte=since.replace(day=1))
+
+    def sales(queryset, period, key):
+        return queryset.values(period, key).annotate(
+            orders=Count('order_id', distinct=True), quantity=Sum('quantity'), revenue=Sum('price'))
+
+    with transaction.atomic():
+        for rows in daily + [monthly]:
+            rows.delete()
+
+        days = DailySales.objects.bulk_create([
+            DailySales(**row) for row in orders.values('date').annotate(
+                orders=Count('id'), revenue=Sum('total'))
+        ])
+        DailyMenuItemSales.objects.bulk_create([
+            DailyMenuItemSales(date=row['order__date'], menuitem_id=row['menuitem_id'],
+                               orders=row['orders'], quantity=row['quantity'], revenue=row['revenue'])
+            for row in sales(items, 'order__date', 'menuitem_id')
+        ], batch_size=1000)
+        MonthlyMenuItemSales.objects.bulk_create([
+            MonthlyMenuItemSales(month=row['month'], menuitem_id=row['menuitem_id'],
+                                 orders=row['orders'], quantity=row['quantity'], revenue=row['revenue'])
+            for row in sales(monthly_items.annotate(month=TruncMonth('order__date')), 'month', 'menuitem_id')
+        ], batch_size=1000)
+        DailyCategorySales.objects.bulk_create([
+            DailyCategorySales(date=row['order__date'], category_id=row['menuitem__category_id'],
+                               orders=row['orders'], quantity=row['quantity'], revenue=row['revenue'])
+            for row in sales(items, 'order__date', 'menuitem__category_id')
+        ], batch_size=1000)
+
+    return len(days)
+
+
+def report(start=None, end=None, limit=10):
+    """Sales between `start` and `end` (inclusive, either may be open).
+
+    Returns `{'days': [...], 'categories': [...], 'menu_items': [...]}`;
+    menu items are the `limit` best sellers by revenue.
+    """
+    date_range = _range('date', start, end)
+    days = list(DailySales.objects.filter(**date_range).order_by('date').values(
+        'date', 'orders', 'revenue'))
+    categories = _breakdown(
+        _totals(DailyCategorySales.objects.filter(**date_range), 'category_id'), Category)
+    menuitems = _breakdown(_menuitem_totals(start, end), MenuItem, limit)
+    return {'days': days, 'categories': categories, 'menu_items': menuitems}
+
+
+def _menuitem_totals(start, end):
+    """Per-item totals, reading whole months from `MonthlyMenuItemSales`
+    and only the partial months at either end from `DailyMenuItemSales`."""
+    # the whole months are [first_month, after_last_month)
+    first_month = start if start is None or start.day == 1 else _next_month(start)
+    after_last_month = None
+    if end is not None:
+        after_last_month = _next_month(end)
+        if after_last_month - datetime.timedelta(days=1) != end:
+            after_last_month = end.replace(day=1)
+
+    if start is not None and end is not None and first_month >= after_last_month:
+        return _totals(DailyMenuItemSales.objects.filter(**_range('date', start, end)), 'menuitem_id')
+
+    months = {}
+    if first_month is not None:
+        months['month__gte'] = first_month
+    if after_last_month is not None:
+        months['month__lt'] = after_last_month
+    totals = _totals(MonthlyMenuItemSales.objects.filter(**months), 'menuitem_id')
+
+    edges = []
+    if start is not None and start < first_month:
+        edges.append(Q(date__gte=start, date__lt=first_month))
+    if end is not None and after_last_month <= end:
+        edges.append(Q(date__gte=after_last_month, date__lte=end))
+    if edges:
+        days = DailyMenuItemSales.objects.filter(reduce(operator.or_, edges))
+        for key, values in _totals(days, 'menuitem_id').items():
+            current = totals.get(key, (0, 0, Decimal(0)))
+            totals[key] = tuple(a + b for a, b in zip(current, values))
+    return totals
+
+
+def _next_month(date):
+    return (date.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _range(field, start, end):
+    bounds = {}
+    if start is not None:
+        bounds[f'{field}__gte'] = start
+    if end is not None:
+        bounds[f'{field}__lte'] = end
+    return bounds
+
+
+def _totals(queryset, key):
+    return {
+        row[key]: (row['total_orders'], row['total_quantity'], row['total_revenue'])
+        for row in queryset.values(key).annotate(
+            total_orders=Sum('orders'), total_quantity=Sum('quantity'), total_revenue=Sum('revenue'))
+    }
+
+
+def _breakdown(totals, model, limit=None):
+    rows = sorted(totals.items(), key=lambda row: (-row[1][2], row[0]))[:limit]
+    titles = dict(model.objects.filter(id__in=[key for key, _ in rows]).values_list('id', 'title'))
+    return [
+        {'id': key, 'title': titles.get(key), 'orders': orders, 'quantity': quantity, 'revenue': revenue}
+        for key, (orders, quantity, revenue) in rows
+    ]
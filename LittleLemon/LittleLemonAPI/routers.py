@@ -0,0 +1,36 @@
+"""Database routing for the production database profile.
+
+Reads of the menu, categories and orders go to the `replica` alias, a
+`query_only` connection to the same SQLite file. In WAL mode those
+reads never wait for the writer and always see every committed write.
+Everything else, and every write, goes to `default`.
+
+Inside a transaction on `default`, reads stay on `default` too, so a
+request sees its own uncommitted writes. One example is an order
+rendered right after checkout inside an idempotency-key transaction.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+
+
+class ReadReplicaRouter:
+    app_label = 'LittleLemonAPI'
+    replica_models = {'category', 'menuitem', 'order', 'orderitem'}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != self.app_label or model._meta.model_name not in self.replica_models:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,82 @@
+"""`?search=` answered from an SQLite FTS5 index instead of `LIKE` scans.
+
+The index (created by migration 0006) holds one row per menu item with
+its title and its category's title, and is kept in sync by triggers.
+It uses the trigram tokenizer, so terms of three or more characters
+match anywhere inside a title, case-insensitively, just like the
+`icontains` lookups `SearchFilter` builds. Shorter terms, searches on
+fields the index does not cover and databases without FTS5 fall back to
+the stock behaviour.
+"""
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+from .models import MenuItem, Order, OrderItem
+
+FTS_TABLE = 'LittleLemonAPI_menuitem_fts'
+MIN_TERM_LENGTH = 3  # shortest term the trigram tokenizer can match
+
+_available = {}
+
+
+def fts_available():
+    if not getattr(settings, 'FULL_TEXT_SEARCH', True) or connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _available:
+        _available[connection.alias] = FTS_TABLE in connection.introspection.table_names()
+    return _available[connection.alias]
+
+
+def matching_menuitems(expression):
+    return RawSQL(
+        f'SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s', [expression])
+
+
+# For each searchable model: each search field's index column and path
+# from MenuItem, and how to turn a MenuItem condition into a filter.
+INDEXED_FIELDS = {
+    MenuItem: (
+        {'title': ('title', 'title'), 'category__title': ('category', 'category__title')},
+        lambda condition: condition,
+    ),
+    Order: (
+        {'orders__menuitem__title': ('title', 'title')},
+        lambda condition: Q(id__in=OrderItem.objects.filter(
+            menuitem__in=MenuItem.objects.filter(condition)).values('order_id')),
+    ),
+}
+
+
+class FullTextSearchFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        indexed = INDEXED_FIELDS.get(queryset.model)
+
+        if (not search_fields or not search_terms or indexed is None
+                or not fts_available()
+                or any(field not in indexed[0] for field in search_fields)):
+            return super().filter_queryset(request, queryset, view)
+
+        fields, to_filter = indexed
+        columns = ' '.join(fields[field][0] for field in search_fields)
+        paths = [fields[field][1] for field in search_fields]
+
+        # Like SearchFilter, every term has to match the same menu item.
+        long_terms = [term for term in search_terms if len(term) >= MIN_TERM_LENGTH]
+        conditions = []
+        if long_terms:
+            expression = ' AND '.join(
+                '{%s} : "%s"' % (columns, term.replace('"', '""')) for term in long_terms)
+            conditions.append(Q(id__in=matching_menuitems(expression)))
+        for term in search_terms:
+            if len(term) < MIN_TERM_LENGTH:
+                conditions.append(reduce(or_, (Q(**{f'{path}__icontains': term}) for path in paths)))
+
+        return queryset.filter(to_filter(reduce(and_, conditions)))
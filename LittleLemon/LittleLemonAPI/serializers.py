@@ -1,7 +1,11 @@
 from rest_framework import serializers
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import Category, MenuItem, Cart, CartSummary, Order, OrderItem
 from django.contrib.auth.models import User
 from rest_framework.exceptions import NotFound, ValidationError, PermissionDenied
+from .roles import is_manager, is_delivery_crew
+from . import prices
+from .cart import ACTIONS, ADD, REMOVE, add_to_cart, apply_operations
+from .checkout import checkout
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -34,6 +38,15 @@ class MenuItemSerializer(serializers.ModelSerializer):
         return value
 
 
+class MenuItemImportSerializer(serializers.Serializer):
+    """One row of a bulk import; category ids are checked per chunk."""
+    id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=255)
+    price = serializers.DecimalField(max_digits=6, decimal_places=2)
+    featured = serializers.BooleanField(default=False)
+    category_id = serializers.IntegerField()
+
+
 class CartSerializer(serializers.ModelSerializer):
     menuitem = MenuItemSerializer
     user = serializers.StringRelatedField()
@@ -47,26 +60,48 @@ class CartSerializer(serializers.ModelSerializer):
                   'price', 'unit_price', 'user', 'menuitem_id']
 
     def save(self, **kwargs):
-        menuitem_id = self.context['request'].data.get('menuitem_id')
-        quantity = self.context['request'].data.get('quantity')
+        menuitem_id = self.validated_data['menuitem_id']
+        quantity = self.validated_data['quantity']
 
-        product = MenuItem.objects.filter(id=menuitem_id).first()
+        # from the per-process price snapshot, not a query per add
+        product = prices.lookup(menuitem_id)
         if not product:
             raise NotFound(detail='Item not exists')
 
-        cart_product = Cart.objects.filter(
-            menuitem=product, user=self.context['request'].user)
-        if cart_product:
-            raise ValidationError(
-                detail='There is already an item in the cart with that product')
+        # adding a product that is already in the cart increases its quantity
+        self.instance = add_to_cart(self.context['request'].user, menuitem_id, quantity, product.price)
+        return self.instance
+
+
+class CartSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CartSummary
+        fields = ['items', 'total']
+
 
-        unit_price = getattr(product, 'price')
+class CartOperationSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=ACTIONS, default=ADD)
+    menuitem_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(required=False, min_value=1, max_value=1000)
 
-        kwargs['unit_price'] = unit_price
-        kwargs['price'] = int(quantity) * unit_price
-        kwargs['user'] = self.context['request'].user
+    def validate(self, attrs):
+        if attrs['action'] != REMOVE and 'quantity' not in attrs:
+            raise ValidationError({'quantity': 'This field is required.'})
+        return attrs
 
-        return super().save(**kwargs)
+
+class CartBatchSerializer(serializers.Serializer):
+    MAX_OPERATIONS = 200
+
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=MAX_OPERATIONS)
+
+    def save(self, **kwargs):
+        self.instance = apply_operations(self.context['request'].user, self.validated_data['operations'])
+        return self.instance
+
+    def to_representation(self, rows):
+        summary = CartSummary(items=sum(row.quantity for row in rows), total=sum(row.price for row in rows))
+        return {'cart': CartSerializer(rows, many=True).data, **CartSummarySerializer(summary).data}
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -96,13 +131,13 @@ class SimpleOrderSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         user = self.context["request"].user
 
-        is_Delivery = user.groups.filter(name="delivery crew").first()
+        is_Delivery = is_delivery_crew(user)
         if is_Delivery and self.context['request'].method == "PATCH":
             if validated_data.get('delivery_crew_id'):
                 validated_data.pop('delivery_crew_id')
             return super().update(instance, validated_data)
 
-        is_Manager = user.groups.filter(name="Manager").first()
+        is_Manager = is_manager(user)
         if not is_Manager:
             raise PermissionDenied()
 
@@ -131,23 +166,41 @@ class OrderSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
         kwargs['user'] = user
 
-        cart_items = Cart.objects.all().filter(user=user)
+        def save_order(total):
+            kwargs['total'] = total
+            return super(OrderSerializer, self).save(**kwargs)
+
+        order = checkout(user, save_order)
+        # the response lists the items; fetch them with their menu items
+        # in one query instead of one menu item per line
+        self.instance = Order.objects.with_items().get(pk=order.pk)
+        return self.instance
+
+
+class DispatchSerializer(serializers.Serializer):
+    limit = serializers.IntegerField(required=False, min_value=1)
+    background = serializers.BooleanField(required=False, default=False)
+
 
-        if len(cart_items) == 0:
-            raise ValidationError(detail='Cart is empty')
+class MenuImportQuerySerializer(serializers.Serializer):
+    background = serializers.BooleanField(required=False, default=False)
 
-        total = sum(getattr(item, 'price') for item in cart_items)
-        kwargs['total'] = total
 
-        new_order = super().save(**kwargs)
+class SalesQuerySerializer(serializers.Serializer):
+    date__gte = serializers.DateField(required=False)
+    date__lte = serializers.DateField(required=False)
+    limit = serializers.IntegerField(required=False, default=10, min_value=1, max_value=100)
 
-        for i in cart_items:
-            menu_item = MenuItem.objects.filter(id=getattr(
-                i, 'menuitem_id')).first()
 
-            OrderItem.objects.create(order=new_order, menuitem=menu_item, quantity=getattr(
-                i, 'quantity'), unit_price=getattr(i, 'unit_price'), price=getattr(i, 'price'))
+class DailySalesSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    orders = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
 
-        cart_items.delete()
 
-        return new_order
+class SalesBreakdownSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    orders = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
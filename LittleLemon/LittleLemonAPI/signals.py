@@ -0,0 +1,110 @@
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import cart_summary, catalog_cache, changes, menu_snapshot
+from .authentication import invalidate_token, invalidate_user
+from .models import Cart, Category, MenuItem, Order, OrderItem
+from .roles import clear_role_cache, invalidate_roles
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def drop_cached_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # other workers' role caches follow this stamp
+    changes.touch(sender)
+
+    if not reverse:
+        # user.groups.add/remove/clear
+        invalidate_roles(instance.pk)
+    elif pk_set:
+        # group.user_set.add/remove
+        for user_id in pk_set:
+            invalidate_roles(user_id)
+    else:
+        # group.user_set.clear() does not report which users were affected
+        clear_role_cache()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def drop_all_cached_roles(sender, **kwargs):
+    # renaming or deleting a group changes the roles of all its members,
+    # and deleting one removes memberships without sending m2m_changed
+    changes.touch(Group)
+    clear_role_cache()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    # covers deactivation; also drops every cached token of the user
+    invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def drop_cached_token(sender, instance, **kwargs):
+    # djoser's token/logout deletes the token row
+    invalidate_token(instance.key)
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog(sender, instance, **kwargs):
+    # Bump after commit, otherwise a concurrent reader could cache the old
+    # rows under the new version.
+    pk = instance.pk
+
+    def bump():
+        catalog_cache.bump_version()
+        menu_snapshot.snapshot.changed(sender, pk)
+
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Token)
+def record_change(sender, **kwargs):
+    changes.touch(sender)
+
+
+# order payloads render users by username alone; cached token logins
+# also depend on whether the user is active
+TRACKED_USER_FIELDS = {'username', 'is_active'}
+
+
+@receiver(post_save, sender=User)
+def record_user_change(sender, update_fields=None, **kwargs):
+    # every token login saves last_login alone (update_last_login); that
+    # must not expire the orders ETags of every client
+    if update_fields is not None and not TRACKED_USER_FIELDS & update_fields:
+        return
+    changes.touch(sender)
+
+
+@receiver(post_save, sender=Cart)
+def add_to_cart_summary(sender, instance, created, **kwargs):
+    if created:
+        cart_summary.add(instance)
+    else:
+        # an edited row; the old quantity and price are gone by now
+        cart_summary.refresh(instance.user_id)
+
+
+@receiver(post_delete, sender=Cart)
+def remove_from_cart_summary(sender, instance, **kwargs):
+    cart_summary.remove(instance)
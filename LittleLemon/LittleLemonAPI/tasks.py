@@ -0,0 +1,23 @@
+"""Tasks the `run_jobs` worker can run; see `jobs.py`."""
+import logging
+
+from .dispatch import dispatch
+from .jobs import task
+from .menu_import import import_menu_items
+
+logger = logging.getLogger(__name__)
+
+
+@task('dispatch_orders')
+def dispatch_orders(limit=None):
+    # assigns whatever is still pending, so running it twice is harmless
+    dispatch(limit)
+
+
+@task('import_menu_items')
+def import_menu(rows):
+    # an upsert by id or title, so running it twice is harmless too
+    result = import_menu_items(rows)
+    logger.info('Menu import: %(created)s created, %(updated)s updated, %(unchanged)s unchanged', result)
+    if result['errors']:
+        logger.warning('Menu import skipped %s rows: %s', len(result['errors']), result['errors'])
@@ -1,3 +1,1897 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import json
+import threading
+import tracemalloc
+import uuid
+from decimal import Decimal
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .models import (
+    Category, MenuItem, Cart, CartSummary, Order, OrderItem, IdempotencyKey, Job,
+    DailySales, DailyMenuItemSales, MonthlyMenuItemSales, DailyCategorySales,
+)
+from . import catalog_cache, changes, instrumentation, jobs, menu_snapshot, prices, rollups
+from .authentication import CachedTokenAuthentication, clear_token_cache
+from .dispatch import dispatch
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .lean_serializers import LeanMenuItemSerializer, LeanOrderSerializer, LeanSimpleOrderSerializer
+from .serializers import MenuItemSerializer, OrderSerializer, SimpleOrderSerializer
+from .roles import MANAGER, DELIVERY_CREW, clear_role_cache, get_roles
+from .routers import ReadReplicaRouter
+
+
+ROLE_LOOKUP = 'FROM "auth_group" INNER JOIN "auth_user_groups"'
+
+
+def role_lookups(ctx):
+    return [q for q in ctx.captured_queries if ROLE_LOOKUP in q['sql']]
+
+
+class LittleLemonTestCase(TestCase):
+    def setUp(self):
+        clear_role_cache()
+        clear_token_cache()
+        catalog_cache.get_cache().clear()
+        catalog_cache.reset_stats()
+
+        self.manager_group = Group.objects.create(name=MANAGER)
+        self.delivery_group = Group.objects.create(name=DELIVERY_CREW)
+
+        self.manager = User.objects.create_user('manager1')
+        self.manager.groups.add(self.manager_group)
+        self.delivery = User.objects.create_user('delivery1')
+        self.delivery.groups.add(self.delivery_group)
+        self.customer = User.objects.create_user('customer1')
+
+        self.category = Category.objects.create(slug='mains', title='Mains')
+        self.menuitem = MenuItem.objects.create(
+            title='Pasta', price=Decimal('9.50'), featured=False, category=self.category)
+
+        self.client = APIClient()
+
+    def create_order(self, user, items=(), delivery_crew=None):
+        order = Order.objects.create(
+            user=user, delivery_crew=delivery_crew, total=Decimal('0'), date=datetime.date.today())
+        for menuitem, quantity in items:
+            OrderItem.objects.create(
+                order=order, menuitem=menuitem, quantity=quantity,
+                unit_price=menuitem.price, price=menuitem.price * quantity)
+        return order
+
+
+class RoleResolutionTests(LittleLemonTestCase):
+    def assertSingleRoleLookup(self, user, method, url, data=None):
+        clear_role_cache()
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 500)
+        self.assertLessEqual(len(role_lookups(ctx)), 1, ctx.captured_queries)
+        return response
+
+    def test_endpoints_resolve_roles_at_most_once(self):
+        order = self.create_order(self.customer, [(self.menuitem, 1)])
+
+        self.assertSingleRoleLookup(self.manager, 'get', '/api/category/')
+        self.assertSingleRoleLookup(
+            self.manager, 'post', '/api/menu-items/',
+            {'title': 'Soup', 'price': '4.00', 'featured': False, 'category_id': self.category.id})
+        self.assertSingleRoleLookup(self.manager, 'get', '/api/groups/managers/users/')
+        self.assertSingleRoleLookup(self.manager, 'get', '/api/orders/')
+        self.assertSingleRoleLookup(self.delivery, 'get', '/api/orders/')
+        self.assertSingleRoleLookup(
+            self.delivery, 'patch', f'/api/orders/{order.id}/', {'status': True})
+        self.assertSingleRoleLookup(
+            self.manager, 'patch', f'/api/orders/{order.id}/',
+            {'status': False, 'delivery_crew_id': self.delivery.id})
+        self.assertSingleRoleLookup(self.manager, 'delete', f'/api/orders/{order.id}/')
+
+    def test_warm_cache_skips_role_lookup(self):
+        self.client.force_authenticate(self.manager)
+        self.client.get('/api/category/')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/category/')
+        self.assertEqual(role_lookups(ctx), [])
+
+    def test_group_changes_invalidate_cache(self):
+        self.client.force_authenticate(self.manager)
+        self.assertNotIn(MANAGER, get_roles(self.customer))
+
+        self.client.post('/api/groups/managers/users/', {'user_id': self.customer.id})
+        self.assertIn(MANAGER, get_roles(self.customer))
+
+        self.client.delete(f'/api/groups/managers/users/{self.customer.id}/')
+        self.assertNotIn(MANAGER, get_roles(self.customer))
+
+        self.delivery_group.user_set.add(self.customer)
+        self.assertIn(DELIVERY_CREW, get_roles(self.customer))
+
+    def test_membership_changes_in_other_workers_expire_cached_roles(self):
+        self.assertIn(MANAGER, get_roles(self.manager))
+
+        # like another worker's removal: the stamp moves, no signal arrives
+        User.groups.through.objects.filter(user=self.manager).delete()
+        changes.touch(User.groups.through)
+        self.assertIn(MANAGER, get_roles(self.manager))
+
+        # the stamps are read again once AUTH_VERSION_MAX_AGE has passed
+        with override_settings(AUTH_VERSION_MAX_AGE=0):
+            self.assertNotIn(MANAGER, get_roles(self.manager))
+
+    def test_delivery_crew_sees_assigned_orders(self):
+        assigned = self.create_order(self.customer, delivery_crew=self.delivery)
+        self.create_order(self.customer)
+
+        self.client.force_authenticate(self.delivery)
+        response = self.client.get('/api/orders/')
+        self.assertEqual([o['id'] for o in response.data['results']], [assigned.id])
+
+
+
+class CachedTokenAuthenticationTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.manager)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get(self, url='/api/cart/summary/'):
+        return self.client.get(url).status_code
+
+    def test_warm_requests_skip_token_and_role_queries(self):
+        self.assertEqual(self.get(), 200)
+        self.assertEqual(self.get('/api/menu-items/'), 200)
+
+        # only the summary lookup itself
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(), 200)
+        # served from the catalog cache
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('/api/menu-items/'), 200)
+
+    def test_logout_invalidates_token(self):
+        self.assertEqual(self.get(), 200)
+
+        self.assertEqual(self.client.post('/token/logout/').status_code, 204)
+
+        self.assertEqual(self.get(), 401)
+
+    def test_deleted_token_and_deactivated_user_are_rejected(self):
+        self.assertEqual(self.get(), 200)
+        self.manager.is_active = False
+        self.manager.save()
+        self.assertEqual(self.get(), 401)
+
+        self.manager.is_active = True
+        self.manager.save()
+        self.assertEqual(self.get(), 200)
+        Token.objects.filter(key=self.token.key).delete()
+        self.assertEqual(self.get(), 401)
+
+    def test_other_workers_logouts_and_deactivations_expire_cached_logins(self):
+        self.assertEqual(self.get(), 200)
+
+        # like another worker's logout: the stamp moves, no signal arrives
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM "authtoken_token" WHERE "key" = %s', [self.token.key])
+        changes.touch(Token)
+        self.assertEqual(self.get(), 200)
+        with override_settings(AUTH_VERSION_MAX_AGE=0):
+            self.assertEqual(self.get(), 401)
+
+        self.token = Token.objects.create(user=self.manager)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.get(), 200)
+        User.objects.filter(id=self.manager.id).update(is_active=False)
+        changes.touch(User)
+        with override_settings(AUTH_VERSION_MAX_AGE=0):
+            self.assertEqual(self.get(), 401)
+
+    def test_group_changes_apply_immediately(self):
+        self.assertEqual(self.get('/api/category/'), 200)
+
+        self.manager.groups.remove(self.manager_group)
+        self.assertEqual(self.get('/api/category/'), 403)
+
+        self.manager.groups.add(self.manager_group)
+        self.assertEqual(self.get('/api/category/'), 200)
+        self.manager_group.delete()
+        self.assertEqual(self.get('/api/category/'), 403)
+
+    def test_requests_get_their_own_user(self):
+        self.assertEqual(self.get(), 200)
+        auth = CachedTokenAuthentication()
+
+        first, _ = auth.authenticate_credentials(self.token.key)
+        first.username = 'changed'
+        second, _ = auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(second.username, 'manager1')
+
+
+class CheckoutTests(LittleLemonTestCase):
+    def fill_cart(self, user, size):
+        items = MenuItem.objects.bulk_create([
+            MenuItem(title=f'Item {i}', price=Decimal('2.00'), featured=False, category=self.category)
+            for i in range(size)
+        ])
+        Cart.objects.bulk_create([
+            Cart(user=user, menuitem=item, quantity=3, unit_price=item.price, price=item.price * 3)
+            for item in items
+        ])
+
+    def checkout(self):
+        self.client.force_authenticate(self.customer)
+        return self.client.post('/api/orders/', {'date': '2023-06-30'})
+
+    def test_checkout_moves_cart_into_order(self):
+        self.fill_cart(self.customer, 3)
+
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user'], 'customer1')
+        self.assertEqual(response.data['total'], '18.00')
+        self.assertEqual(response.data['date'], '2023-06-30')
+        self.assertEqual(
+            [(item['menuitem'], item['quantity'], item['price']) for item in response.data['orders']],
+            [('Item 0', 3, '6.00'), ('Item 1', 3, '6.00'), ('Item 2', 3, '6.00')])
+        self.assertFalse(Cart.objects.filter(user=self.customer).exists())
+
+    def test_checkout_query_count_does_not_grow_with_cart(self):
+        def save_order():
+            serializer = OrderSerializer(
+                data={'date': '2023-06-30'}, context={'request': SimpleNamespace(user=self.customer)})
+            serializer.is_valid(raise_exception=True)
+            # a snapshot that already holds the new items, for both carts
+            catalog_cache.bump_version()
+            prices.snapshot.get()
+            with CaptureQueriesContext(connection) as ctx:
+                serializer.save()
+            return ctx
+
+        self.fill_cart(self.customer, 1)
+        small = save_order()
+
+        self.fill_cart(self.customer, 50)
+        large = save_order()
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_orders_past_the_total_field_are_refused(self):
+        platter = MenuItem.objects.create(
+            title='Platter', price=Decimal('95.00'), featured=False, category=self.category)
+        Cart.objects.bulk_create([
+            Cart(user=self.customer, menuitem=menuitem, quantity=100,
+                 unit_price=menuitem.price, price=menuitem.price * 100)
+            for menuitem in (self.menuitem, platter)
+        ])
+
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Cart.objects.filter(user=self.customer).count(), 2)
+
+    def test_empty_cart_is_rejected(self):
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+
+class CartSummaryTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.soup = MenuItem.objects.create(
+            title='Soup', price=Decimal('4.25'), featured=False, category=self.category)
+        self.client.force_authenticate(self.customer)
+
+    def summary(self):
+        response = self.client.get('/api/cart/summary/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def add(self, menuitem, quantity):
+        response = self.client.post('/api/cart/', {'menuitem_id': menuitem.id, 'quantity': quantity})
+        self.assertEqual(response.status_code, 201)
+
+    def test_summary_follows_cart_changes(self):
+        self.assertEqual(self.summary(), {'items': 0, 'total': '0.00'})
+
+        self.add(self.menuitem, 2)
+        self.add(self.soup, 1)
+        self.assertEqual(self.summary(), {'items': 3, 'total': '23.25'})
+
+        Cart.objects.get(user=self.customer, menuitem=self.soup).delete()
+        self.assertEqual(self.summary(), {'items': 2, 'total': '19.00'})
+
+        self.client.delete('/api/cart/')
+        self.assertEqual(self.summary(), {'items': 0, 'total': '0.00'})
+
+    def test_cart_list_carries_the_summary(self):
+        self.add(self.menuitem, 2)
+        self.add(self.soup, 1)
+
+        response = self.client.get('/api/cart/')
+
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual((response['Cart-Items'], response['Cart-Total']), ('3', '23.25'))
+        self.client.delete('/api/cart/')
+        response = self.client.get('/api/cart/')
+        self.assertEqual((response['Cart-Items'], response['Cart-Total']), ('0', '0.00'))
+
+    def test_adding_an_item_again_increments_its_row(self):
+        self.add(self.menuitem, 2)
+        MenuItem.objects.filter(id=self.menuitem.id).update(price=Decimal('10.00'))
+        self.menuitem.refresh_from_db()
+        # seen once the cached catalog version expires
+        catalog_cache.get_cache().delete(catalog_cache.VERSION_KEY)
+
+        response = self.client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 1})
+
+        self.assertEqual(response.status_code, 201)
+        # the whole line is charged at today's price
+        self.assertEqual(
+            (response.data['quantity'], response.data['unit_price'], response.data['price']),
+            (3, '10.00', '30.00'))
+        self.assertEqual(Cart.objects.filter(user=self.customer).count(), 1)
+        self.assertEqual(self.summary(), {'items': 3, 'total': '30.00'})
+
+    def test_checkout_empties_summary(self):
+        self.add(self.menuitem, 2)
+
+        response = self.client.post('/api/orders/', {'date': '2023-06-30'})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.summary(), {'items': 0, 'total': '0.00'})
+
+    def test_deleting_a_menu_item_updates_summaries(self):
+        self.add(self.menuitem, 2)
+        self.add(self.soup, 2)
+
+        self.soup.delete()
+
+        self.assertEqual(self.summary(), {'items': 2, 'total': '19.00'})
+
+    def test_summary_is_read_with_one_query(self):
+        self.add(self.menuitem, 2)
+        self.client.get('/api/cart/summary/')
+
+        with self.assertNumQueries(1):
+            self.client.get('/api/cart/summary/')
+
+    def test_check_command_reports_and_fixes_drift(self):
+        self.add(self.menuitem, 2)
+        # bulk writes bypass the signals
+        Cart.objects.bulk_create([Cart(
+            user=self.manager, menuitem=self.soup, quantity=1, unit_price=self.soup.price, price=self.soup.price)])
+        Cart.objects.filter(user=self.customer).update(quantity=3, price=Decimal('28.50'))
+
+        with self.assertRaisesMessage(CommandError, '2 cart summaries have drifted'):
+            call_command('check_cart_summaries', '--check', stdout=StringIO())
+
+        out = StringIO()
+        call_command('check_cart_summaries', stdout=out)
+        self.assertIn(f'user {self.customer.id}: stored 2 items / 19.00, actual 3 items / 28.50', out.getvalue())
+        self.assertEqual(
+            CartSummary.objects.get(user=self.manager).total, Decimal('4.25'))
+
+        out = StringIO()
+        call_command('check_cart_summaries', '--check', stdout=out)
+        self.assertIn('All cart summaries are consistent', out.getvalue())
+        self.assertEqual(self.summary(), {'items': 3, 'total': '28.50'})
+
+
+class OrderQueryPlanTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.menuitems = MenuItem.objects.bulk_create([
+            MenuItem(title=f'Item {i}', price=Decimal('1.00'), featured=False, category=self.category)
+            for i in range(5)
+        ])
+        self.client.force_authenticate(self.manager)
+        # warm the role cache so only the order queries are counted
+        self.client.get('/api/orders/')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_order_list_query_count_is_constant(self):
+        self.create_order(self.customer, [(self.menuitem, 1)])
+        baseline = self.count_queries('/api/orders/?page_size=6')
+
+        for _ in range(6):
+            self.create_order(
+                self.customer, [(item, 2) for item in self.menuitems], delivery_crew=self.delivery)
+
+        self.assertEqual(self.count_queries('/api/orders/?page_size=6'), baseline)
+
+    def test_single_order_query_count_is_constant(self):
+        small = self.create_order(self.customer, [(self.menuitem, 1)])
+        large = self.create_order(
+            self.customer, [(item, 2) for item in self.menuitems], delivery_crew=self.delivery)
+
+        self.assertEqual(
+            self.count_queries(f'/api/orders/{small.id}/'),
+            self.count_queries(f'/api/orders/{large.id}/'))
+
+
+
+class OrderExportTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.manager)
+
+    def export(self, **params):
+        response = self.client.get('/api/orders/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export_with_filters(self):
+        soup = MenuItem.objects.create(
+            title='Soup', price=Decimal('4.25'), featured=False, category=self.category)
+        first = self.create_order(self.customer, [(self.menuitem, 2), (soup, 1)], delivery_crew=self.delivery)
+        second = self.create_order(self.customer, [(soup, 1)])
+        Order.objects.filter(id=second.id).update(date=datetime.date(2023, 1, 1), status=True)
+
+        lines = [json.loads(line) for line in self.export(format='ndjson').splitlines()]
+
+        self.assertEqual([line['id'] for line in lines], [first.id, second.id])
+        self.assertEqual(lines[0]['user'], 'customer1')
+        self.assertEqual(lines[0]['delivery_crew'], 'delivery1')
+        self.assertEqual(lines[0]['items'], [
+            {'menuitem': 'Pasta', 'quantity': 2, 'unit_price': '9.50', 'price': '19.00'},
+            {'menuitem': 'Soup', 'quantity': 1, 'unit_price': '4.25', 'price': '4.25'}])
+
+        for params, expected in (
+                ({'date__lte': '2023-06-30'}, [second.id]),
+                ({'status': 'false'}, [first.id]),
+                ({'delivery_crew': self.delivery.id}, [first.id])):
+            lines = self.export(format='ndjson', **params).splitlines()
+            self.assertEqual([json.loads(line)['id'] for line in lines], expected, params)
+
+    def test_csv_export_has_a_row_per_item(self):
+        order = self.create_order(self.customer, [(self.menuitem, 2)])
+        empty = self.create_order(self.customer, [])
+
+        rows = list(csv.DictReader(StringIO(self.export(format='csv'))))
+
+        self.assertEqual(
+            [(row['order_id'], row['menuitem'], row['price']) for row in rows],
+            [(str(order.id), 'Pasta', '19.00'), (str(empty.id), '', '')])
+
+    def test_managers_only(self):
+        self.client.force_authenticate(self.customer)
+
+        self.assertEqual(self.client.get('/api/orders/export/').status_code, 403)
+
+    def test_memory_does_not_grow_with_rows(self):
+        def peak_memory(count):
+            Order.objects.all().delete()
+            orders = Order.objects.bulk_create([
+                Order(user=self.customer, total=Decimal('9.50'), date=datetime.date(2023, 6, 30))
+                for _ in range(count)])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, menuitem=self.menuitem, quantity=1,
+                          unit_price=Decimal('9.50'), price=Decimal('9.50'))
+                for order in orders])
+            del orders
+
+            tracemalloc.start()
+            try:
+                response = self.client.get('/api/orders/export/', {'format': 'csv'})
+                rows = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+                return tracemalloc.get_traced_memory()[1], rows
+            finally:
+                tracemalloc.stop()
+
+        with mock.patch('LittleLemonAPI.exports.CHUNK_SIZE', 100):
+            small, small_rows = peak_memory(300)
+            large, large_rows = peak_memory(3000)
+
+        self.assertEqual((small_rows, large_rows), (301, 3001))
+        self.assertLess(large, small * 1.5)
+
+
+class DispatchTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.delivery2 = User.objects.create_user('delivery2')
+        self.delivery2.groups.add(self.delivery_group)
+        self.client.force_authenticate(self.manager)
+
+    def pending(self, count):
+        return Order.objects.bulk_create([
+            Order(user=self.customer, total=Decimal('9.50'), date=datetime.date.today())
+            for _ in range(count)])
+
+    def open_orders(self):
+        return {
+            crew.username: Order.objects.filter(delivery_crew=crew, status=False).count()
+            for crew in (self.delivery, self.delivery2)}
+
+    def test_assigns_to_the_least_loaded_crew(self):
+        for _ in range(3):
+            self.create_order(self.customer, delivery_crew=self.delivery)
+        delivered = self.create_order(self.customer, delivery_crew=self.delivery2)
+        delivered.status = True
+        delivered.save()
+        self.pending(5)
+
+        response = self.client.post('/api/orders/dispatch/', {}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['assigned'], 5)
+        self.assertEqual(self.open_orders(), {'delivery1': 4, 'delivery2': 4})
+        self.assertFalse(Order.objects.filter(delivery_crew__isnull=True).exists())
+
+    def test_limit_takes_the_oldest_orders(self):
+        orders = self.pending(4)
+        Order.objects.filter(id=orders[3].id).update(date=datetime.date(2023, 1, 1))
+
+        response = self.client.post('/api/orders/dispatch/', {'limit': 2}, format='json')
+
+        assigned = sorted(
+            order_id for crew in response.data['crew'] for order_id in crew['orders'])
+        self.assertEqual(assigned, sorted([orders[3].id, orders[0].id]))
+        self.assertEqual(Order.objects.filter(delivery_crew__isnull=True).count(), 2)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        def queries(count):
+            self.pending(count)
+            with CaptureQueriesContext(connection) as ctx:
+                call_command('dispatch_orders', stdout=StringIO())
+            return len([q for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']])
+
+        self.assertEqual(queries(3), queries(300))
+
+    def test_without_crew_nothing_is_assigned(self):
+        self.delivery_group.user_set.clear()
+        self.pending(2)
+        out = StringIO()
+
+        call_command('dispatch_orders', stdout=out)
+
+        self.assertIn('Assigned 0 orders', out.getvalue())
+        self.assertEqual(Order.objects.filter(delivery_crew__isnull=True).count(), 2)
+
+    def test_managers_only(self):
+        self.client.force_authenticate(self.delivery)
+
+        self.assertEqual(self.client.post('/api/orders/dispatch/').status_code, 403)
+
+class RequestMetricsTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        instrumentation.registry.clear()
+        self.addCleanup(instrumentation.registry.clear)
+        self.client.force_authenticate(self.manager)
+        self.create_order(self.customer, [(self.menuitem, 2)])
+
+    def histogram(self, name, endpoint, method='GET'):
+        for row in instrumentation.registry.snapshot().get(name, ()):
+            if row[:2] == (endpoint, method):
+                return row
+
+    def test_disabled_by_default(self):
+        response = self.client.get('/api/orders/')
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(instrumentation.registry.snapshot(), {})
+
+    @override_settings(REQUEST_METRICS=True)
+    def test_records_queries_and_timings_per_endpoint(self):
+        executed = []
+        with connection.execute_wrapper(lambda execute, *args: executed.append(args[0]) or execute(*args)):
+            self.client.get('/api/orders/')
+            self.client.get('/api/orders/')
+
+        _, _, buckets, total, count = self.histogram('littlelemon_request_queries', 'api/orders/')
+        self.assertEqual(count, 2)
+        self.assertEqual(total, len(executed))
+        self.assertEqual(buckets[-1], ('+Inf', 2))
+        for name in ('littlelemon_request_duration_seconds', 'littlelemon_request_db_seconds',
+                     'littlelemon_request_auth_seconds',
+                     'littlelemon_request_serialization_seconds'):
+            self.assertEqual(self.histogram(name, 'api/orders/')[4], 2, name)
+
+        self.client.post('/api/orders/dispatch/', {}, format='json')
+        self.assertIsNotNone(self.histogram(
+            'littlelemon_request_queries', 'api/orders/dispatch/', 'POST'))
+
+    @override_settings(REQUEST_METRICS=True, REQUEST_METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(f'/api/menu-items/{self.menuitem.id}/')
+
+        names = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(names, ['db', 'auth', 'serialization', 'total'])
+
+    @override_settings(REQUEST_METRICS=True)
+    def test_prometheus_endpoint(self):
+        self.client.get('/api/orders/')
+
+        response = self.client.get('/api/metrics/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE littlelemon_request_duration_seconds histogram', text)
+        self.assertIn(
+            'littlelemon_request_duration_seconds_count{endpoint="api/orders/",method="GET"} 1', text)
+        self.assertIn(
+            'littlelemon_request_queries_bucket{endpoint="api/orders/",method="GET",le="+Inf"} 1', text)
+
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    def test_prometheus_endpoint_reports_catalog_cache_lookups(self):
+        self.client.get('/api/menu-items/')
+        self.client.get('/api/menu-items/')
+
+        text = self.client.get('/api/metrics/').content.decode()
+
+        self.assertIn('# TYPE littlelemon_catalog_cache_lookups_total counter', text)
+        self.assertIn('littlelemon_catalog_cache_lookups_total{result="hits"} 1', text)
+        self.assertIn('littlelemon_catalog_cache_lookups_total{result="misses"} 1', text)
+
+class LeanSerializerContractTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        drinks = Category.objects.create(slug='drinks', title='Drinks')
+        for i, price in enumerate(('0.50', '10.00', '1234.05', '7.10')):
+            MenuItem.objects.create(
+                title=f'Item {i}', price=Decimal(price), featured=i % 2 == 0, category=drinks)
+        soup = MenuItem.objects.get(title='Item 3')
+        self.order = self.create_order(
+            self.customer, [(self.menuitem, 2), (soup, 3)], delivery_crew=self.delivery)
+        Order.objects.filter(id=self.order.id).update(total=Decimal('40.30'), status=True)
+        self.create_order(self.customer, [(soup, 1)])
+        self.create_order(self.manager)
+        Order.objects.filter(user=self.manager).update(date=datetime.date(2023, 1, 31))
+
+    def assertSameJSON(self, path, user=None):
+        self.client.force_authenticate(user)
+        responses = []
+        for lean in (False, True):
+            catalog_cache.get_cache().clear()
+            with override_settings(LEAN_SERIALIZERS=lean):
+                responses.append(self.client.get(path))
+
+        model, lean = responses
+        self.assertEqual(lean.status_code, model.status_code, path)
+        self.assertEqual(lean.content, model.content, path)
+
+    def test_endpoints_render_the_same_bytes(self):
+        for path in ('/api/menu-items/', '/api/menu-items/?page=2', '/api/menu-items/?ordering=-price&page_size=6',
+                     '/api/menu-items/?search=item', '/api/menu-items/?pagination=cursor&ordering=price',
+                     '/api/menu-items/?pagination=cursor&ordering=title&page_size=2',
+                     f'/api/menu-items/{self.menuitem.id}/', '/api/menu-items/999/'):
+            self.assertSameJSON(path)
+
+        for user in (self.manager, self.delivery, self.customer):
+            for path in ('/api/orders/', '/api/orders/?ordering=-total&page_size=6',
+                         '/api/orders/?pagination=cursor&ordering=date&page_size=1',
+                         '/api/orders/?search=pasta', f'/api/orders/{self.order.id}/', '/api/orders/999/'):
+                self.assertSameJSON(path, user)
+
+    def test_every_row_renders_the_same(self):
+        def render(data):
+            return JSONRenderer().render(data)
+
+        for lean, serializer, queryset in (
+                (LeanMenuItemSerializer, MenuItemSerializer, MenuItem.objects.select_related('category')),
+                (LeanOrderSerializer, OrderSerializer, Order.objects.with_items()),
+                (LeanSimpleOrderSerializer, SimpleOrderSerializer, Order.objects.with_items())):
+            queryset = queryset.order_by('id')
+            self.assertEqual(
+                render(lean().serialize(queryset.prefetch_related(None).values(*lean.columns))),
+                render(serializer(queryset, many=True).data), serializer.__name__)
+
+    def test_orders_page_query_count(self):
+        self.client.force_authenticate(self.manager)
+        get_roles(self.manager)
+        self.client.get('/api/orders/?page_size=6')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/orders/?page_size=6&page=1')
+
+        # the ETag stamps, COUNT(*), the page of orders and their items
+        self.assertEqual(len(ctx.captured_queries), 4, ctx.captured_queries)
+
+class FastJSONTests(TestCase):
+    PAYLOAD = {
+        'price': Decimal('9.50'),
+        'tiny': Decimal('0.000001'),
+        'created': datetime.datetime(2023, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'naive': datetime.datetime(2023, 5, 1, 12, 30),
+        'date': datetime.date(2023, 5, 1),
+        'time': datetime.time(8, 15, 30, 250000),
+        'duration': datetime.timedelta(hours=1, seconds=1),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('Not found.'),
+        'text': 'Caf\u00e9 \u2028 \u2029 "quoted" \\ \U0001f34b',
+        'float': 0.1,
+        'nested': ReturnList([ReturnDict({'id': 1, 'none': None, 'ok': True}, serializer=None)],
+                             serializer=None),
+        1: 'int key',
+        'tuple': (1, 2),
+    }
+
+    def assertSameRendering(self, data, media_type=None):
+        self.assertEqual(FastJSONRenderer().render(data, media_type),
+                         JSONRenderer().render(data, media_type))
+
+    def test_renders_the_same_bytes(self):
+        self.assertSameRendering(self.PAYLOAD)
+        self.assertSameRendering(self.PAYLOAD, 'application/json; indent=4')
+        self.assertSameRendering({'big': 2 ** 70})
+        self.assertSameRendering(None)
+        self.assertSameRendering([])
+
+        with mock.patch('LittleLemonAPI.renderers.orjson', None):
+            self.assertSameRendering(self.PAYLOAD)
+
+    def test_parses_the_same_data(self):
+        def parse(parser, body):
+            return parser().parse(BytesIO(body.encode()), 'application/json', {})
+
+        for body in ('{"title": "Caf\u00e9", "price": "9.50", "items": [1, 2.5, null, true]}',
+                     '[{"id": 18446744073709551616}]', '"\\u2028"'):
+            self.assertEqual(parse(FastJSONParser, body), parse(JSONParser, body))
+
+        for body in ('{"title": ', '{"price": NaN}'):
+            with self.assertRaises(ParseError) as expected:
+                parse(JSONParser, body)
+            with self.assertRaises(ParseError) as actual:
+                parse(FastJSONParser, body)
+            self.assertEqual(str(actual.exception), str(expected.exception))
+
+        with mock.patch('LittleLemonAPI.parsers.orjson', None):
+            self.assertEqual(parse(FastJSONParser, '{"a": [1]}'), {'a': [1]})
+
+
+class PriceSnapshotTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.customer)
+
+    def add(self, menuitem_id, quantity=1):
+        return self.client.post('/api/cart/', {'menuitem_id': menuitem_id, 'quantity': quantity})
+
+    def menuitem_queries(self, ctx):
+        return [q for q in ctx.captured_queries if 'FROM "LittleLemonAPI_menuitem"' in q['sql']]
+
+    def test_cart_adds_are_priced_without_menu_item_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            soup = MenuItem.objects.create(
+                title='Soup', price=Decimal('4.25'), featured=False, category=self.category)
+        prices.snapshot.get()  # load it for the new catalog version
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.add(soup.id, 2)
+
+        self.assertEqual(response.data['price'], '8.50')
+        self.assertEqual(self.menuitem_queries(ctx), [])
+
+    @override_settings(PRICE_SNAPSHOT=False)
+    def test_disabled_snapshot_reads_the_database(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.add(self.menuitem.id)
+
+        self.assertEqual(len(self.menuitem_queries(ctx)), 1)
+
+    def test_missing_ids_fall_back_to_the_database(self):
+        self.add(self.menuitem.id)
+        # like another worker's insert: the stamps move, but this process
+        # keeps its cached version until CATALOG_VERSION_MAX_AGE runs out
+        soup, = MenuItem.objects.bulk_create([MenuItem(
+            title='Soup', price=Decimal('4.25'), featured=False, category=self.category)])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.add(soup.id).data['price'], '4.25')
+        # just the soup, not a reload of the whole menu
+        queries = self.menuitem_queries(ctx)
+        self.assertEqual(len(queries), 1)
+        self.assertIn(f'"id" IN ({soup.id})', queries[0]['sql'])
+        self.assertEqual(self.add(soup.id + 1).status_code, 404)
+
+    def test_checkout_does_not_reload_the_snapshot(self):
+        self.add(self.menuitem.id, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menuitem.title = 'Penne'
+            self.menuitem.save()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/orders/', {'date': '2023-06-30'})
+
+        self.assertEqual(response.status_code, 201)
+        # the out-of-date snapshot is left alone; only the order's items are read
+        queries = self.menuitem_queries(ctx)
+        self.assertEqual(len(queries), 1)
+        self.assertIn(f'"id" IN ({self.menuitem.id})', queries[0]['sql'])
+        self.assertIsNone(prices.snapshot.get(reload=False))
+
+    def test_price_update_mid_checkout(self):
+        self.add(self.menuitem.id, 2)
+        add_order = rollups.add_order
+
+        def update_price_then_add_order(order, lines):
+            # a manager reprices the item while the order is being written
+            self.menuitem.price = Decimal('12.00')
+            self.menuitem.save()
+            add_order(order, lines)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch('LittleLemonAPI.rollups.add_order', side_effect=update_price_then_add_order):
+                response = self.client.post('/api/orders/', {'date': '2023-06-30'})
+
+        # the order charges what the cart showed
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total'], '19.00')
+        self.assertEqual(
+            [(item['unit_price'], item['price']) for item in response.data['orders']], [('9.50', '19.00')])
+        self.assertEqual(DailySales.objects.get().revenue, Decimal('19.00'))
+        self.assertEqual(
+            DailyCategorySales.objects.get().category_id, self.category.id)
+        # and the next add sees the new price
+        self.assertEqual(self.add(self.menuitem.id).data['price'], '12.00')
+        self.assertEqual(prices.lookup(self.menuitem.id).price, Decimal('12.00'))
+
+
+class IdempotencyKeyTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.customer)
+        self.client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 2})
+
+    def checkout(self, key='order-1', date='2023-06-30'):
+        return self.client.post('/api/orders/', {'date': date}, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.checkout()
+        # the cart is empty now, so running the view again would fail
+        retry = self.checkout()
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_with_other_data_is_refused(self):
+        self.checkout()
+
+        response = self.checkout(date='2023-07-01')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_scoped_to_user_and_path(self):
+        self.checkout()
+        self.client.force_authenticate(self.manager)
+        self.client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 1})
+
+        self.assertEqual(self.checkout().status_code, 201)
+        response = self.client.post(
+            '/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 1}, HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_requests_are_not_stored(self):
+        self.client.delete('/api/cart/')
+        self.assertEqual(self.checkout().status_code, 400)
+
+        self.client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 1})
+
+        self.assertEqual(self.checkout().status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_expired_keys_are_evicted(self):
+        self.checkout()
+        IdempotencyKey.objects.update(expires=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        self.client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 1})
+
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_key_length_is_validated(self):
+        self.assertEqual(self.checkout(key='x' * 256).status_code, 400)
+        self.assertEqual(Order.objects.count(), 0)
+
+
+class CartContentionTests(TransactionTestCase):
+    """Many clients of one user hitting the cart and checkout at once.
+
+    Needs a test database file: the shared-cache in-memory one fails
+    concurrent writers with "table is locked" instead of waiting.
+    """
+    # the production profile reads from its replica outside transactions
+    databases = '__all__'
+    THREADS = 8
+
+    def setUp(self):
+        clear_role_cache()
+        clear_token_cache()
+        self.customer = User.objects.create_user('customer1')
+        category = Category.objects.create(slug='mains', title='Mains')
+        self.menuitem = MenuItem.objects.create(
+            title='Pasta', price=Decimal('9.50'), featured=False, category=category)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def run_clients(self, request):
+        """Call `request(client)` from every thread at once; return the responses."""
+        barrier = threading.Barrier(self.THREADS)
+        responses = []
+
+        def worker():
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(self.customer)
+            barrier.wait()
+            try:
+                responses.extend(request(client))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def add(self, client, quantity=1):
+        return client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': quantity})
+
+    def test_parallel_adds_increment_one_row(self):
+        responses = self.run_clients(lambda client: [self.add(client) for _ in range(5)])
+
+        self.assertEqual([r.status_code for r in responses], [201] * self.THREADS * 5)
+        row = Cart.objects.get(user=self.customer)
+        self.assertEqual((row.quantity, row.price), (self.THREADS * 5, Decimal('380.00')))
+        summary = CartSummary.objects.get(user=self.customer)
+        self.assertEqual((summary.items, summary.total), (self.THREADS * 5, Decimal('380.00')))
+
+    def test_parallel_checkouts_create_one_order(self):
+        self.add(self.client)
+
+        responses = self.run_clients(lambda client: [
+            client.post('/api/orders/', {'date': '2023-06-30'})])
+
+        self.assertEqual(sorted(r.status_code for r in responses), [201] + [400] * (self.THREADS - 1))
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse(Cart.objects.exists())
+
+    def test_retried_checkouts_replay_one_order(self):
+        self.add(self.client, quantity=2)
+
+        responses = self.run_clients(lambda client: [
+            client.post('/api/orders/', {'date': '2023-06-30'}, HTTP_IDEMPOTENCY_KEY='checkout-1')])
+
+        self.assertEqual([r.status_code for r in responses], [201] * self.THREADS)
+        self.assertEqual(len({r.data['id'] for r in responses}), 1)
+        self.assertEqual(sum(r.has_header('Idempotent-Replayed') for r in responses), self.THREADS - 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.get().quantity, 2)
+
+
+class ReadReplicaRouterTests(TestCase):
+    router = ReadReplicaRouter()
+
+    def test_catalog_and_order_reads_go_to_the_replica(self):
+        with mock.patch.object(connections['default'], 'in_atomic_block', False):
+            for model in (Category, MenuItem, Order, OrderItem):
+                self.assertEqual(self.router.db_for_read(model), 'replica')
+            self.assertIsNone(self.router.db_for_read(Cart))
+            self.assertIsNone(self.router.db_for_read(User))
+
+    def test_reads_inside_a_transaction_stay_on_default(self):
+        # every TestCase test runs inside a transaction
+        self.assertEqual(self.router.db_for_read(MenuItem), 'default')
+
+    def test_writes_and_migrations_go_to_default(self):
+        self.assertEqual(self.router.db_for_write(Order), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'LittleLemonAPI'))
+        self.assertFalse(self.router.allow_migrate('replica', 'LittleLemonAPI'))
+
+
+def flaky_task(fail=True):
+    if fail:
+        raise RuntimeError('kitchen printer offline')
+
+
+def register_flaky_task(test):
+    """Register `flaky_task` as 'test_flaky' for the duration of `test`."""
+    patcher = mock.patch.dict(jobs._tasks, {'test_flaky': flaky_task})
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+
+class JobQueueTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        register_flaky_task(self)
+        self.order = self.create_order(self.customer, [(self.menuitem, 1)])
+
+    def watch_dispatch(self):
+        return mock.patch('LittleLemonAPI.tasks.dispatch', side_effect=dispatch)
+
+    def run_jobs(self):
+        out = StringIO()
+        call_command('run_jobs', '--once', '--threads', '1', stdout=out)
+        return out.getvalue()
+
+    def test_background_dispatch_returns_before_the_work(self):
+        self.client.force_authenticate(self.manager)
+
+        with self.watch_dispatch() as watched:
+            response = self.client.post('/api/orders/dispatch/', {'background': True, 'limit': 5})
+            self.assertEqual(response.status_code, 202)
+            self.assertFalse(watched.called)
+            self.order.refresh_from_db()
+            self.assertIsNone(self.order.delivery_crew)
+
+            self.assertIn('Ran 1 jobs, 0 failed', self.run_jobs())
+
+        watched.assert_called_once_with(5)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.delivery_crew, self.delivery)
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(AUTO_DISPATCH=True)
+    def test_checkout_leaves_dispatch_to_the_worker(self):
+        self.client.force_authenticate(self.customer)
+        self.client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 1})
+        with self.watch_dispatch() as watched:
+            response = self.client.post('/api/orders/', {'date': '2023-06-30'})
+            self.assertEqual(response.status_code, 201)
+            self.assertFalse(watched.called)
+
+            self.run_jobs()
+
+        watched.assert_called_once()
+        order = Order.objects.get(id=response.data['id'])
+        self.assertEqual(order.delivery_crew, self.delivery)
+
+    @override_settings(AUTO_DISPATCH=True)
+    def test_auto_dispatch_queues_one_job_at_a_time(self):
+        self.client.force_authenticate(self.customer)
+        for _ in range(2):
+            self.client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 1})
+            self.client.post('/api/orders/', {'date': '2023-06-30'})
+
+        self.assertEqual(Job.objects.filter(name='dispatch_orders').count(), 1)
+
+    @override_settings(JOBS_MAX_ATTEMPTS=2)
+    def test_failing_jobs_are_retried_then_kept_as_failed(self):
+        job = jobs.enqueue('test_flaky')
+
+        with self.assertLogs('LittleLemonAPI.jobs', 'ERROR'):
+            self.assertIn('Ran 0 jobs, 1 failed', self.run_jobs())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('kitchen printer offline', job.last_error)
+        # not due again until its backoff has passed
+        self.assertIn('Ran 0 jobs, 0 failed', self.run_jobs())
+
+        Job.objects.update(run_after=job.created)
+        with self.assertLogs('LittleLemonAPI.jobs', 'ERROR'):
+            self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('Ran 0 jobs, 0 failed', self.run_jobs())
+
+    def test_expired_lease_is_claimed_again(self):
+        job = jobs.enqueue('test_flaky', {'fail': False})
+        self.assertEqual(jobs.claim(10), [job])
+        self.assertEqual(jobs.claim(10), [])
+
+        Job.objects.update(locked_until=job.created)
+
+        self.assertIn('Ran 1 jobs, 0 failed', self.run_jobs())
+        self.assertFalse(Job.objects.exists())
+
+    def test_unknown_tasks_are_refused(self):
+        with self.assertRaises(LookupError):
+            jobs.enqueue('no_such_task')
+
+
+class JobWorkerPoolTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        register_flaky_task(self)
+
+    def test_pool_runs_every_job_once(self):
+        for _ in range(20):
+            jobs.enqueue('test_flaky', {'fail': False})
+
+        out = StringIO()
+        call_command('run_jobs', '--once', '--threads', '4', stdout=out)
+
+        self.assertIn('Ran 20 jobs, 0 failed', out.getvalue())
+        self.assertFalse(Job.objects.exists())
+
+
+class CartBatchTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.soup = MenuItem.objects.create(
+            title='Soup', price=Decimal('4.25'), featured=False, category=self.category)
+        self.client.force_authenticate(self.customer)
+
+    def batch(self, *operations):
+        return self.client.post('/api/cart/batch/', {'operations': list(operations)}, format='json')
+
+    def cart(self):
+        return dict(Cart.objects.filter(user=self.customer).values_list('menuitem__title', 'quantity'))
+
+    def test_adds_sets_and_removes_in_one_request(self):
+        self.client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 2})
+        salad = MenuItem.objects.create(
+            title='Salad', price=Decimal('6.00'), featured=False, category=self.category)
+        self.client.post('/api/cart/', {'menuitem_id': salad.id, 'quantity': 1})
+
+        response = self.batch(
+            {'menuitem_id': self.soup.id, 'quantity': 2},
+            {'action': 'set', 'menuitem_id': self.menuitem.id, 'quantity': 1},
+            {'action': 'remove', 'menuitem_id': salad.id},
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.cart(), {'Pasta': 1, 'Soup': 2})
+        self.assertEqual((response.data['items'], response.data['total']), (3, '18.00'))
+        self.assertEqual([row['price'] for row in response.data['cart']], ['9.50', '8.50'])
+        self.assertEqual(response.data['cart'][0]['user'], 'customer1')
+        summary = self.client.get('/api/cart/summary/').data
+        self.assertEqual(summary, {'items': 3, 'total': '18.00'})
+
+    def test_operations_on_one_item_apply_in_order(self):
+        self.client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 4})
+
+        self.batch(
+            {'menuitem_id': self.menuitem.id, 'quantity': 1},
+            {'menuitem_id': self.menuitem.id, 'quantity': 2},
+            {'action': 'set', 'menuitem_id': self.soup.id, 'quantity': 3},
+            {'menuitem_id': self.soup.id, 'quantity': 1},
+        )
+        self.assertEqual(self.cart(), {'Pasta': 7, 'Soup': 4})
+
+        self.batch(
+            {'action': 'remove', 'menuitem_id': self.menuitem.id},
+            {'menuitem_id': self.menuitem.id, 'quantity': 1},
+        )
+        self.assertEqual(self.cart(), {'Pasta': 1, 'Soup': 4})
+
+    def test_adds_reprice_the_whole_line(self):
+        self.client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 2})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menuitem.price = Decimal('10.00')
+            self.menuitem.save()
+
+        response = self.batch({'menuitem_id': self.menuitem.id, 'quantity': 1})
+
+        self.assertEqual(
+            [(row['quantity'], row['unit_price'], row['price']) for row in response.data['cart']],
+            [(3, '10.00', '30.00')])
+        self.assertEqual(response.data['total'], '30.00')
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        menuitems = MenuItem.objects.bulk_create([
+            MenuItem(title=f'Dish {i}', price=Decimal('3.00'), featured=False, category=self.category)
+            for i in range(20)])
+        self.batch({'menuitem_id': self.soup.id, 'quantity': 1})  # load the price snapshot
+
+        def queries(operations):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.batch(*operations)
+            self.assertEqual(response.status_code, 201)
+            return len(ctx.captured_queries)
+
+        one = queries([
+            {'menuitem_id': menuitems[0].id, 'quantity': 2},
+            {'action': 'set', 'menuitem_id': menuitems[1].id, 'quantity': 1},
+        ])
+        many = queries(
+            [{'menuitem_id': menuitem.id, 'quantity': 2} for menuitem in menuitems]
+            + [{'action': 'set', 'menuitem_id': menuitem.id, 'quantity': 1} for menuitem in menuitems[:5]])
+        self.assertEqual(one, many)
+
+    def test_unknown_items_change_nothing(self):
+        response = self.batch(
+            {'menuitem_id': self.soup.id, 'quantity': 1},
+            {'menuitem_id': 9999, 'quantity': 1},
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('9999', response.data['detail'])
+        self.assertEqual(self.cart(), {})
+
+    def test_lines_past_the_price_field_are_refused(self):
+        platter = MenuItem.objects.create(
+            title='Platter', price=Decimal('120.00'), featured=False, category=self.category)
+
+        response = self.batch({'action': 'set', 'menuitem_id': platter.id, 'quantity': 100})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.cart(), {})
+
+        self.batch({'menuitem_id': platter.id, 'quantity': 50})
+        response = self.batch({'menuitem_id': platter.id, 'quantity': 40})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/cart/', {'menuitem_id': platter.id, 'quantity': 40})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.cart(), {'Platter': 50})
+        self.assertEqual(self.client.get('/api/cart/summary/').data, {'items': 50, 'total': '6000.00'})
+
+    def test_rejects_invalid_operations(self):
+        self.assertEqual(self.batch().status_code, 400)
+        response = self.batch({'action': 'set', 'menuitem_id': self.soup.id})
+        self.assertEqual(response.status_code, 400)
+        response = self.batch({'menuitem_id': self.soup.id, 'quantity': 0})
+        self.assertEqual(response.status_code, 400)
+
+
+class MenuSnapshotTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        menu_snapshot.snapshot.clear()
+        self.desserts = Category.objects.create(slug='desserts', title='Desserts')
+        self.cake = MenuItem.objects.create(
+            title='Cake', price=Decimal('5.00'), featured=True, category=self.desserts)
+
+    def menu(self, **headers):
+        response = self.client.get('/api/menu/', **headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_groups_items_by_category(self):
+        menu = self.menu()
+
+        cake = {'id': self.cake.id, 'title': 'Cake', 'price': '5.00', 'featured': True, 'category': 'Desserts'}
+        self.assertEqual(menu['featured'], [cake])
+        self.assertEqual(menu['categories'], [
+            {'id': self.category.id, 'slug': 'mains', 'title': 'Mains', 'items': [
+                self.client.get(f'/api/menu-items/{self.menuitem.id}/').data]},
+            {'id': self.desserts.id, 'slug': 'desserts', 'title': 'Desserts', 'items': [cake]},
+        ])
+
+    def test_warm_requests_make_no_queries(self):
+        self.menu()
+
+        with self.assertNumQueries(0):
+            plain = self.client.get('/api/menu/')
+        with self.assertNumQueries(0):
+            compressed = self.client.get('/api/menu/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/api/menu/', HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_are_applied_incrementally(self):
+        self.menu()
+
+        with mock.patch.object(menu_snapshot.snapshot, '_reload') as reload:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.menuitem.featured = True
+                self.menuitem.save()
+                MenuItem.objects.create(
+                    title='Soup', price=Decimal('4.25'), featured=False, category=self.category)
+                self.cake.delete()
+            # the change stamps, then the three changed items
+            with self.assertNumQueries(2):
+                menu = self.menu()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.category.title = 'Main courses'
+                self.category.save()
+            menu_after_rename = self.menu()
+        reload.assert_not_called()
+
+        self.assertEqual([item['title'] for item in menu['featured']], ['Pasta'])
+        self.assertEqual([[item['title'] for item in category['items']] for category in menu['categories']],
+                         [['Pasta', 'Soup'], []])
+        self.assertEqual({item['category'] for item in menu_after_rename['categories'][0]['items']},
+                         {'Main courses'})
+        menu_snapshot.snapshot.clear()
+        self.assertEqual(self.menu(), menu_after_rename)
+
+    def test_unreported_changes_reload_everything(self):
+        self.menu()
+
+        # like another worker's write: no signal reaches this process
+        MenuItem.objects.filter(id=self.cake.id).update(price=Decimal('6.00'))
+        self.assertEqual(self.menu()['featured'][0]['price'], '5.00')
+
+        # the cached version expires after CATALOG_VERSION_MAX_AGE seconds
+        catalog_cache.get_cache().delete(catalog_cache.VERSION_KEY)
+        self.assertEqual(self.menu()['featured'][0]['price'], '6.00')
+
+    def test_reported_and_unreported_changes_together_reload_everything(self):
+        self.menu()
+
+        with mock.patch.object(menu_snapshot.snapshot, '_reload', wraps=menu_snapshot.snapshot._reload) as reload:
+            MenuItem.objects.filter(id=self.cake.id).update(price=Decimal('6.00'))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.menuitem.featured = True
+                self.menuitem.save()
+            menu = self.menu()
+        reload.assert_called_once()
+
+        self.assertEqual([(item['title'], item['price']) for item in menu['featured']],
+                         [('Pasta', '9.50'), ('Cake', '6.00')])
+
+
+class SalesRollupTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.drinks = Category.objects.create(slug='drinks', title='Drinks')
+        self.soda = MenuItem.objects.create(
+            title='Soda', price=Decimal('2.00'), featured=False, category=self.drinks)
+
+    def checkout(self, date, items):
+        self.client.force_authenticate(self.customer)
+        for menuitem, quantity in items:
+            self.client.post('/api/cart/', {'menuitem_id': menuitem.id, 'quantity': quantity})
+        response = self.client.post('/api/orders/', {'date': date})
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def sales(self, **params):
+        self.client.force_authenticate(self.manager)
+        response = self.client.get('/api/analytics/sales/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def snapshot(self):
+        return [
+            sorted(model.objects.values_list(*fields))
+            for model, fields in (
+                (DailySales, ('date', 'orders', 'revenue')),
+                (DailyMenuItemSales, ('date', 'menuitem_id', 'orders', 'quantity', 'revenue')),
+                (MonthlyMenuItemSales, ('month', 'menuitem_id', 'orders', 'quantity', 'revenue')),
+                (DailyCategorySales, ('date', 'category_id', 'orders', 'quantity', 'revenue')))
+        ]
+
+    def test_checkout_and_delete_update_rollups(self):
+        self.checkout('2023-06-01', [(self.menuitem, 2), (self.soda, 3)])
+        self.checkout('2023-06-01', [(self.menuitem, 1)])
+        last = self.checkout('2023-06-02', [(self.soda, 1)])
+
+        data = self.sales()
+        self.assertEqual((data['orders'], data['revenue']), (3, '36.50'))
+        self.assertEqual(
+            [(day['date'], day['orders'], day['revenue']) for day in data['days']],
+            [('2023-06-01', 2, '34.50'), ('2023-06-02', 1, '2.00')])
+        self.assertEqual(
+            [(row['title'], row['orders'], row['quantity'], row['revenue']) for row in data['categories']],
+            [('Mains', 2, 3, '28.50'), ('Drinks', 2, 4, '8.00')])
+
+        self.client.force_authenticate(self.manager)
+        self.assertEqual(self.client.delete(f'/api/orders/{last}/').status_code, 200)
+
+        data = self.sales(date__gte='2023-06-02')
+        self.assertEqual((data['orders'], data['revenue']), (0, '0.00'))
+        self.assertEqual(
+            [(row['title'], row['quantity']) for row in self.sales(limit=1)['menu_items']],
+            [('Pasta', 3)])
+
+    def test_backfill_matches_incremental_rollups(self):
+        self.checkout('2023-06-01', [(self.menuitem, 2), (self.soda, 3)])
+        self.checkout('2023-06-02', [(self.soda, 1)])
+        incremental = self.snapshot()
+
+        DailySales.objects.all().delete()
+        DailyMenuItemSales.objects.filter(date='2023-06-02').update(quantity=99)
+        call_command('backfill_sales_rollups', stdout=StringIO())
+
+        self.assertEqual(self.snapshot(), incremental)
+
+        out = StringIO()
+        call_command('backfill_sales_rollups', '--since', '2023-06-02', stdout=out)
+        self.assertIn('Rebuilt sales rollups for 1 days', out.getvalue())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_analytics_reads_only_rollups(self):
+        self.checkout('2023-06-01', [(self.menuitem, 2)])
+        self.sales()
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.sales()
+
+        # days, categories and their titles, months and menu item titles
+        self.assertEqual(len(ctx.captured_queries), 5)
+        for query in ctx.captured_queries:
+            self.assertNotIn('"LittleLemonAPI_order', query['sql'])
+
+    def test_menu_items_combine_months_and_days(self):
+        dates = ['2023-05-31', '2023-06-01', '2023-06-15', '2023-06-30', '2023-07-01', '2023-08-02']
+        for quantity, date in enumerate(dates, 1):
+            self.checkout(date, [(self.menuitem, quantity)])
+
+        for start, end in (
+                (None, None), ('2023-06-01', None), ('2023-06-02', None), (None, '2023-06-30'),
+                (None, '2023-07-01'), ('2023-05-31', '2023-07-01'), ('2023-06-01', '2023-06-30'),
+                ('2023-06-10', '2023-06-20'), ('2023-06-15', '2023-06-15'), ('2023-06-02', '2023-08-01')):
+            expected = sum(
+                quantity for quantity, date in enumerate(dates, 1)
+                if (start is None or date >= start) and (end is None or date <= end))
+            params = {key: value for key, value in (('date__gte', start), ('date__lte', end)) if value}
+            menu_items = self.sales(**params)['menu_items']
+            self.assertEqual(
+                [(row['title'], row['quantity']) for row in menu_items],
+                [('Pasta', expected)] if expected else [], params)
+
+    def test_managers_only(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/analytics/sales/').status_code, 403)
+
+        self.client.force_authenticate(self.manager)
+        self.assertEqual(self.client.get('/api/analytics/sales/', {'date__gte': 'soon'}).status_code, 400)
+
+
+class CatalogCacheTests(LittleLemonTestCase):
+    def test_repeated_reads_are_served_from_cache(self):
+        self.client.get('/api/menu-items/')
+        self.client.get(f'/api/menu-items/{self.menuitem.id}/')
+
+        with CaptureQueriesContext(connection) as ctx:
+            listing = self.client.get('/api/menu-items/')
+            single = self.client.get(f'/api/menu-items/{self.menuitem.id}/')
+
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(listing.data['results'][0]['title'], 'Pasta')
+        self.assertEqual(single.data['price'], '9.50')
+        self.assertEqual(catalog_cache.stats(), {'hits': 2, 'misses': 2})
+
+    def test_query_parameters_are_part_of_the_key(self):
+        MenuItem.objects.create(title='Bread', price=Decimal('2.00'), featured=False, category=self.category)
+
+        by_price = self.client.get('/api/menu-items/?ordering=price')
+        by_title = self.client.get('/api/menu-items/?ordering=-title')
+        searched = self.client.get('/api/menu-items/?search=bread')
+
+        self.assertEqual([i['title'] for i in by_price.data['results']], ['Bread', 'Pasta'])
+        self.assertEqual([i['title'] for i in by_title.data['results']], ['Pasta', 'Bread'])
+        self.assertEqual([i['title'] for i in searched.data['results']], ['Bread'])
+        self.assertEqual(catalog_cache.stats()['hits'], 0)
+
+    def test_writes_invalidate_cached_pages(self):
+        self.client.get('/api/menu-items/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.title = 'Main courses'
+            self.category.save()
+        response = self.client.get('/api/menu-items/')
+        self.assertEqual(response.data['results'][0]['category'], 'Main courses')
+
+        self.client.force_authenticate(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/menu-items/{self.menuitem.id}/', {'price': '11.00'})
+        response = self.client.get(f'/api/menu-items/{self.menuitem.id}/')
+        self.assertEqual(response.data['price'], '11.00')
+        self.assertEqual(catalog_cache.stats()['hits'], 0)
+
+
+
+class MenuItemImportTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.manager)
+
+    def post(self, body, content_type):
+        return self.client.generic('POST', '/api/menu-items/import/', body, content_type=content_type)
+
+    def test_json_upsert_with_row_errors(self):
+        rows = [
+            {'title': 'Soup', 'price': '4.50', 'category_id': self.category.id},
+            {'title': 'Pasta', 'price': '11.00', 'featured': True, 'category_id': self.category.id},
+            {'title': 'Tart', 'price': '3.00', 'category_id': 999},
+            {'title': 'Cake', 'price': 'cheap', 'category_id': self.category.id},
+            {'id': self.menuitem.id, 'title': 'Soup', 'price': '1.00', 'category_id': self.category.id},
+        ]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/menu-items/import/', rows, format='json')
+
+        # role stamps, roles, categories, items by id, items by title,
+        # INSERT, UPDATE; the change stamp is bumped by the database's triggers
+        self.assertEqual(
+            len([query for query in ctx.captured_queries if 'SAVEPOINT' not in query['sql']]), 7)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(
+            [(error['row'], sorted(error['errors'])) for error in response.data['errors']],
+            [(3, ['category_id']), (4, ['price']), (5, ['title'])])
+
+        self.menuitem.refresh_from_db()
+        self.assertEqual((self.menuitem.price, self.menuitem.featured), (Decimal('11.00'), True))
+        self.assertTrue(MenuItem.objects.filter(title='Soup', price=Decimal('4.50')).exists())
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def run(count, offset):
+            rows = [{'title': f'Item {offset + i}', 'price': '1.00', 'category_id': self.category.id}
+                    for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post('/api/menu-items/import/', rows, format='json')
+            return len(ctx.captured_queries)
+
+        run(1, 1000)  # resolve the manager's roles
+        self.assertEqual(run(5, 0), run(200, 100))
+
+    def test_ndjson_and_csv_uploads(self):
+        ndjson = (f'{{"title": "Soup", "price": "4.50", "category_id": {self.category.id}}}\n'
+                  '\n'
+                  f'{{"title": "Salad", "price": "6", "category_id": {self.category.id}}}\n')
+        response = self.post(ndjson, 'application/x-ndjson')
+        self.assertEqual((response.data['created'], response.data['errors']), (2, []))
+
+        csv = (f'id,title,price,featured,category_id\n'
+               f',Tart,3.25,true,{self.category.id}\n'
+               f'{self.menuitem.id},Pasta,10.00,,{self.category.id}\n'
+               f',Cake,,false,{self.category.id}\n')
+        response = self.post(csv, 'text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual(response.data['errors'][0]['row'], 3)
+        self.assertTrue(MenuItem.objects.get(title='Tart').featured)
+
+    def test_malformed_body_is_rejected(self):
+        response = self.post('{"title": "Soup"}\nnot json\n', 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MenuItem.objects.filter(title='Soup').exists())
+        self.assertEqual(self.client.post('/api/menu-items/import/', {}, format='json').status_code, 400)
+
+    def test_import_invalidates_catalog_cache(self):
+        self.client.get('/api/menu-items/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/menu-items/import/', [
+                {'title': 'Soup', 'price': '4.50', 'category_id': self.category.id}], format='json')
+
+        self.assertEqual(self.client.get('/api/menu-items/').data['count'], 2)
+
+    def test_background_import_runs_in_the_worker(self):
+        csv = (f'title,price,category_id\n'
+               f'Soup,4.50,{self.category.id}\n'
+               f'Tart,cheap,{self.category.id}\n')
+
+        response = self.client.generic(
+            'POST', '/api/menu-items/import/?background=true', csv, content_type='text/csv')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Job.objects.get().id, response.data['job'])
+        self.assertFalse(MenuItem.objects.filter(title='Soup').exists())
+
+        with self.assertLogs('LittleLemonAPI.tasks') as logs:
+            call_command('run_jobs', '--once', '--threads', '1', stdout=StringIO())
+        self.assertTrue(MenuItem.objects.filter(title='Soup').exists())
+        self.assertIn('1 created', logs.output[0])
+        self.assertIn('skipped 1 rows', logs.output[1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_managers_only(self):
+        self.client.force_authenticate(self.customer)
+
+        response = self.client.post('/api/menu-items/import/', [], format='json')
+
+        self.assertEqual(response.status_code, 403)
+
+
+class ConditionalGetTests(LittleLemonTestCase):
+    POLLS = 10
+
+    def poll(self, url):
+        """Poll `url` like a mobile client and return the bytes received."""
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+
+        sent = len(first.content)
+        for _ in range(self.POLLS - 1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(response.status_code, 304)
+            sent += len(response.content)
+        return len(first.content), sent
+
+    def test_polling_unchanged_resources_only_sends_the_body_once(self):
+        order = self.create_order(self.customer, [(self.menuitem, 2)])
+        self.client.force_authenticate(self.manager)
+
+        for url in ('/api/menu-items/', f'/api/menu-items/{self.menuitem.id}/',
+                    '/api/category/', '/api/orders/', f'/api/orders/{order.id}/'):
+            body, sent = self.poll(url)
+            self.assertEqual(sent, body, url)
+
+    def test_changes_produce_a_new_etag(self):
+        order = self.create_order(self.customer, [(self.menuitem, 2)])
+        self.client.force_authenticate(self.manager)
+        first = self.client.get(f'/api/orders/{order.id}/')
+
+        order.status = True
+        order.save()
+        response = self.client.get(f'/api/orders/{order.id}/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+        menu = self.client.get('/api/menu-items/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menuitem.title = 'Penne'
+            self.menuitem.save()
+        response = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=menu['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['title'], 'Penne')
+
+    def test_catalog_etags_follow_writes_this_process_did_not_see(self):
+        self.client.force_authenticate(self.manager)
+        first = self.client.get('/api/category/')
+
+        # like another worker's write: no signal reaches this process
+        Category.objects.filter(id=self.category.id).update(title='Main courses')
+        response = self.client.get('/api/category/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        # the cached version expires after CATALOG_VERSION_MAX_AGE seconds
+        catalog_cache.get_cache().delete(catalog_cache.VERSION_KEY)
+        response = self.client.get('/api/category/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['title'], 'Main courses')
+
+    def test_logins_keep_order_etags(self):
+        self.customer.set_password('lemon-pass')
+        self.customer.save()
+        self.create_order(self.customer, [(self.menuitem, 1)])
+        self.client.force_authenticate(self.manager)
+        first = self.client.get('/api/orders/')
+
+        response = self.client.post('/token/login/', {'username': 'customer1', 'password': 'lemon-pass'})
+        self.assertEqual(response.status_code, 200)
+        self.customer.refresh_from_db()
+        self.assertIsNotNone(self.customer.last_login)
+        response = self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.customer.username = 'customer2'
+        self.customer.save(update_fields=['username'])
+        response = self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_order_etags_differ_per_user(self):
+        self.create_order(self.customer, [(self.menuitem, 1)])
+
+        self.client.force_authenticate(self.manager)
+        manager_etag = self.client.get('/api/orders/')['ETag']
+        self.client.force_authenticate(self.customer)
+        response = self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=manager_etag)
+
+        self.assertEqual(response.status_code, 200)
+
+
+class CursorPaginationTests(LittleLemonTestCase):
+    def walk(self, url):
+        titles, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response)
+            titles += [row['title'] for row in response.data['results']]
+            url = response.data['next']
+        return titles, pages
+
+    def setUp(self):
+        super().setUp()
+        prices = ['4.00', '2.00', '4.00', '1.00', '4.00', '3.00', '2.00']
+        for i, price in enumerate(prices):
+            MenuItem.objects.create(
+                title=f'Item {i}', price=Decimal(price), featured=False, category=self.category)
+
+    def test_walks_every_item_once_in_ordering(self):
+        expected = list(MenuItem.objects.order_by('price', 'id').values_list('title', flat=True))
+
+        titles, pages = self.walk('/api/menu-items/?pagination=cursor&ordering=price')
+
+        self.assertEqual(titles, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0].data['previous'])
+        self.assertNotIn('count', pages[0].data)
+
+    def test_descending_ordering_and_previous_links(self):
+        expected = list(MenuItem.objects.order_by('-price', '-title', '-id').values_list('title', flat=True))
+
+        titles, pages = self.walk('/api/menu-items/?pagination=cursor&ordering=-price,-title')
+        self.assertEqual(titles, expected)
+
+        back = self.client.get(pages[-1].data['previous'])
+        self.assertEqual(back.data['results'], pages[-2].data['results'])
+
+    def test_cursor_mode_skips_count_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/menu-items/?pagination=cursor')
+
+        self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql']])
+
+    def test_orders_page_by_date(self):
+        for day in (3, 1, 2, 1):
+            order = self.create_order(self.customer)
+            order.date = datetime.date(2023, 6, day)
+            order.save()
+        self.client.force_authenticate(self.customer)
+
+        url, dates = '/api/orders/?pagination=cursor&ordering=-date&page_size=2', []
+        while url:
+            response = self.client.get(url)
+            dates += [row['date'] for row in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(dates, ['2023-06-03', '2023-06-02', '2023-06-01', '2023-06-01'])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/menu-items/?pagination=cursor&cursor=bogus')
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get('/api/menu-items/?pagination=cursor&ordering=price&cursor=eyJwIjogWyJ4IiwgIjEiXSwgInIiOiAwfQ==')
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_mode_is_the_default(self):
+        response = self.client.get('/api/menu-items/')
+        self.assertEqual(response.data['count'], 8)
+
+
+class QueryPlanAuditTests(TestCase):
+    def test_endpoints_avoid_full_table_scans(self):
+        out = StringIO()
+        call_command('audit_query_plans', stdout=out)
+        self.assertIn('No unexpected full table scans', out.getvalue())
+
+    def test_full_table_scans_are_reported(self):
+        # two-letter terms are too short for the trigram index
+        endpoints = [('anonymous', '/api/menu-items/?search=au', set())]
+        with mock.patch('LittleLemonAPI.management.commands.audit_query_plans.ENDPOINTS', endpoints):
+            with self.assertRaisesMessage(CommandError, 'LittleLemonAPI_menuitem'):
+                call_command('audit_query_plans', stdout=StringIO())
+
+
+class FullTextSearchTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        desserts = Category.objects.create(slug='desserts', title='Desserts')
+        self.tiramisu = MenuItem.objects.create(
+            title='Tiramisu', price=Decimal('5.00'), featured=True, category=desserts)
+        self.lasagna = MenuItem.objects.create(
+            title='Lasagna', price=Decimal('12.00'), featured=False, category=self.category)
+
+    def search(self, term, url='/api/menu-items/'):
+        response = self.client.get(url, {'search': term, 'page_size': 6})
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['title'] if 'title' in row else row['id'] for row in response.data['results'])
+
+    def test_matches_substrings_of_titles_and_categories(self):
+        self.assertEqual(self.search('asag'), ['Lasagna'])
+        self.assertEqual(self.search('MAINS'), ['Lasagna', 'Pasta'])
+        self.assertEqual(self.search('ssert'), ['Tiramisu'])
+        self.assertEqual(self.search('sta mains'), ['Pasta'])
+        self.assertEqual(self.search('zzz'), [])
+
+    def test_matches_the_like_based_search(self):
+        for term in ('asa', 'mains', 'a', 'pa ins', 'ti,des', '"'):
+            with override_settings(FULL_TEXT_SEARCH=False):
+                expected = self.search(term)
+            self.assertEqual(self.search(term), expected, term)
+
+    def test_index_follows_writes(self):
+        self.lasagna.title = 'Cannelloni'
+        self.lasagna.save()
+        self.category.title = 'Primi'
+        self.category.save()
+        self.tiramisu.delete()
+
+        self.assertEqual(self.search('asag'), [])
+        self.assertEqual(self.search('nnell'), ['Cannelloni'])
+        self.assertEqual(self.search('prim'), ['Cannelloni', 'Pasta'])
+        self.assertEqual(self.search('misu'), [])
+
+    def test_order_search_joins_through_items(self):
+        both = self.create_order(self.customer, [(self.tiramisu, 1), (self.lasagna, 1)])
+        pasta = self.create_order(self.customer, [(self.menuitem, 2)])
+        self.client.force_authenticate(self.customer)
+
+        self.assertEqual(self.search('lasag', '/api/orders/'), [both.id])
+        self.assertEqual(self.search('sta', '/api/orders/'), [pasta.id])
+        self.assertEqual(self.search('a', '/api/orders/'), [both.id, pasta.id])
+
+        for term in ('lasag tira', 'tira mi', 'sag na', 'a s', 'zzz'):
+            with override_settings(FULL_TEXT_SEARCH=False):
+                expected = self.search(term, '/api/orders/')
+            self.assertEqual(self.search(term, '/api/orders/'), expected, term)
+
+
+class AsyncViewTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(4):
+            MenuItem.objects.create(
+                title=f'Item {i}', price=Decimal(f'{i}.25'), featured=False, category=self.category)
+        self.order = self.create_order(self.customer, [(self.menuitem, 2)], delivery_crew=self.delivery)
+        self.create_order(self.manager, [(self.menuitem, 1)])
+
+    def assertSameResponse(self, path, user=None, **headers):
+        client = APIClient()
+        if user is not None:
+            # the async views only see real credentials, not force_authenticate
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        sync = client.get(f'/api/{path}', **headers)
+        catalog_cache.get_cache().clear()
+        asynchronous = client.get(f'/api/async/{path}', **headers)
+
+        self.assertEqual(asynchronous.status_code, sync.status_code, path)
+        self.assertEqual(asynchronous.content.replace(b'/api/async/', b'/api/'), sync.content, path)
+        return asynchronous
+
+    def test_same_output_as_sync_views(self):
+        for path in ('menu-items/', 'menu-items/?page=2', 'menu-items/?ordering=-price&page_size=6',
+                     f'menu-items/?category={self.category.id}', 'menu-items/?search=item',
+                     'menu-items/?pagination=cursor&ordering=price', f'menu-items/{self.menuitem.id}/',
+                     'menu-items/999/', 'menu-items/?page=9'):
+            self.assertSameResponse(path)
+
+        for path in ('category/', f'category/{self.category.id}/', 'orders/', 'orders/?ordering=-total',
+                     f'orders/{self.order.id}/'):
+            self.assertSameResponse(path, self.manager)
+
+        self.assertSameResponse('orders/', self.customer)
+        self.assertSameResponse('orders/', self.delivery)
+
+    def test_same_permissions_as_sync_views(self):
+        response = self.assertSameResponse('orders/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+        self.assertEqual(self.assertSameResponse('category/', self.customer).status_code, 403)
+        self.assertEqual(self.assertSameResponse('category/').status_code, 403)
+        self.assertEqual(
+            self.assertSameResponse('orders/', HTTP_AUTHORIZATION='Token nope').status_code, 401)
+
+    def test_inactive_user_is_rejected(self):
+        self.customer.is_active = False
+        self.customer.save()
+
+        self.assertEqual(self.assertSameResponse('orders/', self.customer).status_code, 401)
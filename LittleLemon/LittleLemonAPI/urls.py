@@ -4,25 +4,55 @@ from .views import (
     SingleCategoryView,
     MenuItemsView,
     SingleMenuItemView,
+    MenuItemImportView,
+    MenuSnapshotView,
     ManagersView,
     SingleManagerView,
     DeliveryCrewView,
     SingleDeliveryView,
     CartView,
+    CartBatchView,
+    CartSummaryView,
     OrderView,
+    OrderExportView,
+    OrderDispatchView,
+    SalesAnalyticsView,
+    MetricsView,
     SingleOrderView
 )
+from .async_views import (
+    AsyncCategoriesView,
+    AsyncSingleCategoryView,
+    AsyncMenuItemsView,
+    AsyncSingleMenuItemView,
+    AsyncOrderView,
+    AsyncSingleOrderView
+)
 
 urlpatterns = [
     path("category/", CategoriesView.as_view()),
     path("category/<int:pk>/", SingleCategoryView.as_view()),
     path("menu-items/", MenuItemsView.as_view()),
+    path("menu-items/import/", MenuItemImportView.as_view()),
     path("menu-items/<int:pk>/", SingleMenuItemView.as_view()),
+    path("menu/", MenuSnapshotView.as_view()),
     path("groups/managers/users/", ManagersView.as_view()),
     path("groups/managers/users/<int:pk>/", SingleManagerView.as_view()),
     path("groups/delivery-crew/users/", DeliveryCrewView.as_view()),
     path("groups/delivery-crew/users/<int:pk>/", SingleDeliveryView.as_view()),
     path("cart/", CartView.as_view()),
+    path("cart/batch/", CartBatchView.as_view()),
+    path("cart/summary/", CartSummaryView.as_view()),
     path("orders/", OrderView.as_view()),
-    path("orders/<int:pk>/", SingleOrderView.as_view())
+    path("orders/export/", OrderExportView.as_view()),
+    path("orders/dispatch/", OrderDispatchView.as_view()),
+    path("orders/<int:pk>/", SingleOrderView.as_view()),
+    path("analytics/sales/", SalesAnalyticsView.as_view()),
+    path("metrics/", MetricsView.as_view()),
+    path("async/category/", AsyncCategoriesView.as_view()),
+    path("async/category/<int:pk>/", AsyncSingleCategoryView.as_view()),
+    path("async/menu-items/", AsyncMenuItemsView.as_view()),
+    path("async/menu-items/<int:pk>/", AsyncSingleMenuItemView.as_view()),
+    path("async/orders/", AsyncOrderView.as_view()),
+    path("async/orders/<int:pk>/", AsyncSingleOrderView.as_view())
 ]
@@ -1,82 +1,262 @@
+import hashlib
+import re
+
+from django.conf import settings
 from django.shortcuts import render
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers, quote_etag
+from django.utils.http import http_date
 from django.contrib.auth.models import Group, User
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.exceptions import PermissionDenied, NotFound, ValidationError
 from rest_framework import generics
 from rest_framework.response import Response
-from .models import Category, MenuItem, Cart, Order, OrderItem
-from .serializers import CategorySerializer, MenuItemSerializer, UserSerializer, CartSerializer, OrderSerializer, SimpleOrderSerializer
-from rest_framework.pagination import PageNumberPagination
+from .models import Category, MenuItem, Cart, CartSummary, Order, OrderItem
+from .serializers import CategorySerializer, MenuItemSerializer, UserSerializer, CartSerializer, CartBatchSerializer, CartSummarySerializer, OrderSerializer, SimpleOrderSerializer, DispatchSerializer, MenuImportQuerySerializer, SalesQuerySerializer, DailySalesSerializer, SalesBreakdownSerializer
+from .roles import MANAGER, DELIVERY_CREW, is_manager, is_delivery_crew, get_roles
+from . import catalog_cache, changes, jobs, menu_snapshot, rollups
+from .cart_summary import clear_cart, get_summary
+from .dispatch import dispatch
+from .exports import export_orders, flatten_items
+from .idempotency import IdempotentCreateMixin
+from .instrumentation import InstrumentedViewMixin, render_counter, render_prometheus
+from .lean_serializers import LeanMenuItemSerializer, LeanOrderSerializer, LeanSimpleOrderSerializer
+from .menu_import import import_menu_items
+from .pagination import CursorPaginationClass
+from .parsers import FastJSONParser, NDJSONParser, CSVParser
+from .renderers import NDJSONRenderer, CSVRenderer
 # Create your views here.
 
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class ConditionalGetMixin:
+    """Send strong ETag/Last-Modified validators and answer 304 when they match.
+
+    The validators come from the `ChangeStamp` versions of `etag_models`,
+    so a repeated poll costs one small query and no serialization.
+    """
+    etag_models = ()
+    etag_per_user = False
+
+    def get_validators(self, request):
+        stamps = changes.stamps(self.etag_models)
+        state = ':'.join(str(version) for version, _ in stamps)
+        last_modified = max(
+            (modified for _, modified in stamps if modified), default=None)
+        return state, last_modified
+
+    def get(self, request, *args, **kwargs):
+        state, last_modified = self.get_validators(request)
+
+        parts = [type(self).__name__, request.get_full_path(), state]
+        if self.etag_per_user:
+            parts += [str(request.user.pk), ','.join(sorted(get_roles(request.user)))]
+        etag = quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class CatalogConditionalGetMixin(ConditionalGetMixin):
+    """Derive validators from the catalog version.
+
+    It comes from the same `ChangeStamp`s as the order validators, but is
+    cached for a couple of seconds, so most polls make no query.
+    """
+
+    def get_validators(self, request):
+        version = catalog_cache.current_version()
+        return str(version), version.modified
+
+
+class CatalogCacheMixin:
+    """Serve list/retrieve responses from the versioned catalog cache."""
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response('list', super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response('retrieve', super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, scope, render, request, *args, **kwargs):
+        key = catalog_cache.make_key(request, scope)
+        data = catalog_cache.lookup(key)
+        if data is not None:
+            return Response(data)
+
+        response = render(request, *args, **kwargs)
+        if response.status_code == 200:
+            catalog_cache.store(key, response.data)
+        return response
+
+
+class LeanReadMixin:
+    """Answer GET list/retrieve from `.values()` rows with `lean_serializer_class`.
+
+    The JSON is the same as `serializer_class` produces; writes and
+    everything else still go through the DRF serializer.
+    """
+    lean_serializer_class = None
+
+    def use_lean_serializer(self):
+        return self.lean_serializer_class is not None and getattr(settings, 'LEAN_SERIALIZERS', True)
+
+    def get_lean_queryset(self):
+        serializer = self.lean_serializer_class()
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        return serializer, queryset.values(*serializer.columns)
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_lean_serializer():
+            return super().list(request, *args, **kwargs)
 
-class PaginationClass(PageNumberPagination):
-    page_size = 3
-    page_size_query_param = 'page_size'
-    max_page_size = 6
+        serializer, queryset = self.get_lean_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
 
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_lean_serializer():
+            return super().retrieve(request, *args, **kwargs)
 
-class CategoriesView(generics.ListCreateAPIView):
+        serializer, queryset = self.get_lean_queryset()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = generics.get_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        return Response(serializer.serialize([row])[0])
+
+
+class CategoriesView(InstrumentedViewMixin, CatalogConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
     def get_permissions(self):
-        isManager = self.request.user.groups.filter(name="Manager").exists()
+        isManager = is_manager(self.request.user)
         if not isManager:
             raise PermissionDenied()
 
         return [IsAuthenticated()]
 
 
-class SingleCategoryView(generics.RetrieveUpdateDestroyAPIView):
+class SingleCategoryView(InstrumentedViewMixin, CatalogConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAdminUser]
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
     def get_permissions(self):
-        isManager = self.request.user.groups.filter(name="Manager").exists()
+        isManager = is_manager(self.request.user)
         if not isManager:
             raise PermissionDenied()
 
         return [IsAuthenticated()]
 
 
-class MenuItemsView(generics.ListCreateAPIView):
-    queryset = MenuItem.objects.all()
+class MenuItemsView(InstrumentedViewMixin, CatalogConditionalGetMixin, CatalogCacheMixin, LeanReadMixin, generics.ListCreateAPIView):
+    queryset = MenuItem.objects.select_related('category')
     serializer_class = MenuItemSerializer
+    lean_serializer_class = LeanMenuItemSerializer
     ordering_fields = ['price', 'title']
     search_fields = ['title', 'category__title']
     filterset_fields = ['category']
-    pagination_class = PaginationClass
+    pagination_class = CursorPaginationClass
 
     def get_permissions(self):
         if self.request.method == "GET":
             return []
 
-        isManager = self.request.user.groups.filter(name="Manager").exists()
+        isManager = is_manager(self.request.user)
         if not isManager:
             raise PermissionDenied()
 
         return [IsAuthenticated()]
 
 
-class SingleMenuItemView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = MenuItem.objects.all()
+class SingleMenuItemView(InstrumentedViewMixin, CatalogConditionalGetMixin, CatalogCacheMixin, LeanReadMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = MenuItem.objects.select_related('category')
     serializer_class = MenuItemSerializer
+    lean_serializer_class = LeanMenuItemSerializer
 
     def get_permissions(self):
         if self.request.method == "GET":
             return []
 
-        isManager = self.request.user.groups.filter(name="Manager").exists()
+        isManager = is_manager(self.request.user)
         if not isManager:
             raise PermissionDenied()
 
         return [IsAuthenticated()]
 
 
-class ManagersView(generics.ListAPIView):
-    queryset = User.objects.all().filter(groups__name="Manager")
+class MenuItemImportView(InstrumentedViewMixin, generics.GenericAPIView):
+    """Create or update many menu items from a JSON array, NDJSON or CSV body.
+
+    With `?background=true`, queue the import for `run_jobs` and answer
+    202 with the job id; the worker logs the summary.
+    """
+    parser_classes = [FastJSONParser, NDJSONParser, CSVParser]
+
+    def post(self, request):
+        params = MenuImportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        rows = request.data
+        if isinstance(rows, dict) or not hasattr(rows, '__iter__'):
+            raise ValidationError('Expected a list of menu items')
+
+        if params.validated_data['background']:
+            # the rows travel in the job's payload, so the body is read now
+            job = jobs.enqueue('import_menu_items', {'rows': list(rows)})
+            return Response({'job': job.id}, status=202)
+
+        return Response(import_menu_items(rows), status=200)
+
+    def get_permissions(self):
+        isManager = is_manager(self.request.user)
+        if not isManager:
+            raise PermissionDenied()
+
+        return [IsAuthenticated()]
+
+
+class MenuSnapshotView(InstrumentedViewMixin, generics.GenericAPIView):
+    """Featured items and every category with its items, from `menu_snapshot`.
+
+    The body is encoded once per catalog version and sent gzipped to
+    clients that accept it; a warm request makes no query.
+    """
+    permission_classes = []
+
+    def get(self, request):
+        menu = menu_snapshot.get()
+        gzipped = bool(ACCEPTS_GZIP.search(request.headers.get('Accept-Encoding', '')))
+        etag = quote_etag(f"menu-{menu.version}{'-gzip' if gzipped else ''}")
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(menu.gzipped if gzipped else menu.body, content_type='application/json')
+            if gzipped:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+
+class ManagersView(InstrumentedViewMixin, generics.ListAPIView):
+    queryset = User.objects.all().filter(groups__name=MANAGER)
     serializer_class = UserSerializer
 
     def post(self, request):
@@ -91,7 +271,7 @@ class ManagersView(generics.ListAPIView):
         if not user:
             raise ValidationError(detail="User not found")
 
-        group = Group.objects.get(name="Manager")
+        group = Group.objects.get(name=MANAGER)
 
         user.groups.add(group)
 
@@ -100,20 +280,20 @@ class ManagersView(generics.ListAPIView):
         )
 
     def get_permissions(self):
-        isManager = self.request.user.groups.filter(name="Manager").exists()
+        isManager = is_manager(self.request.user)
         if not isManager:
             raise PermissionDenied()
 
         return [IsAuthenticated()]
 
 
-class SingleManagerView(generics.RetrieveDestroyAPIView):
+class SingleManagerView(InstrumentedViewMixin, generics.RetrieveDestroyAPIView):
     serializer_class = UserSerializer
 
     def get(self, request, pk):
         user = User.objects.get(id=pk)
 
-        if not user or not user.groups.filter(name="Manager"):
+        if not user or not is_manager(user):
             raise NotFound()
 
         serializer = self.serializer_class(user)
@@ -121,7 +301,7 @@ class SingleManagerView(generics.RetrieveDestroyAPIView):
         return Response(serializer.data)
 
     def delete(self, request, pk):
-        group = Group.objects.get(name="Manager")
+        group = Group.objects.get(name=MANAGER)
 
         user = User.objects.get(id=pk)
 
@@ -133,15 +313,15 @@ class SingleManagerView(generics.RetrieveDestroyAPIView):
         return Response({"detail": f"User remove to Manager's group"}, status=200)
 
     def get_permissions(self):
-        isManager = self.request.user.groups.filter(name="Manager").exists()
+        isManager = is_manager(self.request.user)
         if not isManager:
             raise PermissionDenied()
 
         return [IsAuthenticated()]
 
 
-class DeliveryCrewView(generics.ListAPIView):
-    queryset = User.objects.all().filter(groups__name="delivery crew")
+class DeliveryCrewView(InstrumentedViewMixin, generics.ListAPIView):
+    queryset = User.objects.all().filter(groups__name=DELIVERY_CREW)
     serializer_class = UserSerializer
 
     def post(self, request):
@@ -155,7 +335,7 @@ class DeliveryCrewView(generics.ListAPIView):
 
         if not user:
             raise ValidationError(detail="User not found")
-        group = Group.objects.get(name="delivery crew")
+        group = Group.objects.get(name=DELIVERY_CREW)
 
         user.groups.add(group)
 
@@ -164,20 +344,20 @@ class DeliveryCrewView(generics.ListAPIView):
         )
 
     def get_permissions(self):
-        isManager = self.request.user.groups.filter(name="Manager").exists()
+        isManager = is_manager(self.request.user)
         if not isManager:
             raise PermissionDenied()
 
         return [IsAuthenticated()]
 
 
-class SingleDeliveryView(generics.RetrieveDestroyAPIView):
+class SingleDeliveryView(InstrumentedViewMixin, generics.RetrieveDestroyAPIView):
     serializer_class = UserSerializer
 
     def get(self, request, pk):
         user = User.objects.get(id=pk)
 
-        if not user or not user.groups.filter(name="delivery crew"):
+        if not user or not is_delivery_crew(user):
             raise NotFound()
 
         serializer = self.serializer_class(user)
@@ -185,7 +365,7 @@ class SingleDeliveryView(generics.RetrieveDestroyAPIView):
         return Response(serializer.data)
 
     def delete(self, request, pk):
-        group = Group.objects.get(name="delivery crew")
+        group = Group.objects.get(name=DELIVERY_CREW)
 
         user = User.objects.get(id=pk)
 
@@ -197,14 +377,14 @@ class SingleDeliveryView(generics.RetrieveDestroyAPIView):
         return Response({"detail": f"User remove to delivery crew group"}, status=200)
 
     def get_permissions(self):
-        isManager = self.request.user.groups.filter(name="Manager").exists()
+        isManager = is_manager(self.request.user)
         if isManager:
             raise PermissionDenied()
 
         return [IsAuthenticated()]
 
 
-class CartView(generics.ListCreateAPIView):
+class CartView(InstrumentedViewMixin, IdempotentCreateMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     queryset = Cart.objects.all()
     serializer_class = CartSerializer
@@ -212,46 +392,193 @@ class CartView(generics.ListCreateAPIView):
     def get_queryset(self):
         return super().get_queryset().filter(user=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # the body stays a plain list; the summary rides along in headers
+        items, total = get_summary(request.user)
+        response['Cart-Items'] = str(items)
+        response['Cart-Total'] = str(total)
+        return response
+
     def delete(self, request):
 
-        Cart.objects.filter(user=self.request.user).delete()
+        clear_cart(self.request.user)
 
         return Response({'detail': 'Ok'}, status=200)
 
 
-class OrderView(generics.ListCreateAPIView):
+class CartBatchView(InstrumentedViewMixin, IdempotentCreateMixin, generics.CreateAPIView):
+    """Add, change and remove many cart items in one request and one transaction."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = CartBatchSerializer
+
+
+class CartSummaryView(InstrumentedViewMixin, generics.RetrieveAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = CartSummarySerializer
+
+    def get_object(self):
+        # users who never added anything have no summary row yet
+        return CartSummary.objects.filter(user=self.request.user).first() or CartSummary(
+            user=self.request.user)
+
+
+class OrderView(InstrumentedViewMixin, ConditionalGetMixin, LeanReadMixin, IdempotentCreateMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
-    pagination_class = PaginationClass
+    lean_serializer_class = LeanOrderSerializer
+    etag_models = (Order, OrderItem, MenuItem, User)
+    etag_per_user = True
+    pagination_class = CursorPaginationClass
     ordering_fields = ['total', 'status', 'date']
     search_fields = ['orders__menuitem__title']
 
     def get_queryset(self):
-        isManager = self.request.user.groups.filter(name="Manager").exists()
-        isDeliveryCrew = self.request.user.groups.filter(
-            name="Manager").exists()
+        isManager = is_manager(self.request.user)
+        isDeliveryCrew = is_delivery_crew(self.request.user)
+        orders = Order.objects.with_items().order_by('id')
+
         if isManager:
-            return Order.objects.all()
+            return orders
 
         if isDeliveryCrew:
-            return Order.objects.filter(delivery_crew=self.request.user)
+            return orders.filter(delivery_crew=self.request.user)
 
-        return Order.objects.filter(user=self.request.user)
+        return orders.filter(user=self.request.user)
 
 
-class SingleOrderView(generics.RetrieveUpdateDestroyAPIView):
+class SingleOrderView(InstrumentedViewMixin, ConditionalGetMixin, LeanReadMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
-    queryset = Order.objects.all()
+    queryset = Order.objects.with_items()
     serializer_class = SimpleOrderSerializer
+    lean_serializer_class = LeanSimpleOrderSerializer
+    etag_models = (Order, OrderItem, MenuItem, User)
 
     def delete(self, request, pk):
-        isManager = self.request.user.groups.filter(name="Manager").exists()
+        isManager = is_manager(self.request.user)
 
         if not isManager:
             raise PermissionDenied()
 
         order = Order.objects.filter(id=pk).first()
 
-        order.delete()
+        if not order:
+            raise NotFound()
+
+        with transaction.atomic():
+            rollups.remove_order(order)
+            order.delete()
 
         return Response({'detail': 'Order deleted successfully'}, status=200)
+
+
+class OrderExportView(InstrumentedViewMixin, generics.GenericAPIView):
+    """Stream every matching order as NDJSON (one order per line) or CSV
+    (one line per order item). Pick the format with `?format=` or Accept."""
+    queryset = Order.objects.all()
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'date': ['exact', 'gte', 'lte'],
+        'status': ['exact'],
+        'delivery_crew': ['exact'],
+    }
+
+    def get(self, request):
+        renderer = request.accepted_renderer
+        rows = export_orders(self.filter_queryset(self.get_queryset()))
+        if renderer.format == 'csv':
+            rows = flatten_items(rows)
+
+        response = StreamingHttpResponse(
+            renderer.stream(rows), content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = f'attachment; filename="orders.{renderer.format}"'
+        return response
+
+    def get_permissions(self):
+        isManager = is_manager(self.request.user)
+        if not isManager:
+            raise PermissionDenied()
+
+        return [IsAuthenticated()]
+
+
+class OrderDispatchView(InstrumentedViewMixin, generics.GenericAPIView):
+    """Assign pending orders to the least-loaded delivery crew members.
+
+    With `background`, queue the work for `run_jobs` and answer 202 with
+    the job id.
+    """
+
+    def post(self, request):
+        params = DispatchSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+
+        if params.validated_data['background']:
+            job = jobs.enqueue('dispatch_orders', {'limit': params.validated_data.get('limit')})
+            return Response({'job': job.id}, status=202)
+
+        assignments = dispatch(params.validated_data.get('limit'))
+        return Response({
+            'assigned': sum(len(order_ids) for order_ids in assignments.values()),
+            'crew': [
+                {'id': crew_id, 'orders': order_ids}
+                for crew_id, order_ids in sorted(assignments.items())
+            ],
+        })
+
+    def get_permissions(self):
+        isManager = is_manager(self.request.user)
+        if not isManager:
+            raise PermissionDenied()
+
+        return [IsAuthenticated()]
+
+
+class SalesAnalyticsView(InstrumentedViewMixin, generics.GenericAPIView):
+    """Revenue per day, per category and for the best-selling menu items.
+
+    Reads only the rollup tables, so the cost depends on the length of
+    the date range rather than on the number of orders.
+    """
+
+    def get(self, request):
+        params = SalesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        sales = rollups.report(
+            params.validated_data.get('date__gte'), params.validated_data.get('date__lte'),
+            params.validated_data['limit'])
+
+        return Response({
+            'orders': sum(day['orders'] for day in sales['days']),
+            'revenue': DailySalesSerializer().fields['revenue'].to_representation(
+                sum(day['revenue'] for day in sales['days'])),
+            'days': DailySalesSerializer(sales['days'], many=True).data,
+            'categories': SalesBreakdownSerializer(sales['categories'], many=True).data,
+            'menu_items': SalesBreakdownSerializer(sales['menu_items'], many=True).data,
+        })
+
+    def get_permissions(self):
+        isManager = is_manager(self.request.user)
+        if not isManager:
+            raise PermissionDenied()
+
+        return [IsAuthenticated()]
+
+
+class MetricsView(InstrumentedViewMixin, generics.GenericAPIView):
+    """Request metrics and catalog cache counters in the Prometheus text format."""
+
+    def get(self, request):
+        body = render_prometheus() + render_counter(
+            'littlelemon_catalog_cache_lookups_total', 'Catalog cache lookups by result.',
+            'result', catalog_cache.stats())
+        return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    def get_permissions(self):
+        isManager = is_manager(self.request.user)
+        if not isManager:
+            raise PermissionDenied()
+
+        return [IsAuthenticated()]
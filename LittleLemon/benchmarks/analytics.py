@@ -0,0 +1,102 @@
+"""Sales dashboard latency: scanning orders in Python vs the daily rollups.
+
+    python -m benchmarks.analytics [--orders N]
+"""
+import argparse
+
+from .common import setup_django, measure, summarize, print_table
+
+setup_django()
+
+import datetime  # noqa: E402
+import random  # noqa: E402
+import time  # noqa: E402
+from collections import defaultdict  # noqa: E402
+from decimal import Decimal  # noqa: E402
+
+from django.contrib.auth.models import Group, User  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem  # noqa: E402
+from LittleLemonAPI.roles import MANAGER  # noqa: E402
+from LittleLemonAPI.rollups import rebuild  # noqa: E402
+
+DAYS = 365
+ITEMS_PER_ORDER = 3
+REPEAT = 10
+
+
+def seed(order_count):
+    rng = random.Random(0)
+    categories = Category.objects.bulk_create([
+        Category(slug=f'cat-{i}', title=f'Category {i}') for i in range(10)])
+    menuitems = MenuItem.objects.bulk_create([
+        MenuItem(title=f'Item {i}', price=Decimal(f'{i % 20 + 1}.50'), featured=False,
+                 category=categories[i % len(categories)])
+        for i in range(200)])
+
+    customer = User.objects.create_user('bench-customer')
+    start = datetime.date.today() - datetime.timedelta(days=DAYS - 1)
+    orders = Order.objects.bulk_create([
+        Order(user=customer, total=Decimal('0'), date=start + datetime.timedelta(days=i % DAYS))
+        for i in range(order_count)], batch_size=5000)
+
+    items = []
+    for order in orders:
+        total = Decimal('0')
+        for menuitem in rng.sample(menuitems, ITEMS_PER_ORDER):
+            quantity = rng.randint(1, 3)
+            items.append(OrderItem(order=order, menuitem=menuitem, quantity=quantity,
+                                   unit_price=menuitem.price, price=menuitem.price * quantity))
+            total += menuitem.price * quantity
+        order.total = total
+    Order.objects.bulk_update(orders, ['total'], batch_size=1000)
+    OrderItem.objects.bulk_create(items, batch_size=5000)
+
+
+def scan_in_python():
+    """What answering the dashboard took before the rollups."""
+    days = defaultdict(lambda: [0, Decimal(0)])
+    categories = defaultdict(lambda: [0, Decimal(0)])
+    for order in Order.objects.prefetch_related('orders__menuitem'):
+        days[order.date][0] += 1
+        days[order.date][1] += order.total
+        for item in order.orders.all():
+            categories[item.menuitem.category_id][0] += item.quantity
+            categories[item.menuitem.category_id][1] += item.price
+    return days, categories
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=100_000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed(args.orders)
+    print(f'seeded {args.orders} orders over {DAYS} days in {time.perf_counter() - started:.0f}s')
+
+    started = time.perf_counter()
+    rebuild()
+    print(f'backfill_sales_rollups took {time.perf_counter() - started:.2f}s')
+
+    manager = User.objects.create_user('bench-manager')
+    manager.groups.add(Group.objects.create(name=MANAGER))
+    client = APIClient()
+    client.force_authenticate(manager)
+    last_month = (datetime.date.today() - datetime.timedelta(days=29)).isoformat()
+
+    rows = []
+    stats = summarize(measure(scan_in_python, repeat=3))
+    rows.append(('Python scan of Order/OrderItem', 'year', f"{stats['median']:.2f}", f"{stats['p95']:.2f}"))
+    for label, params in (('year', {}), ('30 days', {'date__gte': last_month})):
+        response = client.get('/api/analytics/sales/', params)
+        assert response.status_code == 200, response.data
+        stats = summarize(measure(lambda: client.get('/api/analytics/sales/', params), repeat=REPEAT))
+        rows.append(('GET /api/analytics/sales/', label, f"{stats['median']:.2f}", f"{stats['p95']:.2f}"))
+
+    print_table(('query', 'range', 'median ms', 'p95 ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
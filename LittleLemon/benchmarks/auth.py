@@ -0,0 +1,66 @@
+"""Authenticated request latency: stock vs cached token authentication.
+
+    python -m benchmarks.auth
+"""
+from .common import setup_django, measure, summarize, print_table
+
+setup_django()
+
+import datetime  # noqa: E402
+from decimal import Decimal  # noqa: E402
+from unittest import mock  # noqa: E402
+
+from django.contrib.auth.models import Group, User  # noqa: E402
+from django.db import connection  # noqa: E402
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+from rest_framework.views import APIView  # noqa: E402
+
+from LittleLemonAPI.authentication import CachedTokenAuthentication, clear_token_cache  # noqa: E402
+from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem  # noqa: E402
+from LittleLemonAPI.roles import MANAGER, clear_role_cache  # noqa: E402
+
+ENDPOINTS = ['/api/menu-items/', '/api/cart/summary/', '/api/category/', '/api/orders/']
+REPEAT = 500
+
+
+def seed():
+    manager = User.objects.create_user('bench-manager')
+    manager.groups.add(Group.objects.create(name=MANAGER))
+    category = Category.objects.create(slug='mains', title='Mains')
+    menuitem = MenuItem.objects.create(
+        title='Pasta', price=Decimal('9.50'), featured=False, category=category)
+    order = Order.objects.create(user=manager, total=Decimal('9.50'), date=datetime.date.today())
+    OrderItem.objects.create(order=order, menuitem=menuitem, quantity=1,
+                             unit_price=Decimal('9.50'), price=Decimal('9.50'))
+    return Token.objects.create(user=manager)
+
+
+def main():
+    token = seed()
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    rows = []
+    for endpoint in ENDPOINTS:
+        for label, authentication in (('TokenAuthentication', TokenAuthentication),
+                                      ('CachedTokenAuthentication', CachedTokenAuthentication)):
+            clear_token_cache()
+            clear_role_cache()
+            with mock.patch.object(APIView, 'authentication_classes',
+                                   [authentication, SessionAuthentication]):
+                assert client.get(endpoint).status_code == 200
+                queries = []
+                with connection.execute_wrapper(
+                        lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+                    client.get(endpoint)
+                stats = summarize(measure(lambda: client.get(endpoint), repeat=REPEAT))
+            rows.append((endpoint, label, len(queries),
+                         f"{stats['median']:.3f}", f"{stats['p95']:.3f}"))
+
+    print_table(('endpoint', 'authentication', 'queries', 'median ms', 'p95 ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Restoring a saved basket with one POST per item versus one batch request.
+
+    python -m benchmarks.cart_batch [--sizes N [N ...]] [--repeat N]
+"""
+import argparse
+
+from .common import setup_django, measure, summarize, print_table
+
+setup_django()
+
+from decimal import Decimal  # noqa: E402
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from LittleLemonAPI.cart_summary import clear_cart  # noqa: E402
+from LittleLemonAPI.models import Category, MenuItem  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    user = User.objects.create_user('bench-customer')
+    category = Category.objects.create(slug='bench', title='Bench')
+    menuitems = MenuItem.objects.bulk_create([
+        MenuItem(title=f'Item {i}', price=Decimal('2.50'), featured=False, category=category)
+        for i in range(max(args.sizes))
+    ])
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def one_at_a_time(basket):
+        for menuitem_id, quantity in basket:
+            response = client.post('/api/cart/', {'menuitem_id': menuitem_id, 'quantity': quantity})
+            assert response.status_code == 201, response.data
+
+    def batch(basket):
+        operations = [{'menuitem_id': menuitem_id, 'quantity': quantity} for menuitem_id, quantity in basket]
+        response = client.post('/api/cart/batch/', {'operations': operations}, format='json')
+        assert response.status_code == 201, response.data
+
+    def empty():
+        clear_cart(user)
+
+    rows = []
+    for size in args.sizes:
+        basket = [(menuitem.id, 1 + i % 3) for i, menuitem in enumerate(menuitems[:size])]
+        results = {}
+        for label, restore in (('one at a time', one_at_a_time), ('batch', batch)):
+            empty()
+            restore(basket)  # load the price snapshot
+            empty()
+            with CaptureQueriesContext(connection) as ctx:
+                restore(basket)
+            queries = len(ctx.captured_queries)
+            timings = summarize(measure(lambda: restore(basket), repeat=args.repeat, setup=empty))
+            results[label] = timings['median']
+            rows.append((size, label, f"{timings['median']:.2f}", f"{timings['p95']:.2f}", queries))
+        rows.append((size, 'speedup', f"{results['one at a time'] / results['batch']:.1f}x", '', ''))
+
+    print_table(('items', 'restore', 'median ms', 'p95 ms', 'queries'), rows)
+
+
+if __name__ == '__main__':
+    main()
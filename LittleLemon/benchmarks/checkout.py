@@ -0,0 +1,93 @@
+"""Checkout latency by cart size, before and after the bulk checkout.
+
+    python -m benchmarks.checkout
+"""
+from .common import setup_django, measure, summarize, print_table
+
+setup_django()
+
+import datetime  # noqa: E402
+from decimal import Decimal  # noqa: E402
+from types import SimpleNamespace  # noqa: E402
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.exceptions import ValidationError  # noqa: E402
+
+from LittleLemonAPI.models import Category, MenuItem, Cart, OrderItem  # noqa: E402
+from LittleLemonAPI.serializers import OrderSerializer  # noqa: E402
+
+CART_SIZES = (1, 10, 100)
+REPEAT = 20
+
+
+class LegacyOrderSerializer(OrderSerializer):
+    """The per-row checkout `OrderSerializer.save` used to run."""
+
+    def save(self, **kwargs):
+        user = self.context['request'].user
+        kwargs['user'] = user
+
+        cart_items = Cart.objects.all().filter(user=user)
+
+        if len(cart_items) == 0:
+            raise ValidationError(detail='Cart is empty')
+
+        kwargs['total'] = sum(getattr(item, 'price') for item in cart_items)
+
+        new_order = super(OrderSerializer, self).save(**kwargs)
+
+        for i in cart_items:
+            menu_item = MenuItem.objects.filter(id=getattr(
+                i, 'menuitem_id')).first()
+
+            OrderItem.objects.create(order=new_order, menuitem=menu_item, quantity=getattr(
+                i, 'quantity'), unit_price=getattr(i, 'unit_price'), price=getattr(i, 'price'))
+
+        cart_items.delete()
+
+        return new_order
+
+
+def main():
+    user = User.objects.create_user('bench-customer')
+    category = Category.objects.create(slug='bench', title='Bench')
+    menuitems = MenuItem.objects.bulk_create([
+        MenuItem(title=f'Item {i}', price=Decimal('2.50'), featured=False, category=category)
+        for i in range(max(CART_SIZES))
+    ])
+    request = SimpleNamespace(user=user)
+
+    def fill_cart(size):
+        Cart.objects.bulk_create([
+            Cart(user=user, menuitem=item, quantity=2,
+                 unit_price=item.price, price=item.price * 2)
+            for item in menuitems[:size]
+        ])
+
+    def run_checkout(serializer_class):
+        serializer = serializer_class(
+            data={'date': datetime.date.today()}, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    rows = []
+    for size in CART_SIZES:
+        for label, serializer_class in (('before', LegacyOrderSerializer),
+                                        ('after', OrderSerializer)):
+            fill_cart(size)
+            with CaptureQueriesContext(connection) as ctx:
+                run_checkout(serializer_class)
+
+            stats = summarize(measure(
+                lambda: run_checkout(serializer_class),
+                repeat=REPEAT, setup=lambda: fill_cart(size)))
+            rows.append((size, label, len(ctx.captured_queries),
+                         f"{stats['median']:.2f}", f"{stats['p95']:.2f}"))
+
+    print_table(('cart items', 'checkout', 'queries', 'median ms', 'p95 ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
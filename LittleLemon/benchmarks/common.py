@@ -0,0 +1,65 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run from the project directory, e.g.::
+
+    python -m benchmarks.checkout
+
+Each script gets a throwaway test database, so the development
+``db.sqlite3`` is never touched.
+"""
+import os
+import statistics
+import time
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LittleLemon.settings')
+
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    # single-threaded, so the in-memory database is fine and is what the
+    # baselines were recorded on; the tests use a file
+    connection.settings_dict['TEST']['NAME'] = None
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+def measure(fn, repeat=20, setup=None):
+    """Call `fn` `repeat` times and return the timings in milliseconds.
+
+    `setup`, if given, runs untimed before every call.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def percentile(timings, pct):
+    ordered = sorted(timings)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def summarize(timings):
+    return {
+        'median': statistics.median(timings),
+        'p95': percentile(timings, 95),
+    }
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(value)) for value in column)
+              for column in zip(headers, *rows)]
+    line = '  '.join('{:>%d}' % width for width in widths)
+    print(line.format(*headers))
+    for row in rows:
+        print(line.format(*row))
@@ -0,0 +1,150 @@
+"""Mixed catalog/order reads and checkouts against one SQLite database,
+under the development and production database profiles.
+
+    python -m benchmarks.concurrency [--workers N] [--threads N]
+                                     [--readers N] [--buyers N] [--duration S]
+
+Seeds a temporary database like `benchmarks.loadtest`, then starts
+gunicorn once per profile, each time on a fresh copy of it. Reader
+connections cycle through the menu, category and order lists while
+each buyer connection adds an item to its own cart and checks out, over
+and over. Needs gunicorn installed.
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from .common import percentile, print_table
+from .loadtest import HOST, PORT, SETTINGS, seed, start_server
+
+PROFILES = ('development', 'production')
+READS = ('/api/menu-items/?page_size=6', '/api/category/', '/api/orders/?ordering=-date')
+
+
+def seed_buyers(count):
+    from django.contrib.auth.models import User
+    from django.db import connections
+    from rest_framework.authtoken.models import Token
+
+    users = User.objects.bulk_create([User(username=f'buyer-{i}') for i in range(count)])
+    keys = [Token.objects.create(user=user).key for user in users]
+    connections.close_all()
+    return keys
+
+
+def run_mix(manager_key, buyer_keys, menuitem, readers, duration):
+    """Return `{'read': [...], 'checkout': [...]}` timings in ms and the error count."""
+    timings = {'read': [], 'checkout': []}
+    errors = []
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def call(connection, method, path, key, body=None):
+        headers = {'Authorization': f'Token {key}'}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(body)
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def reader(index):
+        connection = http.client.HTTPConnection(HOST, PORT, timeout=60)
+        local = []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            status = call(connection, 'GET', READS[(index + len(local)) % len(READS)], manager_key)
+            local.append((time.perf_counter() - start) * 1000)
+            if status != 200:
+                with lock:
+                    errors.append(status)
+        connection.close()
+        with lock:
+            timings['read'].extend(local)
+
+    def buyer(key):
+        connection = http.client.HTTPConnection(HOST, PORT, timeout=60)
+        local = []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            statuses = (
+                call(connection, 'POST', '/api/cart/', key, {'menuitem_id': menuitem, 'quantity': 1}),
+                call(connection, 'POST', '/api/orders/', key, {'date': '2023-06-30'}),
+            )
+            local.append((time.perf_counter() - start) * 1000)
+            if statuses != (201, 201):
+                with lock:
+                    errors.append(statuses)
+        connection.close()
+        with lock:
+            timings['checkout'].extend(local)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=buyer, args=(key,)) for key in buyer_keys]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4,
+                        help='gunicorn threads per worker')
+    parser.add_argument('--readers', type=int, default=12)
+    parser.add_argument('--buyers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    if shutil.which('gunicorn') is None:
+        sys.exit('gunicorn is not installed')
+
+    workdir = tempfile.mkdtemp()
+    seeded = os.path.join(workdir, 'seeded.sqlite3')
+    try:
+        # seed a plain rollback-journal file; the production profile
+        # switches its copy to WAL when it connects
+        os.environ['DATABASE_PROFILE'] = 'development'
+        manager_key, ids = seed(seeded)
+        buyer_keys = seed_buyers(args.buyers)
+
+        rows = []
+        for profile in PROFILES:
+            database = os.path.join(workdir, f'{profile}.sqlite3')
+            shutil.copy(seeded, database)
+            env = dict(os.environ, LOADTEST_DB=database, DJANGO_SETTINGS_MODULE=SETTINGS,
+                       DATABASE_PROFILE=profile)
+            server = start_server('WSGI', args.workers, args.threads, env)
+            try:
+                run_mix(manager_key, buyer_keys, ids['menuitem'], args.readers, 1)  # warm up
+                timings, errors = run_mix(
+                    manager_key, buyer_keys, ids['menuitem'], args.readers, args.duration)
+            finally:
+                server.terminate()
+                server.wait()
+
+            for kind in ('read', 'checkout'):
+                rows.append((kind, profile, f'{len(timings[kind]) / args.duration:.0f}',
+                             f'{percentile(timings[kind], 50):.1f}',
+                             f'{percentile(timings[kind], 99):.1f}',
+                             errors if kind == 'checkout' else ''))
+    finally:
+        shutil.rmtree(workdir)
+
+    rows.sort(key=lambda row: row[0] != 'read')
+    print(f'{args.workers} workers x {args.threads} threads, {args.readers} readers, '
+          f'{args.buyers} buyers, {args.duration:.0f}s per profile')
+    print_table(('requests', 'profile', 'per second', 'p50 ms', 'p99 ms', 'errors'), rows)
+
+
+if __name__ == '__main__':
+    main()
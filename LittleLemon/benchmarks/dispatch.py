@@ -0,0 +1,109 @@
+"""Dispatching pending orders: one manager PATCH per order vs the
+bulk dispatch endpoint.
+
+    python -m benchmarks.dispatch [--orders N] [--crew N]
+"""
+import argparse
+
+from .common import setup_django, print_table
+
+setup_django()
+
+import datetime  # noqa: E402
+import random  # noqa: E402
+import time  # noqa: E402
+from decimal import Decimal  # noqa: E402
+
+from django.contrib.auth.models import Group, User  # noqa: E402
+from django.db import connection  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from LittleLemonAPI.models import Order  # noqa: E402
+from LittleLemonAPI.roles import DELIVERY_CREW, MANAGER  # noqa: E402
+
+# one-at-a-time PATCHes are slow, so time a sample and extrapolate
+SINGLE_SAMPLE = 500
+# orders each crew member already has open before the run, at most
+OPEN_ORDERS = 20
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def seed(orders, crew_size):
+    rng = random.Random(0)
+    delivery_group = Group.objects.create(name=DELIVERY_CREW)
+    crew = User.objects.bulk_create([User(username=f'bench-crew-{i}') for i in range(crew_size)])
+    delivery_group.user_set.add(*crew)
+    customer = User.objects.create_user('bench-customer')
+    today = datetime.date.today()
+
+    Order.objects.bulk_create([
+        Order(user=customer, delivery_crew=member, total=Decimal('19.90'), date=today)
+        for member in crew for _ in range(rng.randint(0, OPEN_ORDERS))
+    ], batch_size=5000)
+    Order.objects.bulk_create([
+        Order(user=customer, total=Decimal('19.90'), date=today - datetime.timedelta(days=i % 30))
+        for i in range(orders)
+    ], batch_size=5000)
+    return crew
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=10_000)
+    parser.add_argument('--crew', type=int, default=100)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    crew = seed(args.orders, args.crew)
+    print(f'seeded {args.orders} pending orders and {args.crew} delivery crew members '
+          f'in {time.perf_counter() - started:.1f}s')
+
+    manager = User.objects.create_user('bench-manager')
+    manager.groups.add(Group.objects.create(name=MANAGER))
+    client = APIClient()
+    client.force_authenticate(manager)
+    rows = []
+
+    pending = list(Order.objects.filter(delivery_crew__isnull=True)
+                   .order_by('date', 'id').values_list('id', flat=True)[:SINGLE_SAMPLE])
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        started = time.perf_counter()
+        for i, order_id in enumerate(pending):
+            response = client.patch(f'/api/orders/{order_id}/',
+                                    {'delivery_crew_id': crew[i % len(crew)].id}, format='json')
+            assert response.status_code == 200, response.data
+        elapsed = time.perf_counter() - started
+    per_order = elapsed / len(pending)
+    rows.append(('PATCH /api/orders/<id>/ (extrapolated)', args.orders,
+                 f'{per_order * args.orders:.2f}', f'{1 / per_order:.0f}',
+                 round(counter.count / len(pending) * args.orders)))
+    Order.objects.filter(id__in=pending).update(delivery_crew=None)
+
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        started = time.perf_counter()
+        response = client.post('/api/orders/dispatch/', {}, format='json')
+        elapsed = time.perf_counter() - started
+    assert response.data['assigned'] == args.orders, response.data
+    rows.append(('POST /api/orders/dispatch/', args.orders,
+                 f'{elapsed:.2f}', f'{args.orders / elapsed:.0f}', counter.count))
+
+    loads = {member.id: 0 for member in crew}
+    for crew_id in Order.objects.filter(status=False).values_list('delivery_crew_id', flat=True):
+        loads[crew_id] += 1
+    print(f'open orders per crew member afterwards: '
+          f'min {min(loads.values())}, max {max(loads.values())}')
+    print_table(('endpoint', 'orders', 'seconds', 'orders/s', 'queries'), rows)
+
+
+if __name__ == '__main__':
+    main()
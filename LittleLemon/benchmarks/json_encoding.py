@@ -0,0 +1,85 @@
+"""Rendering and parsing large order exports: DRF's JSON classes vs the
+orjson-backed `FastJSONRenderer`/`FastJSONParser`.
+
+    python -m benchmarks.json_encoding [--orders N] [--repeat N]
+"""
+import argparse
+
+from .common import setup_django, measure, summarize, print_table
+
+setup_django()
+
+import datetime  # noqa: E402
+import io  # noqa: E402
+import random  # noqa: E402
+from decimal import Decimal  # noqa: E402
+
+from django.contrib.auth.models import User  # noqa: E402
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from LittleLemonAPI.exports import export_orders  # noqa: E402
+from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem  # noqa: E402
+from LittleLemonAPI.parsers import FastJSONParser  # noqa: E402
+from LittleLemonAPI.renderers import FastJSONRenderer  # noqa: E402
+from LittleLemonAPI.serializers import OrderSerializer  # noqa: E402
+
+ITEMS_PER_ORDER = 3
+
+
+def seed(count):
+    rng = random.Random(0)
+    category = Category.objects.create(slug='mains', title='Mains')
+    MenuItem.objects.bulk_create([
+        MenuItem(title=f'Dish {i}', price=Decimal(rng.randint(200, 3000)) / 100,
+                 featured=False, category=category)
+        for i in range(200)])
+    menuitems = list(MenuItem.objects.values_list('id', 'price'))
+    customer = User.objects.create_user('bench-customer')
+    today = datetime.date.today()
+    orders = Order.objects.bulk_create([
+        Order(user=customer, total=Decimal('30.00'), date=today - datetime.timedelta(days=i % 365))
+        for i in range(count)], batch_size=5000)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, menuitem_id=menuitem_id, quantity=1, unit_price=price, price=price)
+        for order in orders for menuitem_id, price in rng.sample(menuitems, ITEMS_PER_ORDER)
+    ], batch_size=5000)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    seed(args.orders)
+    payloads = {
+        'export rows': list(export_orders(Order.objects.all())),
+        'OrderSerializer data': OrderSerializer(Order.objects.with_items(), many=True).data,
+    }
+
+    rows = []
+    for name, data in payloads.items():
+        body = JSONRenderer().render(data)
+        assert FastJSONRenderer().render(data) == body, name
+        assert FastJSONParser().parse(io.BytesIO(body)) == JSONParser().parse(io.BytesIO(body)), name
+
+        timings = {}
+        for label, renderer, parser_class in (('stdlib json', JSONRenderer(), JSONParser),
+                                              ('orjson', FastJSONRenderer(), FastJSONParser)):
+            timings[label] = (
+                summarize(measure(lambda: renderer.render(data), repeat=args.repeat))['median'],
+                summarize(measure(lambda: parser_class().parse(io.BytesIO(body)),
+                                  repeat=args.repeat))['median'])
+
+        for label, (render, parse) in timings.items():
+            base_render, base_parse = timings['stdlib json']
+            rows.append((name, label, f'{len(body) / 1e6:.1f}', f'{render:.1f}',
+                         f'{base_render / render:.1f}x', f'{parse:.1f}', f'{base_parse / parse:.1f}x'))
+
+    print(f'{args.orders} orders with {ITEMS_PER_ORDER} items each')
+    print_table(('payload', 'encoder', 'MB', 'render ms', 'speedup', 'parse ms', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Throughput and tail latency of the read endpoints under WSGI vs ASGI.
+
+    python -m benchmarks.loadtest [--workers N] [--threads N]
+                                  [--concurrency N] [--duration S]
+
+Seeds a temporary SQLite database, then starts gunicorn (sync views)
+and uvicorn (async views) in turn with the same number of worker
+processes and drives both with the same keep-alive HTTP load. Needs
+gunicorn and uvicorn installed.
+"""
+import argparse
+import datetime
+import http.client
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from .common import percentile, print_table
+
+SETTINGS = 'benchmarks.loadtest_settings'
+HOST = '127.0.0.1'
+PORT = 8765
+
+# (label, path, authenticated); the ASGI run prefixes /api/async/
+ROUTES = [
+    ('menu-items', 'menu-items/?page_size=6', False),
+    ('menu-items search', 'menu-items/?search=pasta', False),
+    ('menu-item', 'menu-items/{menuitem}/', False),
+    ('categories', 'category/', True),
+    ('orders', 'orders/?ordering=-date', True),
+    ('order', 'orders/{order}/', True),
+]
+
+
+def seed(database):
+    os.environ['LOADTEST_DB'] = database
+    os.environ['DJANGO_SETTINGS_MODULE'] = SETTINGS
+
+    import django
+    django.setup()
+
+    from django.contrib.auth.models import Group, User
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+
+    from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem
+    from LittleLemonAPI.roles import MANAGER
+
+    call_command('migrate', verbosity=0)
+
+    rng = random.Random(0)
+    categories = Category.objects.bulk_create([
+        Category(slug=title.lower(), title=title)
+        for title in ('Mains', 'Starters', 'Desserts')])
+    menuitems = MenuItem.objects.bulk_create([
+        MenuItem(title=f'{rng.choice(["Pasta", "Salad", "Soup"])} {i}', price=Decimal('9.99'),
+                 featured=False, category=rng.choice(categories))
+        for i in range(1000)])
+
+    manager = User.objects.create_user('loadtest-manager')
+    manager.groups.add(Group.objects.create(name=MANAGER))
+    today = datetime.date.today()
+    orders = Order.objects.bulk_create([
+        Order(user=manager, total=Decimal('19.98'), date=today - datetime.timedelta(days=i % 30))
+        for i in range(1000)])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, menuitem=rng.choice(menuitems), quantity=2,
+                  unit_price=Decimal('9.99'), price=Decimal('19.98'))
+        for order in orders])
+
+    token = Token.objects.create(user=manager)
+    return token.key, {'menuitem': menuitems[0].id, 'order': orders[0].id}
+
+
+def start_server(kind, workers, threads, env):
+    if kind == 'WSGI':
+        command = ['gunicorn', 'LittleLemon.wsgi', '--bind', f'{HOST}:{PORT}',
+                   '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning']
+    else:
+        command = ['uvicorn', 'LittleLemon.asgi:application', '--host', HOST,
+                   '--port', str(PORT), '--workers', str(workers), '--log-level', 'warning']
+    server = subprocess.Popen(command, env=env)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, PORT), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f'{kind} server did not start')
+
+
+def run_load(path, headers, concurrency, duration):
+    """Hammer `path` from `concurrency` keep-alive connections."""
+    timings = []
+    errors = []
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def client():
+        connection = http.client.HTTPConnection(HOST, PORT, timeout=10)
+        local = []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            local.append((time.perf_counter() - start) * 1000)
+            if response.status != 200:
+                with lock:
+                    errors.append(response.status)
+                break
+        connection.close()
+        with lock:
+            timings.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise RuntimeError(f'GET {path} returned {errors[0]}')
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4,
+                        help='gunicorn threads per worker')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5)
+    args = parser.parse_args()
+
+    for command in ('gunicorn', 'uvicorn'):
+        if shutil.which(command) is None:
+            sys.exit(f'{command} is not installed')
+
+    workdir = tempfile.mkdtemp()
+    database = os.path.join(workdir, 'loadtest.sqlite3')
+    try:
+        key, ids = seed(database)
+        env = dict(os.environ, LOADTEST_DB=database, DJANGO_SETTINGS_MODULE=SETTINGS)
+
+        rows = []
+        for kind, prefix in (('WSGI', '/api/'), ('ASGI', '/api/async/')):
+            server = start_server(kind, args.workers, args.threads, env)
+            try:
+                for label, route, authenticated in ROUTES:
+                    path = prefix + route.format(**ids)
+                    headers = {'Authorization': f'Token {key}'} if authenticated else {}
+                    run_load(path, headers, args.concurrency, 0.5)  # warm up
+                    timings = run_load(path, headers, args.concurrency, args.duration)
+                    rows.append((label, kind, f'{len(timings) / args.duration:.0f}',
+                                 f'{percentile(timings, 50):.1f}', f'{percentile(timings, 99):.1f}'))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        shutil.rmtree(workdir)
+
+    rows.sort(key=lambda row: [label for label, *_ in ROUTES].index(row[0]))
+    print(f'{args.workers} workers, {args.concurrency} concurrent connections, '
+          f'{args.duration:.0f}s per route')
+    print_table(('route', 'server', 'RPS', 'p50 ms', 'p99 ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
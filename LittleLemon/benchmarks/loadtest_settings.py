@@ -0,0 +1,19 @@
+"""Settings for the servers started by `benchmarks.loadtest` and
+`benchmarks.concurrency`."""
+import os
+
+from LittleLemon.settings import *  # noqa: F401,F403
+from LittleLemon.settings import DATABASES
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+# the production profile's replica is the same file
+for database in DATABASES.values():
+    database['NAME'] = os.environ['LOADTEST_DB']
+
+# measure the request path, not the catalog cache
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'catalog': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
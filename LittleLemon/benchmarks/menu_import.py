@@ -0,0 +1,98 @@
+"""Menu import throughput: one POST per item vs the bulk import endpoint.
+
+    python -m benchmarks.menu_import [--items N]
+"""
+import argparse
+
+from .common import setup_django, print_table
+
+setup_django()
+
+import csv  # noqa: E402
+import io  # noqa: E402
+import json  # noqa: E402
+import time  # noqa: E402
+
+from django.contrib.auth.models import Group, User  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from LittleLemonAPI.models import Category, MenuItem  # noqa: E402
+from LittleLemonAPI.roles import MANAGER  # noqa: E402
+
+# one-at-a-time POSTs are slow, so time a sample and extrapolate
+SINGLE_SAMPLE = 500
+
+
+def make_rows(count, categories, prefix):
+    return [{'title': f'{prefix} {i}', 'price': f'{i % 50 + 1}.50', 'featured': i % 7 == 0,
+             'category_id': categories[i % len(categories)].id} for i in range(count)]
+
+
+def encode(rows, fmt):
+    if fmt == 'json':
+        return json.dumps(rows), 'application/json'
+    if fmt == 'ndjson':
+        return ''.join(json.dumps(row) + '\n' for row in rows), 'application/x-ndjson'
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=['title', 'price', 'featured', 'category_id'])
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue(), 'text/csv'
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=10_000)
+    args = parser.parse_args()
+
+    # catalog cache invalidation is not what is being measured
+    override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'catalog': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    }).enable()
+
+    manager = User.objects.create_user('bench-manager')
+    manager.groups.add(Group.objects.create(name=MANAGER))
+    client = APIClient()
+    client.force_authenticate(manager)
+    categories = Category.objects.bulk_create([
+        Category(slug=f'cat-{i}', title=f'Category {i}') for i in range(10)])
+
+    rows = []
+
+    sample = make_rows(SINGLE_SAMPLE, categories, 'Single')
+    elapsed = timed(lambda: [client.post('/api/menu-items/', row, format='json') for row in sample])
+    per_item = elapsed / SINGLE_SAMPLE
+    rows.append(('POST /api/menu-items/ (extrapolated)', 'create', args.items,
+                 f'{per_item * args.items:.2f}', f'{1 / per_item:.0f}'))
+
+    for fmt in ('json', 'ndjson', 'csv'):
+        for action in ('create', 'update'):
+            # the update pass re-imports the same titles with new prices
+            items = make_rows(args.items, categories, fmt)
+            if action == 'update':
+                for item in items:
+                    item['price'] = '99.00'
+            body, content_type = encode(items, fmt)
+
+            responses = []
+            elapsed = timed(lambda: responses.append(client.generic(
+                'POST', '/api/menu-items/import/', body, content_type=content_type)))
+            result = responses[0].data
+            assert not result['errors'] and result[f'{action}d'] == args.items, result
+            rows.append((f'POST /api/menu-items/import/ ({fmt})', action, args.items,
+                         f'{elapsed:.2f}', f'{args.items / elapsed:.0f}'))
+
+    print(f'{MenuItem.objects.count()} menu items in the table afterwards')
+    print_table(('endpoint', 'action', 'items', 'seconds', 'items/s'), rows)
+
+
+if __name__ == '__main__':
+    main()
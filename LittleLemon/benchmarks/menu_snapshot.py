@@ -0,0 +1,104 @@
+"""The home screen's menu from the paginated menu-items list versus the
+materialized /api/menu/ snapshot.
+
+    python -m benchmarks.menu_snapshot [--categories N] [--menu-items N] [--repeat N]
+
+The list has no featured filter, so a client pages through every
+category and picks the featured items out itself. "cold" runs start
+after a catalog write made elsewhere, "one item edited" after a save in
+this process, and "warm" ones repeat a request for the same version.
+"""
+import argparse
+
+from .common import setup_django, measure, summarize, print_table
+
+setup_django()
+
+from decimal import Decimal  # noqa: E402
+
+from django.db import connection  # noqa: E402
+from django.db.models import F  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from LittleLemonAPI import catalog_cache  # noqa: E402
+from LittleLemonAPI.models import Category, MenuItem  # noqa: E402
+
+PAGE_SIZE = 6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--menu-items', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    categories = Category.objects.bulk_create([
+        Category(slug=f'bench-{i}', title=f'Bench {i}') for i in range(args.categories)])
+    menuitems = MenuItem.objects.bulk_create([
+        MenuItem(title=f'Item {i}', price=Decimal('2.50'), featured=i % 20 == 0,
+                 category=categories[i % len(categories)])
+        for i in range(args.menu_items)
+    ])
+    client = APIClient()
+    edited = menuitems[0]
+
+    def paginated():
+        requests = 0
+        for category in categories:
+            url = f'/api/menu-items/?category={category.id}&ordering=title&page_size={PAGE_SIZE}'
+            while url:
+                response = client.get(url)
+                assert response.status_code == 200, response.data
+                requests += 1
+                url = response.data['next']
+        return requests
+
+    def snapshot(**headers):
+        def call():
+            response = client.get('/api/menu/', **headers)
+            assert response.status_code == 200
+            return len(response.content)
+        return call
+
+    def edit():
+        # a save in this process: its signals report the row
+        edited.featured = not edited.featured
+        edited.save()
+
+    def reload():
+        # a write this process never hears of, once the cached version expires
+        MenuItem.objects.filter(id=edited.id).update(featured=F('featured'))
+        catalog_cache.bump_version()
+
+    gzip_headers = {'HTTP_ACCEPT_ENCODING': 'gzip'}
+    cases = (
+        ('menu-items pages', 'cold', paginated, reload),
+        ('menu-items pages', 'warm', paginated, None),
+        ('/api/menu/', 'full rebuild', snapshot(), reload),
+        ('/api/menu/', 'one item edited', snapshot(), edit),
+        ('/api/menu/', 'warm', snapshot(), None),
+        ('/api/menu/ gzip', 'warm', snapshot(**gzip_headers), None),
+    )
+
+    rows = []
+    for label, state, call, setup in cases:
+        if setup:
+            setup()
+        result = call()  # loads the cache for the next warm case
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as ctx:
+            call()
+        queries = len(ctx.captured_queries)
+        timings = summarize(measure(call, repeat=args.repeat, setup=setup))
+        detail = f'{result} requests' if label.startswith('menu-items') else f'{result} bytes'
+        rows.append((label, state, f"{timings['median']:.2f}", f"{timings['p95']:.2f}", queries, detail))
+
+    print(f'{args.menu_items} menu items in {args.categories} categories')
+    print_table(('source', 'state', 'median ms', 'p95 ms', 'queries', 'size'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Latency of deep pages: page-number vs cursor pagination.
+
+    python -m benchmarks.pagination
+"""
+from .common import setup_django, measure, summarize, print_table
+
+setup_django()
+
+import base64  # noqa: E402
+import datetime  # noqa: E402
+import json  # noqa: E402
+import random  # noqa: E402
+from decimal import Decimal  # noqa: E402
+
+from django.contrib.auth.models import Group, User  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from LittleLemonAPI.models import Order  # noqa: E402
+from LittleLemonAPI.roles import MANAGER  # noqa: E402
+
+ORDERS = 100_000
+PAGE_SIZE = 6
+PAGES = (1, 100, 1_000, 10_000)
+ORDERINGS = ('-date', 'total')
+REPEAT = 10
+
+
+def cursor_for(ordering, offset):
+    """Build the cursor the client would hold after reading `offset` rows."""
+    fields = [ordering, '-id' if ordering.startswith('-') else 'id']
+    row = Order.objects.order_by(*fields)[offset - 1]
+    position = [str(getattr(row, field.lstrip('-'))) for field in fields]
+    return base64.urlsafe_b64encode(
+        json.dumps({'p': position, 'r': 0}).encode()).decode()
+
+
+def main():
+    manager = User.objects.create_user('bench-manager')
+    manager.groups.add(Group.objects.create(name=MANAGER))
+    customer = User.objects.create_user('bench-customer')
+
+    rng = random.Random(0)
+    start = datetime.date(2020, 1, 1)
+    Order.objects.bulk_create([
+        Order(user=customer, total=Decimal(rng.randint(100, 99999)) / 100,
+              date=start + datetime.timedelta(days=rng.randint(0, 1500)))
+        for _ in range(ORDERS)
+    ], batch_size=5000)
+
+    client = APIClient()
+    client.force_authenticate(manager)
+
+    rows = []
+    for ordering in ORDERINGS:
+        for page in PAGES:
+            base = f'/api/orders/?ordering={ordering}&page_size={PAGE_SIZE}'
+            page_url = f'{base}&page={page}'
+            cursor_url = f'{base}&pagination=cursor'
+            if page > 1:
+                cursor_url += '&cursor=' + cursor_for(ordering, (page - 1) * PAGE_SIZE)
+
+            for mode, url in (('page', page_url), ('cursor', cursor_url)):
+                assert client.get(url).status_code == 200, url
+                stats = summarize(measure(lambda: client.get(url), repeat=REPEAT))
+                rows.append((ordering, page, mode,
+                             f"{stats['median']:.2f}", f"{stats['p95']:.2f}"))
+
+    print(f'{ORDERS} orders, page_size={PAGE_SIZE}')
+    print_table(('ordering', 'page', 'mode', 'median ms', 'p95 ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
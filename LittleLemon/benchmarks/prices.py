@@ -0,0 +1,100 @@
+"""Cart adds and checkout with the menu price snapshot on and off.
+
+    python -m benchmarks.prices [--menu-items N] [--adds N]
+"""
+import argparse
+
+from .common import setup_django, measure, summarize, print_table
+
+setup_django()
+
+import datetime  # noqa: E402
+import time  # noqa: E402
+from decimal import Decimal  # noqa: E402
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from LittleLemonAPI import prices  # noqa: E402
+from LittleLemonAPI.cart_summary import clear_cart  # noqa: E402
+from LittleLemonAPI.models import Category, MenuItem  # noqa: E402
+
+CHECKOUT_ITEMS = 50
+REPEAT = 20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--menu-items', type=int, default=1000)
+    parser.add_argument('--adds', type=int, default=2000)
+    args = parser.parse_args()
+
+    user = User.objects.create_user('bench-customer')
+    categories = Category.objects.bulk_create([
+        Category(slug=f'bench-{i}', title=f'Bench {i}') for i in range(10)])
+    menuitems = MenuItem.objects.bulk_create([
+        MenuItem(title=f'Item {i}', price=Decimal('2.50'), featured=False,
+                 category=categories[i % len(categories)])
+        for i in range(args.menu_items)
+    ])
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def add(menuitem):
+        response = client.post('/api/cart/', {'menuitem_id': menuitem.id, 'quantity': 1})
+        assert response.status_code == 201, response.data
+
+    def run_adds():
+        timings = []
+        for i in range(args.adds):
+            # every menu item once, then start over on an empty cart
+            if i % len(menuitems) == 0:
+                clear_cart(user)
+            timings.extend(measure(lambda: add(menuitems[i % len(menuitems)]), repeat=1))
+        return timings
+
+    def fill_cart():
+        clear_cart(user)
+        for menuitem in menuitems[:CHECKOUT_ITEMS]:
+            add(menuitem)
+
+    def checkout():
+        response = client.post('/api/orders/', {'date': str(datetime.date.today())})
+        assert response.status_code == 201, response.data
+
+    def lookups():
+        for menuitem in menuitems:
+            prices.lookup(menuitem.id)
+
+    rows = []
+    for label, enabled in (('off', False), ('on', True)):
+        with override_settings(PRICE_SNAPSHOT=enabled):
+            add(menuitems[0])  # load the snapshot
+            lookup = summarize(measure(lookups, repeat=5))['median'] * 1000 / len(menuitems)
+            with CaptureQueriesContext(connection) as ctx:
+                add(menuitems[1])
+            add_queries = len(ctx.captured_queries)
+
+            started = time.perf_counter()
+            adds = summarize(run_adds())
+            per_second = args.adds / (time.perf_counter() - started)
+
+            fill_cart()
+            with CaptureQueriesContext(connection) as ctx:
+                checkout()
+            checkout_queries = len(ctx.captured_queries)
+            checkouts = summarize(measure(checkout, repeat=REPEAT, setup=fill_cart))
+
+        rows.append((label, f'{lookup:.1f}', f'{per_second:.0f}', f"{adds['median']:.2f}", add_queries,
+                     f"{checkouts['median']:.2f}", checkout_queries))
+
+    print(f'{args.menu_items} menu items, {args.adds} adds, checkout of {CHECKOUT_ITEMS} items')
+    print_table(('snapshot', 'lookup us', 'adds/s', 'add median ms', 'add queries',
+                 'checkout median ms', 'checkout queries'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""`?search=` latency with the FTS5 index vs the LIKE fallback.
+
+    python -m benchmarks.search [--menu-items N] [--order-items N]
+"""
+import argparse
+
+from .common import setup_django, measure, summarize, print_table
+
+setup_django()
+
+import datetime  # noqa: E402
+import random  # noqa: E402
+import time  # noqa: E402
+from decimal import Decimal  # noqa: E402
+
+from django.contrib.auth.models import Group, User  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem  # noqa: E402
+from LittleLemonAPI.roles import MANAGER  # noqa: E402
+
+ADJECTIVES = ['Spicy', 'Smoked', 'Roasted', 'Crispy', 'Grilled', 'Sweet', 'Tangy', 'Herbed']
+DISHES = ['Pasta', 'Risotto', 'Salad', 'Lamb', 'Falafel', 'Soup', 'Tart', 'Bruschetta']
+CATEGORIES = ['Mains', 'Starters', 'Desserts', 'Drinks', 'Sides']
+ITEMS_PER_ORDER = 5
+TERMS = ['bruschetta', 'risot', 'starters', 'crispy lamb', 'zzzz']
+REPEAT = 10
+
+
+def seed(menu_items, order_items):
+    rng = random.Random(0)
+    categories = Category.objects.bulk_create([
+        Category(slug=title.lower(), title=title) for title in CATEGORIES])
+    MenuItem.objects.bulk_create([
+        MenuItem(title=f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} {i}',
+                 price=Decimal('9.99'), featured=False, category=rng.choice(categories))
+        for i in range(menu_items)
+    ], batch_size=5000)
+    menuitem_ids = list(MenuItem.objects.values_list('id', flat=True))
+
+    customer = User.objects.create_user('bench-customer')
+    today = datetime.date.today()
+    orders = Order.objects.bulk_create([
+        Order(user=customer, total=Decimal('49.95'), date=today)
+        for _ in range(order_items // ITEMS_PER_ORDER)
+    ], batch_size=5000)
+
+    batch = []
+    for order in orders:
+        for menuitem_id in rng.sample(menuitem_ids, ITEMS_PER_ORDER):
+            batch.append(OrderItem(order=order, menuitem_id=menuitem_id, quantity=1,
+                                   unit_price=Decimal('9.99'), price=Decimal('9.99')))
+        if len(batch) >= 10000:
+            OrderItem.objects.bulk_create(batch)
+            batch = []
+    OrderItem.objects.bulk_create(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--menu-items', type=int, default=100_000)
+    parser.add_argument('--order-items', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed(args.menu_items, args.order_items)
+    print(f'seeded {args.menu_items} menu items and {args.order_items} order items '
+          f'in {time.perf_counter() - started:.0f}s')
+
+    # measure the database, not the catalog cache
+    override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'catalog': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    }).enable()
+
+    manager = User.objects.create_user('bench-manager')
+    manager.groups.add(Group.objects.create(name=MANAGER))
+    client = APIClient()
+    client.force_authenticate(manager)
+
+    rows = []
+    for endpoint in ('/api/menu-items/', '/api/orders/'):
+        for term in TERMS:
+            url = f'{endpoint}?search={term}&page_size=6'
+            for label, enabled in (('LIKE', False), ('FTS5', True)):
+                with override_settings(FULL_TEXT_SEARCH=enabled):
+                    count = client.get(url).data['count']
+                    stats = summarize(measure(lambda: client.get(url), repeat=REPEAT))
+                rows.append((endpoint, term, label, count,
+                             f"{stats['median']:.2f}", f"{stats['p95']:.2f}"))
+
+    print_table(('endpoint', 'search', 'backend', 'matches', 'median ms', 'p95 ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
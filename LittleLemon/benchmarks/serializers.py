@@ -0,0 +1,94 @@
+"""List endpoints with the DRF model serializers vs the lean `.values()` ones.
+
+    python -m benchmarks.serializers [--repeat N]
+"""
+import argparse
+
+from .common import setup_django, measure, summarize, print_table
+
+setup_django()
+
+import datetime  # noqa: E402
+import random  # noqa: E402
+from decimal import Decimal  # noqa: E402
+from unittest import mock  # noqa: E402
+
+from django.contrib.auth.models import Group, User  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem  # noqa: E402
+from LittleLemonAPI.pagination import CursorPaginationClass  # noqa: E402
+from LittleLemonAPI.roles import MANAGER  # noqa: E402
+
+MENU_ITEMS = 2_000
+ORDERS = 2_000
+ITEMS_PER_ORDER = 3
+PAGE_SIZES = (6, 100, 1_000)
+
+
+def seed():
+    rng = random.Random(0)
+    categories = Category.objects.bulk_create([
+        Category(slug=f'category-{i}', title=f'Category {i}') for i in range(10)])
+    MenuItem.objects.bulk_create([
+        MenuItem(title=f'Dish {i}', price=Decimal(rng.randint(200, 3000)) / 100,
+                 featured=i % 10 == 0, category=categories[i % len(categories)])
+        for i in range(MENU_ITEMS)])
+    menuitems = list(MenuItem.objects.values_list('id', 'price'))
+
+    customer = User.objects.create_user('bench-customer')
+    crew = User.objects.create_user('bench-crew')
+    today = datetime.date.today()
+    orders = Order.objects.bulk_create([
+        Order(user=customer, delivery_crew=crew if i % 2 else None, total=Decimal('30.00'),
+              date=today - datetime.timedelta(days=i % 365))
+        for i in range(ORDERS)])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, menuitem_id=menuitem_id, quantity=1, unit_price=price, price=price)
+        for order in orders for menuitem_id, price in rng.sample(menuitems, ITEMS_PER_ORDER)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    seed()
+    # measure serialization, not the catalog cache
+    override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'catalog': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    }).enable()
+
+    manager = User.objects.create_user('bench-manager')
+    manager.groups.add(Group.objects.create(name=MANAGER))
+    client = APIClient()
+    client.force_authenticate(manager)
+
+    rows = []
+    with mock.patch.object(CursorPaginationClass, 'max_page_size', max(PAGE_SIZES)):
+        for endpoint in ('/api/menu-items/', '/api/orders/', '/api/orders/?pagination=cursor'):
+            for page_size in PAGE_SIZES:
+                url = f"{endpoint}{'&' if '?' in endpoint else '?'}page_size={page_size}"
+                medians = {}
+                bodies = {}
+                for label, lean in (('model', False), ('lean', True)):
+                    with override_settings(LEAN_SERIALIZERS=lean):
+                        bodies[label] = client.get(url).content
+                        medians[label] = summarize(
+                            measure(lambda: client.get(url), repeat=args.repeat))['median']
+                assert bodies['model'] == bodies['lean'], url
+                rows.append((endpoint, page_size,
+                             f"{medians['model']:.2f}", f"{medians['lean']:.2f}",
+                             f"{page_size / medians['model'] * 1000:.0f}",
+                             f"{page_size / medians['lean'] * 1000:.0f}",
+                             f"{medians['model'] / medians['lean']:.1f}x"))
+
+    print(f'{MENU_ITEMS} menu items, {ORDERS} orders with {ITEMS_PER_ORDER} items each')
+    print_table(('endpoint', 'page size', 'model ms', 'lean ms', 'model rows/s', 'lean rows/s',
+                 'speedup'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,528 @@
+"""Latency and query counts for every API route, checked against a baseline.
+
+    python -m benchmarks.suite [--orders N] [--menu-items N] ... [--only TEXT]
+                               [--save-baseline] [--threshold 1.0]
+
+Seeds a synthetic dataset (managers, delivery crew and customers,
+categories, menu items, carts and orders) and calls each route in
+`LittleLemonAPI/urls.py` plus djoser's through the test client, as the
+role that would normally use it. Routes that change data get fresh
+objects before every call, untimed. The suite refuses to run when a
+route has no case.
+
+Results are compared with `benchmarks/baseline.json`, which must have
+been recorded with the same dataset sizes. The script exits non-zero
+when a route's median is more than `--threshold` slower than the
+baseline (and at least `--min-delta` ms slower), or when a route runs
+more queries than before. `--save-baseline` overwrites the baseline;
+latencies only compare meaningfully on the machine that recorded it.
+"""
+import argparse
+
+from .common import setup_django, percentile, print_table
+
+setup_django()
+
+import datetime  # noqa: E402
+import itertools  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import pathlib  # noqa: E402
+import random  # noqa: E402
+import statistics  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from collections import namedtuple  # noqa: E402
+from decimal import Decimal  # noqa: E402
+from urllib.parse import urlsplit  # noqa: E402
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.contrib.auth.models import Group, User  # noqa: E402
+from django.contrib.auth.tokens import default_token_generator  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from django.urls import get_resolver, resolve  # noqa: E402
+from djoser.utils import encode_uid  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from LittleLemonAPI import cart_summary, rollups  # noqa: E402
+from LittleLemonAPI.models import Cart, Category, MenuItem, Order, OrderItem  # noqa: E402
+from LittleLemonAPI.roles import DELIVERY_CREW, MANAGER  # noqa: E402
+
+BASELINE = pathlib.Path(__file__).with_name('baseline.json')
+PASSWORD = 'Lemon-bench-0'
+ITEMS_PER_ORDER = 3
+CART_ITEMS = 3
+IMPORT_ROWS = 100
+DISPATCH_BATCH = 50
+DAYS = 365
+
+# seeding every user with a PBKDF2 hash would take minutes
+FAST_HASHER = override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+
+# workers re-read the catalog and role stamps every couple of seconds;
+# that one query would land on whichever request crosses the boundary
+NO_PERIODIC_STAMP_READS = override_settings(CATALOG_VERSION_MAX_AGE=3600, AUTH_VERSION_MAX_AGE=3600)
+
+Call = namedtuple('Call', 'url data client format', defaults=(None, None, 'json'))
+Case = namedtuple('Case', 'name method role status prepare')
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def seed(args):
+    rng = random.Random(0)
+    password = make_password(PASSWORD)
+    manager_group = Group.objects.create(name=MANAGER)
+    delivery_group = Group.objects.create(name=DELIVERY_CREW)
+
+    def users(prefix, count):
+        return User.objects.bulk_create([
+            User(username=f'{prefix}-{i}', email=f'{prefix}-{i}@example.com', password=password)
+            for i in range(count)])
+
+    managers = users('manager', args.managers)
+    crew = users('crew', args.delivery_crew)
+    customers = users('customer', args.customers)
+    manager_group.user_set.add(*managers)
+    delivery_group.user_set.add(*crew)
+
+    categories = Category.objects.bulk_create([
+        Category(slug=f'category-{i}', title=f'Category {i}') for i in range(args.categories)])
+    MenuItem.objects.bulk_create([
+        MenuItem(title=f'Dish {i}', price=Decimal(rng.randint(200, 3000)) / 100,
+                 featured=i % 10 == 0, category=categories[i % len(categories)])
+        for i in range(args.menu_items)
+    ], batch_size=5000)
+    menuitems = list(MenuItem.objects.values_list('id', 'price'))
+
+    Cart.objects.bulk_create([
+        Cart(user=customer, menuitem_id=menuitem_id, quantity=2,
+             unit_price=price, price=price * 2)
+        for customer in customers for menuitem_id, price in rng.sample(menuitems, CART_ITEMS)
+    ], batch_size=5000)
+    cart_summary.rebuild(fix=True)
+
+    today = datetime.date.today()
+    orders = Order.objects.bulk_create([
+        Order(user=rng.choice(customers), total=Decimal(0),
+              delivery_crew=rng.choice(crew) if rng.random() < 0.8 else None,
+              status=rng.random() < 0.5, date=today - datetime.timedelta(days=rng.randrange(DAYS)))
+        for _ in range(args.orders)
+    ], batch_size=5000)
+    items = []
+    for order in orders:
+        for menuitem_id, price in rng.sample(menuitems, ITEMS_PER_ORDER):
+            items.append(OrderItem(order=order, menuitem_id=menuitem_id, quantity=1,
+                                   unit_price=price, price=price))
+            order.total += price
+    OrderItem.objects.bulk_create(items, batch_size=5000)
+    Order.objects.bulk_update(orders, ['total'], batch_size=5000)
+    rollups.rebuild()
+
+    return {
+        'managers': managers, 'crew': crew, 'customers': customers,
+        'categories': categories, 'menuitems': menuitems, 'orders': orders,
+    }
+
+
+def token_client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def build_cases(data):
+    """One `Case` per route and role; `prepare()` returns the `Call` to time."""
+    rng = random.Random(1)
+    counter = itertools.count()
+    manager, crew_member, customer = data['managers'][0], data['crew'][0], data['customers'][0]
+    category = data['categories'][0]
+    menuitem_id = data['menuitems'][0][0]
+    menuitems = data['menuitems']
+    order = next(o for o in data['orders'] if o.delivery_crew_id == crew_member.id)
+    delivery_group = Group.objects.get(name=DELIVERY_CREW)
+    manager_group = Group.objects.get(name=MANAGER)
+
+    def new_user(prefix, **fields):
+        n = next(counter)
+        return User.objects.create_user(
+            f'{prefix}-{n}', email=f'{prefix}-{n}@example.com', password=PASSWORD, **fields)
+
+    def new_category():
+        n = next(counter)
+        return Category.objects.create(slug=f'new-{n}', title=f'New {n}')
+
+    def new_menuitem():
+        return MenuItem.objects.create(
+            title=f'New dish {next(counter)}', price=Decimal('4.50'), featured=False, category=category)
+
+    def new_order(user, delivery=None):
+        new = Order.objects.create(
+            user=user, delivery_crew=delivery, total=Decimal('9.00'), date=datetime.date.today())
+        OrderItem.objects.bulk_create([
+            OrderItem(order=new, menuitem_id=item_id, quantity=1, unit_price=price, price=price)
+            for item_id, price in menuitems[:ITEMS_PER_ORDER]])
+        return new
+
+    def fill_cart(user):
+        Cart.objects.filter(user=user).delete()
+        for item_id, price in rng.sample(menuitems, CART_ITEMS):
+            Cart.objects.create(user=user, menuitem_id=item_id, quantity=1, unit_price=price, price=price)
+
+    def fixed(url, data=None, format='json'):
+        return lambda: Call(url, data, format=format)
+
+    def as_new_user(method_url, data=None, **fields):
+        def prepare():
+            user = new_user('bench', **fields)
+            return Call(method_url.format(user=user), data, token_client(user))
+        return prepare
+
+    password_user = new_user('password')
+    username_user = new_user('username')
+    reset_user = new_user('reset')
+    inactive_user = new_user('inactive')
+    logout_user = new_user('logout')
+    spare_manager = new_user('spare-manager')
+    spare_crew = new_user('spare-crew')
+
+    def set_password():
+        password_user.refresh_from_db()
+        current, new = PASSWORD, 'Lemon-bench-1'
+        if not password_user.check_password(current):
+            current, new = new, current
+        return Call('/api/users/set_password/', {'current_password': current, 'new_password': new},
+                    token_client(password_user))
+
+    def set_username():
+        return Call('/api/users/set_username/',
+                    {'current_password': PASSWORD, 'new_username': f'renamed-{next(counter)}'},
+                    token_client(username_user))
+
+    def confirm(action, **data):
+        def prepare():
+            reset_user.refresh_from_db()
+            return Call(f'/api/users/{action}/', {
+                'uid': encode_uid(reset_user.pk),
+                'token': default_token_generator.make_token(reset_user), **data})
+        return prepare
+
+    def activation():
+        User.objects.filter(id=inactive_user.id).update(is_active=False)
+        inactive_user.refresh_from_db()
+        return Call('/api/users/activation/', {
+            'uid': encode_uid(inactive_user.pk),
+            'token': default_token_generator.make_token(inactive_user)})
+
+    def logout():
+        Token.objects.filter(user=logout_user).delete()
+        return Call('/token/logout/', {}, token_client(logout_user))
+
+    def cart_add():
+        item_id = menuitems[-1][0]
+        Cart.objects.filter(user=customer, menuitem_id=item_id).delete()
+        return Call('/api/cart/', {'menuitem_id': item_id, 'quantity': 2})
+
+    def cart_batch():
+        fill_cart(customer)
+        in_cart = list(Cart.objects.filter(user=customer).values_list('menuitem_id', flat=True))
+        operations = [{'menuitem_id': item_id, 'quantity': 1} for item_id, _ in menuitems[-CART_ITEMS:]]
+        operations.append({'action': 'set', 'menuitem_id': in_cart[0], 'quantity': 3})
+        operations.append({'action': 'remove', 'menuitem_id': in_cart[1]})
+        return Call('/api/cart/batch/', {'operations': operations})
+
+    def checkout():
+        fill_cart(customer)
+        return Call('/api/orders/', {'date': str(datetime.date.today())})
+
+    def clear_cart():
+        fill_cart(customer)
+        return Call('/api/cart/', None)
+
+    def dispatch():
+        Order.objects.bulk_create([
+            Order(user=customer, total=Decimal('9.00'), date=datetime.date.today())
+            for _ in range(DISPATCH_BATCH)])
+        return Call('/api/orders/dispatch/', {})
+
+    def import_menu():
+        price = f'{next(counter) % 50 + 1}.25'
+        return Call('/api/menu-items/import/', [
+            {'title': f'Imported {i}', 'price': price, 'featured': False, 'category_id': category.id}
+            for i in range(IMPORT_ROWS)])
+
+    def remove_group_member(group, user, url):
+        def prepare():
+            group.user_set.add(user)
+            return Call(url.format(pk=user.pk), None)
+        return prepare
+
+    return [
+        Case('GET /api/category/', 'get', manager, 200, fixed('/api/category/')),
+        Case('POST /api/category/', 'post', manager, 201,
+             lambda: Call('/api/category/', {'slug': f'posted-{next(counter)}', 'title': 'Posted'})),
+        Case('GET /api/category/<pk>/', 'get', manager, 200, fixed(f'/api/category/{category.id}/')),
+        Case('PATCH /api/category/<pk>/', 'patch', manager, 200,
+             lambda: Call(f'/api/category/{category.id}/', {'title': f'Category {next(counter)}'})),
+        Case('DELETE /api/category/<pk>/', 'delete', manager, 204,
+             lambda: Call(f'/api/category/{new_category().id}/')),
+
+        Case('GET /api/menu-items/', 'get', customer, 200, fixed('/api/menu-items/')),
+        Case('GET /api/menu-items/?search=', 'get', customer, 200,
+             fixed('/api/menu-items/?search=dish 12&page_size=6')),
+        Case('GET /api/menu-items/?category=&ordering=', 'get', customer, 200,
+             fixed(f'/api/menu-items/?category={category.id}&ordering=-price')),
+        Case('POST /api/menu-items/', 'post', manager, 201,
+             lambda: Call('/api/menu-items/', {'title': f'Posted dish {next(counter)}', 'price': '5.00',
+                                               'featured': False, 'category_id': category.id})),
+        Case('POST /api/menu-items/import/', 'post', manager, 200, import_menu),
+        Case('GET /api/menu-items/<pk>/', 'get', customer, 200, fixed(f'/api/menu-items/{menuitem_id}/')),
+        Case('PATCH /api/menu-items/<pk>/', 'patch', manager, 200,
+             lambda: Call(f'/api/menu-items/{menuitem_id}/', {'price': f'{next(counter) % 9 + 1}.00'})),
+        Case('DELETE /api/menu-items/<pk>/', 'delete', manager, 204,
+             lambda: Call(f'/api/menu-items/{new_menuitem().id}/')),
+        Case('GET /api/menu/', 'get', customer, 200, fixed('/api/menu/')),
+
+        Case('GET /api/groups/managers/users/', 'get', manager, 200, fixed('/api/groups/managers/users/')),
+        Case('POST /api/groups/managers/users/', 'post', manager, 200,
+             fixed('/api/groups/managers/users/', {'user_id': spare_manager.id}, format='multipart')),
+        Case('GET /api/groups/managers/users/<pk>/', 'get', manager, 200,
+             fixed(f'/api/groups/managers/users/{manager.id}/')),
+        Case('DELETE /api/groups/managers/users/<pk>/', 'delete', manager, 200,
+             remove_group_member(manager_group, spare_manager, '/api/groups/managers/users/{pk}/')),
+        Case('GET /api/groups/delivery-crew/users/', 'get', manager, 200,
+             fixed('/api/groups/delivery-crew/users/')),
+        Case('POST /api/groups/delivery-crew/users/', 'post', manager, 200,
+             fixed('/api/groups/delivery-crew/users/', {'user_id': spare_crew.id}, format='multipart')),
+        # SingleDeliveryView only admits users who are not managers
+        Case('GET /api/groups/delivery-crew/users/<pk>/', 'get', crew_member, 200,
+             fixed(f'/api/groups/delivery-crew/users/{crew_member.id}/')),
+        Case('DELETE /api/groups/delivery-crew/users/<pk>/', 'delete', crew_member, 200,
+             remove_group_member(delivery_group, spare_crew, '/api/groups/delivery-crew/users/{pk}/')),
+
+        Case('GET /api/cart/', 'get', customer, 200, fixed('/api/cart/')),
+        Case('POST /api/cart/', 'post', customer, 201, cart_add),
+        Case('DELETE /api/cart/', 'delete', customer, 200, clear_cart),
+        Case('POST /api/cart/batch/', 'post', customer, 201, cart_batch),
+        Case('GET /api/cart/summary/', 'get', customer, 200, fixed('/api/cart/summary/')),
+
+        Case('GET /api/orders/ (manager)', 'get', manager, 200, fixed('/api/orders/')),
+        Case('GET /api/orders/ (delivery crew)', 'get', crew_member, 200, fixed('/api/orders/')),
+        Case('GET /api/orders/ (customer)', 'get', customer, 200, fixed('/api/orders/')),
+        Case('GET /api/orders/?pagination=cursor', 'get', manager, 200,
+             fixed('/api/orders/?pagination=cursor&ordering=-date')),
+        Case('POST /api/orders/', 'post', customer, 201, checkout),
+        Case('GET /api/orders/export/', 'get', manager, 200,
+             fixed(f'/api/orders/export/?format=ndjson&date__gte={datetime.date.today()}')),
+        Case('POST /api/orders/dispatch/', 'post', manager, 200, dispatch),
+        Case('GET /api/orders/<pk>/', 'get', manager, 200, fixed(f'/api/orders/{order.id}/')),
+        Case('PATCH /api/orders/<pk>/ (manager)', 'patch', manager, 200,
+             fixed(f'/api/orders/{order.id}/', {'delivery_crew_id': crew_member.id})),
+        Case('PATCH /api/orders/<pk>/ (delivery crew)', 'patch', crew_member, 200,
+             fixed(f'/api/orders/{order.id}/', {'status': False})),
+        Case('DELETE /api/orders/<pk>/', 'delete', manager, 200,
+             lambda: Call(f'/api/orders/{new_order(customer).id}/')),
+        Case('GET /api/analytics/sales/', 'get', manager, 200, fixed('/api/analytics/sales/')),
+        Case('GET /api/metrics/', 'get', manager, 200, fixed('/api/metrics/')),
+
+        Case('GET /api/async/category/', 'get', manager, 200, fixed('/api/async/category/')),
+        Case('GET /api/async/category/<pk>/', 'get', manager, 200,
+             fixed(f'/api/async/category/{category.id}/')),
+        Case('GET /api/async/menu-items/', 'get', customer, 200, fixed('/api/async/menu-items/')),
+        Case('GET /api/async/menu-items/<pk>/', 'get', customer, 200,
+             fixed(f'/api/async/menu-items/{menuitem_id}/')),
+        Case('GET /api/async/orders/', 'get', manager, 200, fixed('/api/async/orders/')),
+        Case('GET /api/async/orders/<pk>/', 'get', manager, 200, fixed(f'/api/async/orders/{order.id}/')),
+
+        Case('GET /api/', 'get', customer, 200, fixed('/api/')),
+        Case('GET /api/users/', 'get', customer, 200, fixed('/api/users/')),
+        Case('POST /api/users/', 'post', None, 201,
+             lambda: Call('/api/users/', {'username': f'signup-{next(counter)}',
+                                          'email': 'signup@example.com', 'password': PASSWORD})),
+        Case('GET /api/users/me/', 'get', customer, 200, fixed('/api/users/me/')),
+        Case('PUT /api/users/me/', 'put', customer, 200,
+             lambda: Call('/api/users/me/', {'email': f'me-{next(counter)}@example.com'})),
+        Case('PATCH /api/users/me/', 'patch', customer, 200,
+             lambda: Call('/api/users/me/', {'email': f'me-{next(counter)}@example.com'})),
+        Case('DELETE /api/users/me/', 'delete', None, 204,
+             as_new_user('/api/users/me/', {'current_password': PASSWORD})),
+        Case('GET /api/users/<username>/', 'get', customer, 200, fixed(f'/api/users/{customer.username}/')),
+        Case('PUT /api/users/<username>/', 'put', customer, 200,
+             lambda: Call(f'/api/users/{customer.username}/', {'email': f'put-{next(counter)}@example.com'})),
+        Case('PATCH /api/users/<username>/', 'patch', customer, 200,
+             lambda: Call(f'/api/users/{customer.username}/', {'email': f'put-{next(counter)}@example.com'})),
+        Case('DELETE /api/users/<username>/', 'delete', None, 204,
+             as_new_user('/api/users/{user.username}/', {'current_password': PASSWORD})),
+        Case('POST /api/users/activation/', 'post', None, 204, activation),
+        # resending is refused while SEND_ACTIVATION_EMAIL is off
+        Case('POST /api/users/resend_activation/', 'post', None, 400,
+             fixed('/api/users/resend_activation/', {'email': inactive_user.email})),
+        Case('POST /api/users/set_password/', 'post', None, 204, set_password),
+        # no *_RESET_CONFIRM_URL is configured, so djoser can only be asked
+        # about addresses it will not email
+        Case('POST /api/users/reset_password/', 'post', None, 204,
+             fixed('/api/users/reset_password/', {'email': 'nobody@example.com'})),
+        Case('POST /api/users/reset_password_confirm/', 'post', None, 204,
+             confirm('reset_password_confirm', new_password=PASSWORD)),
+        Case('POST /api/users/set_username/', 'post', None, 204, set_username),
+        Case('POST /api/users/reset_username/', 'post', None, 204,
+             fixed('/api/users/reset_username/', {'email': 'nobody@example.com'})),
+        Case('POST /api/users/reset_username_confirm/', 'post', None, 204,
+             lambda: confirm('reset_username_confirm', new_username=f'reset-{next(counter)}')()),
+        Case('POST /token/login/', 'post', None, 200,
+             fixed('/token/login/', {'username': customer.username, 'password': PASSWORD})),
+        Case('POST /token/logout/', 'post', None, 204, logout),
+    ]
+
+
+def uncovered_routes(cases):
+    """Routes of this app and djoser that no case calls."""
+    # ResolverMatch.route drops the '^' of included regex patterns
+    covered = {resolve(urlsplit(case.prepare().url).path).route.replace('^', '') for case in cases}
+
+    def walk(patterns, prefix=''):
+        for pattern in patterns:
+            route = prefix + str(pattern.pattern).replace('^', '')
+            if hasattr(pattern, 'url_patterns'):
+                yield from walk(pattern.url_patterns, route)
+            else:
+                yield route
+
+    return sorted(
+        route for route in walk(get_resolver().url_patterns)
+        if not route.startswith('admin/') and '<format>' not in route and 'format_suffix' not in route
+        and route not in covered)
+
+
+def run(case, clients, repeat):
+    timings, queries = [], []
+    for i in range(repeat + 1):
+        call = case.prepare()
+        client = call.client or clients[case.role]
+        request = getattr(client, case.method)
+        counter = QueryCounter()
+
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            response = request(call.url, call.data, format=call.format)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - started) * 1000
+
+        if response.status_code != case.status:
+            raise SystemExit(f'{case.name}: expected {case.status}, got {response.status_code}: '
+                             f'{getattr(response, "data", response.content)!r}')
+        # the first call warms the role, token and catalog caches
+        if i:
+            timings.append(elapsed)
+            queries.append(counter.count)
+
+    return {
+        'median': round(statistics.median(timings), 3),
+        'p95': round(percentile(timings, 95), 3),
+        'p99': round(percentile(timings, 99), 3),
+        'queries': max(queries),
+    }
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Yield `(name, change, regressed)` for each result found in the baseline."""
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            yield name, 'new', False
+            continue
+        slower = result['median'] - before['median']
+        change = f"{slower / before['median'] * 100:+.0f}%"
+        regressed = slower > max(before['median'] * threshold, min_delta)
+        if result['queries'] > before['queries']:
+            change += f" (+{result['queries'] - before['queries']} queries)"
+            regressed = True
+        yield name, change, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--managers', type=int, default=3)
+    parser.add_argument('--delivery-crew', type=int, default=20)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--menu-items', type=int, default=1_000)
+    parser.add_argument('--orders', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--only', help='Only run cases whose name contains this text.')
+    parser.add_argument('--baseline', type=pathlib.Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    # in-process timings of a few ms swing by +-50% between runs
+    parser.add_argument('--threshold', type=float, default=1.0,
+                        help='Allowed slowdown of the median, as a fraction (default 1.0).')
+    parser.add_argument('--min-delta', type=float, default=2.0,
+                        help='Ignore slowdowns smaller than this many ms (default 2.0).')
+    args = parser.parse_args()
+    dataset = {name: getattr(args, name) for name in (
+        'managers', 'delivery_crew', 'customers', 'categories', 'menu_items', 'orders', 'repeat')}
+
+    FAST_HASHER.enable()
+    NO_PERIODIC_STAMP_READS.enable()
+    # the expected 4xx responses would each log a warning
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    started = time.perf_counter()
+    data = seed(args)
+    print(f'seeded {args.orders} orders, {args.menu_items} menu items and '
+          f'{args.managers + args.delivery_crew + args.customers} users '
+          f'in {time.perf_counter() - started:.1f}s')
+
+    cases = build_cases(data)
+    missing = uncovered_routes(cases)
+    if missing:
+        raise SystemExit('routes without a benchmark case: ' + ', '.join(missing))
+    if args.only:
+        cases = [case for case in cases if args.only in case.name]
+
+    clients = {None: APIClient()}
+    for case in cases:
+        if case.role is not None and case.role not in clients:
+            clients[case.role] = token_client(case.role)
+
+    results = {case.name: run(case, clients, args.repeat) for case in cases}
+
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        stored = json.loads(args.baseline.read_text())
+        if stored['dataset'] != dataset:
+            raise SystemExit(f'{args.baseline} was recorded with {stored["dataset"]}; '
+                             'rerun with the same sizes or --save-baseline')
+        baseline = stored['results']
+
+    changes = {name: (change, regressed)
+               for name, change, regressed in compare(results, baseline, args.threshold, args.min_delta)}
+    print_table(
+        ('route', 'median ms', 'p95 ms', 'p99 ms', 'queries', 'vs baseline'),
+        [(name, f"{result['median']:.2f}", f"{result['p95']:.2f}", f"{result['p99']:.2f}",
+          result['queries'], changes[name][0] + (' REGRESSION' if changes[name][1] else ''))
+         for name, result in results.items()])
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(
+            {'dataset': dataset, 'results': results}, indent=2, sort_keys=True) + '\n')
+        print(f'saved {args.baseline}')
+        return
+
+    regressions = [name for name, (_, regressed) in changes.items() if regressed]
+    if regressions:
+        print(f'{len(regressions)} regression(s): ' + ', '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()